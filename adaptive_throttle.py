@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from render_routing import route_host
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_STATE_PATH = PROJECT_ROOT / ".crawl_state" / "throttle.json"
+
+# Learned rates older than this are ignored and the domain starts again from the
+# spider's configured delay
+STATE_TTL = 30 * 24 * 3600
+
+# Throttling answers: back off, and honour Retry-After when the site sends one
+THROTTLE_STATUSES = (429, 503)
+
+
+def retry_after_seconds(value, now=None):
+    # Retry-After is either a number of seconds or an HTTP date; None if unusable
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("latin-1", "ignore")
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+class DomainRate:
+    # What the controller currently allows for one domain: `concurrency` requests in
+    # flight (a float, the integer part is used) and at least `delay` seconds between
+    # request starts. Latency is tracked separately for plain HTTP and browser fetches,
+    # which differ by an order of magnitude on the same site.
+
+    def __init__(self, concurrency, delay, latency=None):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.latency = dict(latency or {})  # kind -> [ewma, baseline, samples]
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.responses = 0
+        self.throttled = 0
+        self.slow = 0
+        self.errors = 0
+
+    @property
+    def slots(self):
+        return max(1, int(self.concurrency))
+
+    def current_delay(self, now=None):
+        # The delay to put on the downloader slot: a Retry-After pause overrides it
+        pause = self.paused_until - (now if now is not None else time.monotonic())
+        return max(self.delay, pause)
+
+    def requests_per_second(self):
+        # slots requests per round trip, but no more than one per delay
+        latencies = [ewma for ewma, _, _ in self.latency.values()]
+        limits = [self.slots / (sum(latencies) / len(latencies))] if latencies and sum(latencies) > 0 else []
+        if self.delay > 0:
+            limits.append(1.0 / self.delay)
+        return min(limits) if limits else float(self.slots)
+
+
+class AdaptiveThrottle:
+    # Per-domain AIMD rate control.
+    #
+    # Each healthy response first shortens the delay, adding `rate_step` requests per
+    # second, until it reaches `min_delay`; after that it adds `increase / concurrency`
+    # to the concurrency (about `increase` per round of responses). A 429/503, a
+    # timeout or a connection error halves the concurrency, or once it is down to one
+    # request doubles the delay (`backoff_delay` if it was 0), up to `max_delay`. A
+    # Retry-After pauses the domain that long (at most `max_pause`). A latency above
+    # `latency_factor` times the domain's best observed latency counts as congestion
+    # too, but only trims the concurrency. Only one decrease is applied per round:
+    # answers to requests sent before the last decrease do not decrease it again.
+    #
+    # The rate reached is saved per domain on close, so the next crawl starts where
+    # this one left off instead of at the spider's worst-case DOWNLOAD_DELAY.
+
+    def __init__(self, start_delay=0.0, start_concurrency=1, min_delay=0.0, max_delay=60.0, max_concurrency=8,
+                 increase=1.0, backoff=0.5, rate_step=0.05, backoff_delay=1.0, latency_factor=3.0,
+                 max_pause=600.0, path=None):
+        self.start_delay = float(start_delay)
+        self.start_concurrency = max(1, int(start_concurrency))
+        self.min_delay = float(min_delay)
+        self.max_delay = max(float(max_delay), self.min_delay)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.increase = float(increase)
+        self.backoff = min(max(float(backoff), 0.1), 0.9)
+        self.rate_step = float(rate_step)
+        self.backoff_delay = float(backoff_delay)
+        self.latency_factor = float(latency_factor)
+        self.max_pause = float(max_pause)
+        self.path = Path(path or os.getenv("ADAPTIVE_THROTTLE_STATE_PATH", str(DEFAULT_STATE_PATH)))
+        self._lock = threading.Lock()
+        self.saved = self._load()
+        self.domains = {}
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        cutoff = time.time() - STATE_TTL
+        return {d: s for d, s in saved.items() if isinstance(s, dict) and s.get("updated_at", 0) >= cutoff}
+
+    def state(self, url_or_host):
+        domain = route_host(url_or_host if "//" in url_or_host else f"//{url_or_host}")
+        with self._lock:
+            rate = self.domains.get(domain)
+            if rate is None:
+                saved = self.saved.get(domain)
+                if saved:
+                    rate = DomainRate(
+                        min(float(saved["concurrency"]), self.max_concurrency),
+                        min(max(float(saved["delay"]), self.min_delay), self.max_delay),
+                        # The baseline carries over; the moving average starts from it
+                        {kind: [base, base, 0] for kind, base in (saved.get("latency") or {}).items()},
+                    )
+                else:
+                    rate = DomainRate(
+                        float(min(self.start_concurrency, self.max_concurrency)),
+                        min(max(self.start_delay, self.min_delay), self.max_delay),
+                    )
+                self.domains[domain] = rate
+            return rate
+
+    def _decrease(self, rate, sent_at, now, delay_too=True):
+        if sent_at is not None and sent_at < rate.last_decrease:
+            return False
+        if rate.concurrency >= 2:
+            rate.concurrency = max(1.0, rate.concurrency * self.backoff)
+        elif delay_too:
+            rate.concurrency = 1.0
+            rate.delay = min(self.max_delay, (rate.delay or self.backoff_delay) / self.backoff)
+        else:
+            return False
+        rate.last_decrease = now
+        return True
+
+    def _increase(self, rate):
+        if rate.delay > self.min_delay:
+            # Additive in requests/second: 1/delay grows by rate_step
+            delay = 1.0 / (1.0 / rate.delay + self.rate_step)
+            rate.delay = delay if delay > max(self.min_delay, 0.05) else self.min_delay
+        else:
+            rate.concurrency = min(self.max_concurrency, rate.concurrency + self.increase / max(rate.concurrency, 1.0))
+
+    def on_response(self, url, status, latency=None, retry_after=None, sent_at=None, kind="static"):
+        # Returns "throttled", "slow" or "ok" after updating the domain's rate
+        now = time.monotonic()
+        rate = self.state(url)
+        with self._lock:
+            rate.responses += 1
+            if status in THROTTLE_STATUSES:
+                rate.throttled += 1
+                pause = retry_after_seconds(retry_after)
+                if pause:
+                    rate.paused_until = max(rate.paused_until, now + min(pause, self.max_pause))
+                self._decrease(rate, sent_at, now)
+                return "throttled"
+
+            if latency is None or status >= 500:
+                return "ok"
+            ewma, base, samples = rate.latency.get(kind, [latency, latency, 0])
+            ewma = 0.8 * ewma + 0.2 * latency
+            samples += 1
+            base = min(base, ewma)
+            rate.latency[kind] = [ewma, base, samples]
+            if samples >= 5 and ewma > self.latency_factor * base:
+                rate.slow += 1
+                self._decrease(rate, sent_at, now, delay_too=False)
+                return "slow"
+            self._increase(rate)
+            return "ok"
+
+    def on_error(self, url, sent_at=None):
+        # Timeouts and dropped connections: the site is struggling, back off
+        now = time.monotonic()
+        rate = self.state(url)
+        with self._lock:
+            rate.errors += 1
+            self._decrease(rate, sent_at, now)
+
+    def save(self):
+        # Merged into what is on disk, so parallel crawls (crawl_shards.py) keep each
+        # other's domains
+        with self._lock:
+            saved = self._load()
+            now = time.time()
+            for domain, rate in self.domains.items():
+                if not rate.responses:
+                    continue
+                saved[domain] = {
+                    "concurrency": round(rate.concurrency, 3),
+                    "delay": round(rate.delay, 3),
+                    "latency": {kind: round(base, 3) for kind, (_, base, _) in rate.latency.items()},
+                    "requests_per_second": round(rate.requests_per_second(), 3),
+                    "updated_at": now,
+                }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_name = f"{self.path}.tmp"
+            with open(tmp_name, "w", encoding="utf-8") as f:
+                json.dump(saved, f, indent=2, sort_keys=True)
+            os.replace(tmp_name, self.path)
@@ -2,41 +2,30 @@ import pandas as pd
 import os
 import glob
 
-def populate_sheet1_data():
+from product_schema import STEELITE_SCHEMA, normalize_frame
+from product_store import read_project_sources, store_from_env
+from sku_resolution import RULE_RANK, SkuIndex, accepted_rules, load_aliases
+import xlsx_patch
+import xlsx_stream
+
+ALIASES_PATH = 'sources/sku_aliases.csv'  # Optional alias,code table
+DATASET_DIR = 'steelite/dataset'  # Written by ParquetExportPipeline
+UPDATE_MODE = os.getenv('XLSX_UPDATE_MODE', 'patch')  # or 'rewrite'
+
+def report_sku_rules(codes, rules, output_path):
+    # Which rule matched each sheet row, next to the output workbook
+    report = pd.DataFrame({'Mfr Catalog No.': codes, 'rule': rules.fillna('unmatched')})
+    report.to_csv(output_path.replace('.xlsx', '_sku_matches.csv'), index=False)
+    print("SKU matches by rule:")
+    for rule, count in report['rule'].value_counts().items():
+        print(f"  {rule}: {count}")
+
+
+def populate_sheet1_data(chunk_rows=xlsx_stream.DEFAULT_CHUNK_ROWS):
     excel_path = 'results/STEELITE_Populated_v0.4.xlsx'  # Target Excel file
     output_path = 'results/STEELITE_Populated_v0.5.xlsx' # Output file
 
     print("Loading datasets...")
-    df1 = pd.read_excel(excel_path, dtype=str) 
-    
-    # Find and merge all *_products.csv files from spider folder
-    csv_files = glob.glob('steelite/*_products.csv')
-    print(f"Found {len(csv_files)} spider CSV files")
-    
-    if not csv_files:
-        print("  WARNING: No *_products.csv files found! Creating empty sheet.")
-        df2 = pd.DataFrame()
-    else:
-        # Read all CSV files and concatenate them
-        dfs = []
-        for csv_file in csv_files:
-            try:
-                df = pd.read_csv(csv_file, dtype=str)
-                dfs.append(df)
-                print(f"  [OK] Loaded {csv_file}: {len(df)} rows")
-            except Exception as e:
-                print(f"  [ERROR] Error loading {csv_file}: {e}")
-        
-        if dfs:
-            df2 = pd.concat(dfs, ignore_index=True)
-            print(f"\nTotal merged rows from all spiders: {len(df2)}")
-        else:
-            df2 = pd.DataFrame()
-
-    print(f"Excel columns: {df1.columns.tolist()}")
-    if not df2.empty:
-        print(f"Spider data columns: {df2.columns.tolist()}")
-
     # REVERSED MAPPING: 'Target Column in Sheet 1' : 'Source Column in Sheet 2'
     column_mapping = {
         'Image Link': 'image_link',
@@ -53,37 +42,108 @@ def populate_sheet1_data():
         'Pattern': 'pattern',
     }
 
+    # Every spider's rows, only the columns used here: from the product store where a
+    # spider has written to it, else the Parquet dataset, else its *_products.csv
+    csv_files = {
+        os.path.basename(path)[:-len('_products.csv')]: path
+        for path in sorted(glob.glob('steelite/*_products.csv'))
+    }
+    columns = ['manufacturer'] + list(column_mapping.values())
+    df2 = read_project_sources('steelite', DATASET_DIR, csv_files, columns=columns, store=store_from_env())
+    for source, count in df2['_source'].value_counts(sort=False).items():
+        print(f"  [OK] Loaded {source}: {count} rows")
+    if UPDATE_MODE != 'rewrite':
+        inputs = xlsx_patch.inputs_digest(excel_path, df2, ALIASES_PATH, accepted_rules())
+        if xlsx_patch.published_for(output_path, inputs):
+            print(f"\nNo changes: {output_path} was already published from this workbook and spider data")
+            return
+
+    # The sheet is streamed: only its Mfr Catalog No. column is read up front (to build
+    # the SKU resolver); the rows are then merged and written chunk_rows at a time
+    sheet1 = xlsx_stream.SheetReader(excel_path)
+    columns1 = sheet1.header
+    codes = pd.Series(sheet1.column('Mfr Catalog No.'), dtype=object).map(xlsx_stream.as_text)
+    if df2.empty:
+        print("  WARNING: No spider data found! Creating empty sheet.")
+        df2 = pd.DataFrame()
+    else:
+        print(f"\nTotal merged rows from all spiders: {len(df2)}")
+
+    print(f"Excel columns: {columns1}")
+    if not df2.empty:
+        print(f"Spider data columns: {df2.columns.tolist()}")
+
     # Use manufacturer as the key to match with Mfr Catalog No.
-    df1['Mfr Catalog No.'] = df1['Mfr Catalog No.'].fillna("").astype(str).str.strip()
+    codes = codes.fillna("").astype(str).str.strip()
+    sku_index = None
     
     if not df2.empty:
         df2['manufacturer'] = df2['manufacturer'].fillna("").astype(str).str.strip()
-        df2.drop_duplicates(subset=['manufacturer'], keep='first', inplace=True)
-        df2.set_index('manufacturer', inplace=True)
+
+        # Resolve spider codes against the sheet (SN-2067, pack suffixes, aliases, ...)
+        sku_index = SkuIndex(codes, aliases=load_aliases(ALIASES_PATH))
+        sheet_keys = codes.map(sku_index.master_key)
+        df2['_key'], df2['_rule'], _ = sku_index.join_keys(df2['manufacturer'], accept=accepted_rules())
+        # Best rule first, then spider order
+        df2['_rank'] = df2['_rule'].map(RULE_RANK).fillna(len(RULE_RANK))
+        df2.sort_values('_rank', kind='stable', inplace=True)
+        df2.drop_duplicates(subset=['_key'], keep='first', inplace=True)
+        df2.set_index('_key', inplace=True)
+        report_sku_rules(codes, sheet_keys.map(df2['_rule']), output_path)
+        # Missing values stay empty so they never overwrite a blank Excel cell with "N/A"
+        df2 = normalize_frame(df2, STEELITE_SCHEMA, na=None)
         
         print("Pulling data from spiders to populate Excel...")
-        
-        for col_target, col_source in column_mapping.items():
-            if col_target in df1.columns and not df2.empty:
+    else:
+        print("  WARNING: No spider data available - Excel will not be populated")
+
+    populated = {col_target: 0 for col_target in column_mapping}
+    errors = {}
+    # patch (default): only the changed cells are written into a copy of the sheet;
+    # rewrite: the whole sheet is written out again
+    if UPDATE_MODE == 'rewrite':
+        writer = xlsx_stream.SheetWriter(output_path, columns1)
+    else:
+        changeset = xlsx_patch.Changeset(excel_path, sheet1.sheet.title, inputs=inputs)
+    for df1 in sheet1.frames(chunk_rows, converter=xlsx_stream.as_text):
+        before = df1.copy()
+        df1['Mfr Catalog No.'] = df1['Mfr Catalog No.'].fillna("").astype(str).str.strip()
+        if sku_index is not None:
+            chunk_keys = df1['Mfr Catalog No.'].map(sku_index.master_key)
+            for col_target, col_source in column_mapping.items():
+                if col_target not in df1.columns or col_target in errors:
+                    continue
                 # Use manufacturer as key to match rows
                 try:
-                    matched_data = df1['Mfr Catalog No.'].map(df2[col_source] if col_source in df2.columns else pd.Series())
+                    matched_data = chunk_keys.map(df2[col_source] if col_source in df2.columns else pd.Series())
                     # Only update cells that currently are empty or NaN
                     df1[col_target] = df1[col_target].where(df1[col_target].fillna("").str.strip() != "", matched_data)
-                    populated_count = matched_data.notna().sum()
-                    if populated_count > 0:
-                        print(f"  ✓ Populated '{col_target}' ({populated_count} rows)")
-                    else:
-                        print(f"  ✗ No data found for '{col_target}'")
+                    populated[col_target] += int(matched_data.notna().sum())
                 except Exception as e:
-                    print(f"  ✗ Error with '{col_target}': {e}")
-            else:
+                    errors[col_target] = e
+        if UPDATE_MODE == 'rewrite':
+            writer.write_frame(df1)
+        else:
+            changeset.add_frame(before, df1, columns1, key_column='Mfr Catalog No.')
+    sheet1.close()
+    if UPDATE_MODE == 'rewrite':
+        writer.close()
+
+    if sku_index is not None:
+        for col_target in column_mapping:
+            if col_target not in columns1:
                 print(f"  ✗ Skipped '{col_target}' (column missing or no spider data)")
-    else:
-        print("  WARNING: No spider data available - Excel will not be populated")
+            elif col_target in errors:
+                print(f"  ✗ Error with '{col_target}': {errors[col_target]}")
+            elif populated[col_target] > 0:
+                print(f"  ✓ Populated '{col_target}' ({populated[col_target]} rows)")
+            else:
+                print(f"  ✗ No data found for '{col_target}'")
 
-    df1.to_excel(output_path, index=False)
-    print(f"\n✓ Data successfully transferred! Saved to: {output_path}")
+    if UPDATE_MODE == 'rewrite':
+        print(f"\n✓ Data successfully transferred! Saved to: {output_path}")
+    else:
+        xlsx_patch.print_publish(xlsx_patch.publish(changeset, output_path), changeset, output_path)
 
 if __name__ == "__main__":
     populate_sheet1_data()
\ No newline at end of file
@@ -1,10 +1,12 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import re
 import json
 import os  # <--- Added to handle folders
 
+from http_client import HttpClient
+from product_schema import CATALOGUE_SCHEMA, normalize_frame
+
 BASE_URL = "https://www.bakedeco.com"
 START_URL = "https://www.bakedeco.com/nav/brand.asp?pagestart=1&categoryID=0&price=0&manufacid=551&sortby=&clearance=0&va=1"
 
@@ -12,10 +14,12 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 }
 
+client = HttpClient(headers=HEADERS)
+
 def get_product_links(start_url):
     print(f"Fetching product list from: {start_url} ...")
     try:
-        r = requests.get(start_url, headers=HEADERS)
+        r = client.get(start_url)
         if r.status_code != 200:
             print(f"Failed to load page: {r.status_code}")
             return []
@@ -44,7 +48,7 @@ def get_product_links(start_url):
 
 def scrape_single_product(full_url):
     try:
-        r = requests.get(full_url, headers=HEADERS)
+        r = client.get(full_url)
         if r.status_code != 200: 
             return None
             
@@ -212,15 +216,7 @@ if __name__ == "__main__":
         if all_products:
             df = pd.DataFrame(all_products)
             
-            cols = [
-                "Item No.", "Mfr Catalog No.", "Group Name", "Ecom Picture Name", 
-                "SAP Picture", "Inactive", "Indent Item", "# In Stock", 
-                "Production Date", "Item Description", "Stock Description", 
-                "Warranty", "Serial Managed", "# List Price", "Main Category", 
-                "Sub1 Category", "Sub2 Category", "Short Description"
-            ]
-            
-            df = df.reindex(columns=cols, fill_value="N/A")
+            df = normalize_frame(df.reindex(columns=CATALOGUE_SCHEMA.names, fill_value="N/A"), CATALOGUE_SCHEMA)
             
             folder_name = "results"
             file_name = "Bakedeco_Silikomart_Final.xlsx"
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+import argparse
+import json
+import logging
+import statistics
+import time
+from pathlib import Path
+
+from scrapy import Request
+
+from crawl_orchestrator import PROJECTS
+from fixture_corpus import build_response, corpus, run_callback, spider_factory
+
+# Parse cost per spider, offline: every fixture in fixtures/ (fixture_corpus.py) is
+# fed to its callback --repeat times on a fresh response, so the HTML is parsed
+# again each time as in a crawl. Only the callback is timed; building the response
+# and the spider is not. --save writes the results, --baseline compares against a
+# saved run so parser changes show up as a percentage.
+
+
+def bench_spider(project, name, manifest, repeat):
+    new_spider = spider_factory(project, name)
+    fixtures = []
+    for entry in manifest["fixtures"]:
+        samples, items = [], 0
+        for _ in range(repeat):
+            spider = new_spider()
+            response = build_response(project, name, entry)
+            start = time.perf_counter()
+            outputs = run_callback(spider, entry, response)
+            samples.append(time.perf_counter() - start)
+            items = sum(1 for o in outputs if not isinstance(o, Request))
+        fixtures.append({
+            "fixture": entry["name"],
+            "bytes": len(response.body),
+            "items": items,
+            "us_per_page": statistics.median(samples) * 1e6,
+        })
+    pages_us = sum(f["us_per_page"] for f in fixtures)
+    items = sum(f["items"] for f in fixtures)
+    return {
+        "spider": f"{project}/{name}",
+        "pages": len(fixtures),
+        "us_per_page": pages_us / len(fixtures),
+        "items_per_second": items / (pages_us / 1e6) if pages_us else 0.0,
+        "fixtures": fixtures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse µs/page and items/s per spider over the offline fixture corpus")
+    parser.add_argument("spiders", nargs="*", help="Only these spiders (default: every spider with fixtures)")
+    parser.add_argument("--project", choices=sorted(PROJECTS), action="append")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="Also list every fixture")
+    parser.add_argument("--save", type=Path, help="Write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Compare against results saved with --save")
+    args = parser.parse_args()
+    # The spiders log every product at INFO
+    logging.basicConfig(level=logging.WARNING)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {r["spider"]: r for r in json.load(f)["spiders"]}
+
+    results = [bench_spider(project, name, manifest, args.repeat)
+               for project, name, manifest in corpus(args.project, args.spiders)]
+    if not results:
+        print("No fixtures found; record some with `scrapy crawl <spider> -s FIXTURE_RECORD=1`")
+        return
+
+    header = f"{'spider':<34} {'pages':>5} {'µs/page':>10} {'items/s':>10}" + (f" {'vs baseline':>12}" if baseline else "")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = f"{r['spider']:<34} {r['pages']:>5} {r['us_per_page']:>10.0f} {r['items_per_second']:>10.0f}"
+        before = baseline.get(r["spider"])
+        if before:
+            line += f" {(r['us_per_page'] / before['us_per_page'] - 1) * 100:>+11.1f}%"
+        print(line)
+        if args.verbose:
+            for f in r["fixtures"]:
+                print(f"  {f['fixture']:<32} {f['bytes'] / 1024:>7.0f} KB {f['us_per_page']:>10.0f} µs {f['items']:>6} items")
+    total_us = sum(r["us_per_page"] * r["pages"] for r in results)
+    print(f"\n{sum(r['pages'] for r in results)} pages, {total_us / 1e3:.1f} ms per pass over the corpus "
+          f"(median of {args.repeat} runs per page)" + ("; vs baseline is the change in µs/page, negative is faster" if baseline else ""))
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"repeat": args.repeat, "spiders": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
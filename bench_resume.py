@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+import argparse
+import csv
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# Measures what it costs to restart KitchenrestockSpider after a kill -9 at a random
+# point, with and without checkpointing (--resume). The spider runs unchanged except
+# for pointing at a local synthetic catalogue and dropping its politeness delays.
+
+PROJECT_ROOT = Path(__file__).parent
+STEELITE_DIR = PROJECT_ROOT / "steelite"
+
+
+class CatalogueHandler(BaseHTTPRequestHandler):
+    pages = 30
+    per_page = 10
+    latency = 0.02
+    hits = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        with self.lock:
+            CatalogueHandler.hits += 1
+
+        parsed = urlparse(self.path)
+        if parsed.path == "/search":
+            page = int(parse_qs(parsed.query).get("page", ["1"])[0])
+            cards = ""
+            if page <= self.pages:
+                cards = "".join(
+                    f'<li class="js-pagination-result"><a class="js-prod-link" href="/products/p{page}-{i}">Plate {page}-{i}</a></li>'
+                    for i in range(self.per_page)
+                )
+            body = f"<html><body><ul>{cards}</ul></body></html>"
+        elif parsed.path.startswith("/products/"):
+            slug = parsed.path.rsplit("/", 1)[-1]
+            body = (
+                f'<html><body><h1 class="heading-title">Steelite {slug}</h1>'
+                f'<span class="product-sku">SKU-{slug}</span></body></html>'
+            )
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_worker(base_url, pages, job, workdir):
+    sys.path.insert(0, str(STEELITE_DIR))
+    os.environ["SCRAPY_SETTINGS_MODULE"] = "steelite.settings"
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    from steelite.spiders.kitchenrestock import KitchenrestockSpider
+
+    class LocalKitchenrestockSpider(KitchenrestockSpider):
+        allowed_domains = ["127.0.0.1"]
+        custom_settings = {
+            **KitchenrestockSpider.custom_settings,
+            "DOWNLOAD_DELAY": 0,
+            "RANDOMIZE_DOWNLOAD_DELAY": False,
+            "AUTOTHROTTLE_ENABLED": False,
+            "ADAPTIVE_THROTTLE_ENABLED": False,
+            "CONCURRENT_REQUESTS": 2,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 2,
+            "DOWNLOADER_MIDDLEWARES": {},
+            # The synthetic catalogue is static HTML, no browser needed
+            "DOWNLOAD_HANDLERS": {
+                "http": "scrapy.core.downloader.handlers.http11.HTTP11DownloadHandler",
+                "https": "scrapy.core.downloader.handlers.http11.HTTP11DownloadHandler",
+            },
+        }
+
+        def _search_url(self, page):
+            return f"{base_url}/search?page={page}"
+
+        async def start(self):
+            for request in self.start_requests():
+                yield request
+
+    settings.set("LOG_LEVEL", "WARNING")
+    settings.set("RESPONSE_CACHE_ENABLED", False)
+    settings.set("CHECKPOINT_DIR", str(Path(workdir) / "jobs"))
+    # Everything the pipelines and extensions write stays in the scratch directory,
+    # the synthetic rows must not reach the real dataset, product store or telemetry
+    settings.set("PARQUET_DATASET_DIR", str(Path(workdir) / "dataset"))
+    settings.set("PRODUCT_STORE_PATH", str(Path(workdir) / "products.sqlite"))
+    settings.set("TELEMETRY_DIR", str(Path(workdir) / "telemetry"))
+    if job:
+        settings.set("CHECKPOINT_JOB", job)
+
+    os.chdir(workdir)
+    process = CrawlerProcess(settings)
+    process.crawl(LocalKitchenrestockSpider, end_page=pages + 1, api=0)
+    process.start()
+
+
+def crawl(args, base_url, workdir, job=None, kill_after=None):
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), "--worker",
+        "--base-url", base_url, "--pages", str(args.pages), "--workdir", str(workdir),
+    ]
+    if job:
+        cmd += ["--job", job]
+
+    CatalogueHandler.hits = 0
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    killed = False
+    try:
+        proc.wait(timeout=kill_after)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        killed = True
+    return time.perf_counter() - start, CatalogueHandler.hits, killed
+
+
+def read_output(workdir, expected):
+    path = Path(workdir) / "kitchenrestock_products.csv"
+    if not path.exists():
+        return 0, 0, expected
+    with open(path, newline="", encoding="utf-8") as f:
+        urls = [row["product_url"] for row in csv.DictReader(f)]
+    unique = len(set(urls))
+    return len(urls), len(urls) - unique, expected - unique
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restart cost of an interrupted kitchenrestock crawl")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--job", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.base_url, args.pages, args.job, args.workdir)
+        return
+
+    CatalogueHandler.pages = args.pages
+    CatalogueHandler.per_page = args.per_page
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogueHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    expected = args.pages * args.per_page
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_dir = Path(tmp) / "baseline"
+        baseline_dir.mkdir()
+        baseline_time, baseline_hits, _ = crawl(args, base_url, baseline_dir)
+        print(f"Full crawl: {baseline_hits} requests in {baseline_time:.1f}s ({expected} products)")
+
+        results = []
+        for trial in range(args.trials):
+            kill_at = baseline_time * rng.uniform(0.2, 0.8)
+            for mode, job in (("restart from scratch", None), ("--resume", f"bench{trial}")):
+                workdir = Path(tmp) / f"{trial}-{'resume' if job else 'scratch'}"
+                workdir.mkdir()
+                first_time, first_hits, killed = crawl(args, base_url, workdir, job=job, kill_after=kill_at)
+                restart_time, restart_hits, _ = crawl(args, base_url, workdir, job=job)
+                rows, duplicates, missing = read_output(workdir, expected)
+                results.append((trial, mode, kill_at, killed, first_hits, restart_hits, restart_time,
+                                first_hits + restart_hits - baseline_hits, rows, duplicates, missing))
+
+    server.shutdown()
+
+    print()
+    header = f"{'trial':>5}  {'mode':<20} {'kill@s':>6} {'before':>7} {'after':>6} {'restart s':>9} {'wasted':>6} {'rows':>5} {'dupes':>5} {'missing':>7}"
+    print(header)
+    print("-" * len(header))
+    for trial, mode, kill_at, killed, first_hits, restart_hits, restart_time, wasted, rows, duplicates, missing in results:
+        note = "" if killed else "  (finished before kill)"
+        print(f"{trial:>5}  {mode:<20} {kill_at:>6.1f} {first_hits:>7} {restart_hits:>6} {restart_time:>9.1f} "
+              f"{wasted:>6} {rows:>5} {duplicates:>5} {missing:>7}{note}")
+    print("\nbefore/after = requests served before the kill and during the restart;")
+    print("wasted = requests beyond a single uninterrupted crawl.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from product_schema import normalize_image_link, normalize_sku_series
+from sanneng_arranger_xlsx import COL_NAMES, COLUMN_MAPPING, merge_scraped_data
+
+# Times the vectorised SKU merge in sanneng_arranger_xlsx against the row-by-row
+# loop it replaced, on synthetic workbooks and scraped catalogues. Up to
+# --legacy-max rows the old loop also runs and both outputs are compared.
+
+SOURCES = ["sannengvietnam.com", "unopan.tw", "chakawal.com", "tokopedia.com", "coupang.com"]
+
+
+def synthetic_data(rows, seed):
+    rng = random.Random(seed)
+    sku_space = int(rows * 1.5)
+
+    excel_skus = []
+    for _ in range(rows):
+        n = rng.randrange(sku_space)
+        roll = rng.random()
+        if roll < 0.01:
+            excel_skus.append(None)
+        elif roll < 0.2:
+            excel_skus.append(f"sn {n}")
+        else:
+            excel_skus.append(f"SN{n}")
+    df_excel = pd.DataFrame({
+        "Item No.": [f"I{i}" for i in range(rows)],
+        "Mfr Catalog No.": excel_skus,
+        "Group Name": "Bakeware",
+        "Item Description": [f"Item {i}" for i in range(rows)],
+        # A few cells already filled in by hand must survive the merge
+        "Overview": [("kept" if rng.random() < 0.05 else None) for _ in range(rows)],
+    })
+
+    scraped_rows = rows // 2
+    scraped = pd.DataFrame({
+        "sku": [f"SN{rng.randrange(sku_space)}" if rng.random() > 0.01 else None for _ in range(scraped_rows)],
+        "name": [f"Product {i}" for i in range(scraped_rows)],
+        "image_link": [rng.choice(["N/A", "", f"//cdn.example/{i}.jpg", f"https://cdn.example/{i}.jpg"]) for i in range(scraped_rows)],
+        "overview": [f"Overview {i}" for i in range(scraped_rows)],
+        "length": [f"{rng.randrange(5, 60)}cm" for _ in range(scraped_rows)],
+        "width": [f"{rng.randrange(5, 40)}cm" for _ in range(scraped_rows)],
+        "height": [f"{rng.randrange(1, 20)}cm" for _ in range(scraped_rows)],
+        "material": "Steel",
+        "product_url": [f"https://shop.example/p/{i}" for i in range(scraped_rows)],
+        "source": [rng.choice(SOURCES) for _ in range(scraped_rows)],
+    })
+    return df_excel, scraped
+
+
+def legacy_merge(df_excel, scraped_data, mfr_column):
+    # The loop populate_excel used before the merge engine, without its per-row prints
+    df_excel = df_excel.copy()
+    scraped_data = scraped_data.copy()
+    df_excel['_normalized_sku'] = normalize_sku_series(df_excel[mfr_column])
+    scraped_data['_normalized_sku'] = normalize_sku_series(scraped_data['sku'])
+    scraped_data['image_link'] = scraped_data['image_link'].apply(normalize_image_link)
+
+    sku_to_data = {}
+    for _, row in scraped_data.iterrows():
+        sku = row['_normalized_sku']
+        if not sku:
+            continue
+        if sku not in sku_to_data:
+            sku_to_data[sku] = row
+            continue
+        existing = sku_to_data[sku]
+        if normalize_image_link(row.get('image_link')) != 'N/A' and normalize_image_link(existing.get('image_link')) == 'N/A':
+            sku_to_data[sku] = row
+
+    for col_name in COL_NAMES.values():
+        if col_name not in df_excel.columns:
+            df_excel[col_name] = None
+
+    for idx, row in df_excel.iterrows():
+        excel_sku = row['_normalized_sku']
+        if excel_sku and excel_sku in sku_to_data:
+            scraped_row = sku_to_data[excel_sku]
+            for scraped_col, excel_col_letter in COLUMN_MAPPING.items():
+                excel_col_name = COL_NAMES[excel_col_letter]
+                value = scraped_row.get(scraped_col, 'N/A')
+                if scraped_col == 'image_link':
+                    value = normalize_image_link(value)
+                if pd.isna(df_excel.at[idx, excel_col_name]) or df_excel.at[idx, excel_col_name] == '':
+                    df_excel.at[idx, excel_col_name] = value
+
+    return df_excel.drop(columns=['_normalized_sku'])
+
+
+def same_cells(a, b):
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    return a.astype(object).where(a.notna(), None).equals(b.astype(object).where(b.notna(), None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorised vs row-by-row SKU merge for the San Neng workbook")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000,
+                        help="largest workbook the old loop is run (and compared) on")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    header = f"{'rows':>10} {'merge s':>9} {'rows/s':>12} {'legacy s':>9} {'speedup':>8}  {'matched':>9}  identical"
+    print(header)
+    print("-" * len(header))
+    for rows in args.rows:
+        df_excel, scraped = synthetic_data(rows, args.seed)
+
+        started = time.perf_counter()
+        merged, stats = merge_scraped_data(df_excel, scraped, "Mfr Catalog No.")
+        merge_time = time.perf_counter() - started
+
+        legacy_time = None
+        identical = "-"
+        if rows <= args.legacy_max:
+            started = time.perf_counter()
+            expected = legacy_merge(df_excel, scraped, "Mfr Catalog No.")
+            legacy_time = time.perf_counter() - started
+            identical = "yes" if same_cells(merged, expected) else "NO"
+
+        legacy = f"{legacy_time:>9.2f}" if legacy_time is not None else f"{'-':>9}"
+        speedup = f"{legacy_time / merge_time:>7.0f}x" if legacy_time is not None else f"{'-':>8}"
+        print(f"{rows:>10} {merge_time:>9.2f} {rows / merge_time:>12,.0f} {legacy} {speedup}  {stats['matched']:>9}  {identical}")
+
+
+if __name__ == "__main__":
+    main()
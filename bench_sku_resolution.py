@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from sku_resolution import SkuIndex
+
+# Builds a SkuIndex over a synthetic master sheet and resolves scraped codes that
+# were mangled the way shop listings mangle them (case, dashes, pack suffixes,
+# dropped SN prefix, swapped letters), then reports timings and matches per rule.
+
+SERIES = ["MP", "TM", "SX", "ST", "CB", "RG"]
+
+
+def master_codes(count, rng):
+    steelite = [f"{rng.randrange(1000, 9999)}{rng.choice(SERIES)}{rng.randrange(100, 999)}" for _ in range(count // 2)]
+    sanneng = [f"SN{n}" for n in range(1000, 1000 + count - len(steelite))]
+    return list(dict.fromkeys(steelite + sanneng))
+
+
+def mangle(code, rng):
+    roll = rng.random()
+    if roll < 0.4:
+        return code
+    if roll < 0.55:
+        return code.lower()
+    if roll < 0.65:
+        return f"{code[:4]}-{code[4:]}"
+    if roll < 0.75:
+        return f"{code}-{rng.choice([6, 12, 24])}"
+    if roll < 0.8:
+        return code[2:] if code.startswith("SN") else f"{code} 24/CS"
+    if roll < 0.9:
+        return code[:4] + code[5] + code[4] + code[6:]
+    return f"ZZ{code}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SKU resolution index build and lookup times")
+    parser.add_argument("--master", type=int, default=50_000)
+    parser.add_argument("--scraped", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    masters = master_codes(args.master, rng)
+    scraped = pd.Series([mangle(rng.choice(masters), rng) for _ in range(args.scraped)])
+
+    started = time.perf_counter()
+    index = SkuIndex(masters)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    resolved = index.resolve_series(scraped)
+    resolve_time = time.perf_counter() - started
+
+    print(f"Index over {len(index)} master codes built in {build_time:.2f}s")
+    print(f"Resolved {len(scraped)} scraped codes in {resolve_time:.2f}s ({len(scraped) / resolve_time:,.0f} codes/s)")
+    for rule, count in resolved["rule"].fillna("unmatched").value_counts().items():
+        print(f"  {rule:<12} {count:>7}")
+
+
+if __name__ == "__main__":
+    main()
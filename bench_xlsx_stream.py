@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import openpyxl
+import pandas as pd
+
+from bench_sanneng_merge import synthetic_data
+from sanneng_arranger_xlsx import merge_scraped_data, populate_excel
+
+# Populates a synthetic San Neng master workbook three ways: the pandas path the
+# arranger used before (read_excel, merge, to_excel), the streamed populate_excel
+# rewriting the whole sheet, and the streamed populate_excel patching only the changed
+# cells (xlsx_patch.py), then the patch run once more: the same changes were already
+# published, so that run only reads the sheet. Each run is a child process so its
+# peak RSS is its own.
+
+
+def write_workbook(df, path):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        sheet.append([None if pd.isna(v) else v for v in row])
+    workbook.save(path)
+
+
+def run_inmemory(excel_path, scraped):
+    df_excel = pd.read_excel(excel_path, engine="openpyxl")
+    merged, _ = merge_scraped_data(df_excel, scraped, "Mfr Catalog No.")
+    merged.to_excel(excel_path.replace(".xlsx", "_updated.xlsx"), index=False, engine="openpyxl")
+
+
+def run_streamed(excel_path, scraped):
+    populate_excel(excel_path, scraped)
+
+
+def child(mode, rows, seed, workdir):
+    _, scraped = synthetic_data(rows, seed)
+    excel_path = os.path.join(workdir, "master.xlsx")
+    started = time.perf_counter()
+    sys.stdout = open(os.devnull, "w")
+    (run_inmemory if mode == "in-memory" else run_streamed)(excel_path, scraped)
+    sys.stdout = sys.__stdout__
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{elapsed:.2f} {peak_mb:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory, streamed and patched San Neng workbook population")
+    parser.add_argument("--rows", type=int, nargs="+", default=[20_000, 200_000])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "ROWS", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, rows, workdir = args.child
+        child(mode, int(rows), args.seed, workdir)
+        return
+
+    header = f"{'rows':>10} {'mode':>10} {'seconds':>9} {'peak MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as workdir:
+            df_excel, _ = synthetic_data(rows, args.seed)
+            write_workbook(df_excel, os.path.join(workdir, "master.xlsx"))
+            for mode in ("in-memory", "rewrite", "patch", "republish"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--seed", str(args.seed), "--child", mode, str(rows), workdir],
+                    capture_output=True, text=True, check=True,
+                    env={**os.environ, "XLSX_UPDATE_MODE": "patch" if mode == "republish" else mode},
+                ).stdout.split()
+                print(f"{rows:>10} {mode:>10} {float(out[0]):>9.2f} {float(out[1]):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import json
+import re
+from urllib.parse import urlencode, urljoin, urlparse
+
+import lxml.html
+
+# Structured catalogue endpoints that return whole pages of products as JSON:
+#   Shopify  /products.json (250 per page) and /products/<handle>.js
+#   Magento  /graphql products query (up to a few hundred per page)
+# Both are normalised to one flat record so spiders and scripts can map it onto
+# their own columns.
+
+SHOPIFY_PAGE_SIZE = 250
+MAGENTO_PAGE_SIZE = 200
+
+_WHITESPACE = re.compile(r"\s+")
+_LABEL_VALUE = re.compile(r"^\s*([A-Za-z][A-Za-z /&().-]{1,40}?)\s*:\s*(.+?)\s*$")
+
+OPTION_FIELDS = {
+    "color": "color",
+    "colour": "color",
+    "material": "material",
+    "pattern": "pattern",
+    "size": "size",
+}
+
+SPEC_FIELDS = {
+    "material": ("material", "material type"),
+    "color": ("color", "colour"),
+    "pattern": ("pattern", "pattern name", "design"),
+    "length": ("length",),
+    "width": ("width",),
+    "height": ("height", "depth"),
+    "diameter": ("diameter",),
+    "volume": ("capacity", "volume"),
+    "model_number": ("model", "model number"),
+    "ean": ("ean", "ean code"),
+    "country_of_origin": ("country of origin", "made in"),
+}
+
+
+class CatalogApiError(Exception):
+    pass
+
+
+def load_json(body):
+    # Stores with the endpoint disabled answer with an HTML page, not an error status
+    try:
+        return json.loads(body)
+    except (TypeError, ValueError) as e:
+        raise CatalogApiError(f"not a JSON response: {e}") from e
+
+
+def html_text(html):
+    if not html:
+        return ""
+    try:
+        doc = lxml.html.fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        return _WHITESPACE.sub(" ", html).strip()
+    for node in doc.xpath("//script|//style"):
+        node.drop_tree()
+    return _WHITESPACE.sub(" ", " ".join(doc.itertext())).strip()
+
+
+def html_specs(html):
+    # Label/value pairs from spec tables and "Label: value" lines in a description
+    specs = {}
+    if not html:
+        return specs
+    try:
+        doc = lxml.html.fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        return specs
+    for row in doc.xpath("//tr"):
+        cells = [_WHITESPACE.sub(" ", c.text_content()).strip() for c in row.xpath("./th|./td")]
+        if len(cells) >= 2 and cells[0]:
+            specs.setdefault(cells[0].rstrip(":").lower(), cells[1])
+    for line in doc.xpath("//text()"):
+        match = _LABEL_VALUE.match(line)
+        if match:
+            specs.setdefault(match.group(1).lower(), match.group(2))
+    return specs
+
+
+def _blank_record():
+    return {
+        "name": "", "sku": "", "model_number": "", "barcode": "", "ean": "",
+        "image_link": "", "overview": "", "material": "", "color": "", "pattern": "",
+        "size": "", "length": "", "width": "", "height": "", "diameter": "", "volume": "",
+        "country_of_origin": "", "price": "", "in_stock": None, "categories": [],
+        "vendor": "", "product_url": "", "meta_description": "", "specs": {},
+    }
+
+
+def _apply_specs(record, specs):
+    record["specs"] = specs
+    for field, labels in SPEC_FIELDS.items():
+        if record.get(field):
+            continue
+        for label in labels:
+            if specs.get(label):
+                record[field] = specs[label]
+                break
+
+
+# Shopify
+
+def shopify_products_url(base_url, page=1, collection=None, limit=SHOPIFY_PAGE_SIZE):
+    path = f"collections/{collection}/products.json" if collection else "products.json"
+    return urljoin(base_url.rstrip("/") + "/", path) + "?" + urlencode({"limit": limit, "page": page})
+
+
+def shopify_product_js_url(product_url):
+    return product_url.split("?")[0].rstrip("/") + ".js"
+
+
+def shopify_products(payload):
+    if isinstance(payload, dict) and isinstance(payload.get("products"), list):
+        return payload["products"]
+    if isinstance(payload, dict) and "variants" in payload:
+        # A single /products/<handle>.js document
+        return [payload]
+    raise CatalogApiError("no products in Shopify response")
+
+
+def _shopify_image(product, variant):
+    featured = variant.get("featured_image")
+    if isinstance(featured, dict) and featured.get("src"):
+        return featured["src"]
+    images = product.get("images") or []
+    if images:
+        first = images[0]
+        return first.get("src", "") if isinstance(first, dict) else first
+    return product.get("featured_image") or ""
+
+
+def _shopify_price(value):
+    # products.json gives "12.50", the .js endpoint gives cents
+    if isinstance(value, int):
+        return f"{value / 100:.2f}"
+    return value or ""
+
+
+def shopify_records(product, base_url):
+    # One record per variant: each variant carries its own SKU, barcode and options
+    body = product.get("body_html") or product.get("description") or ""
+    overview = html_text(body)
+    specs = html_specs(body)
+    option_names = [
+        (o.get("name") if isinstance(o, dict) else o) or ""
+        for o in product.get("options") or []
+    ]
+    product_url = urljoin(base_url.rstrip("/") + "/", f"products/{product.get('handle', '')}")
+    variants = product.get("variants") or [{}]
+
+    records = []
+    for variant in variants:
+        record = _blank_record()
+        title = product.get("title") or ""
+        variant_title = variant.get("title") or ""
+        record["name"] = title if len(variants) == 1 or variant_title in ("", "Default Title") else f"{title} - {variant_title}"
+        record["sku"] = variant.get("sku") or ""
+        record["barcode"] = variant.get("barcode") or ""
+        record["image_link"] = _shopify_image(product, variant)
+        if record["image_link"].startswith("//"):
+            record["image_link"] = "https:" + record["image_link"]
+        record["overview"] = overview
+        record["price"] = _shopify_price(variant.get("price"))
+        record["in_stock"] = variant.get("available")
+        record["vendor"] = product.get("vendor") or ""
+        record["categories"] = [product["product_type"]] if product.get("product_type") else []
+        for position, name in enumerate(option_names, start=1):
+            field = OPTION_FIELDS.get(name.strip().lower())
+            value = variant.get(f"option{position}")
+            if field and value:
+                record[field] = value
+        record["product_url"] = product_url if len(variants) == 1 or not variant.get("id") else f"{product_url}?variant={variant['id']}"
+        _apply_specs(record, specs)
+        records.append(record)
+    return records
+
+
+# Magento
+
+MAGENTO_PRODUCTS_QUERY = """
+query ($search: String, $filter: ProductAttributeFilterInput, $pageSize: Int, $currentPage: Int) {
+  products(search: $search, filter: $filter, pageSize: $pageSize, currentPage: $currentPage) {
+    total_count
+    page_info { current_page total_pages }
+    items {
+      sku
+      name
+      url_key
+      url_suffix
+      stock_status
+      small_image { url }
+      image { url }
+      description { html }
+      short_description { html }
+      meta_description
+      categories { name }
+      price_range { minimum_price { regular_price { value currency } } }
+    }
+  }
+}
+"""
+
+
+def magento_graphql_url(base_url, search=None, filters=None, page=1, page_size=MAGENTO_PAGE_SIZE):
+    # GET keeps the query cacheable (Magento serves GraphQL GETs through its page cache)
+    variables = {"pageSize": page_size, "currentPage": page}
+    if search:
+        variables["search"] = search
+    if filters:
+        variables["filter"] = filters
+    query = _WHITESPACE.sub(" ", MAGENTO_PRODUCTS_QUERY).strip()
+    params = {"query": query, "variables": json.dumps(variables, separators=(",", ":"))}
+    return f"{graphql_endpoint(base_url)}?{urlencode(params)}"
+
+
+def graphql_endpoint(base_url):
+    parsed = urlparse(base_url)
+    return f"{parsed.scheme}://{parsed.netloc}/graphql"
+
+
+def magento_store_headers(base_url):
+    # Store views under a path prefix (silikomart.com/en/) use it as the store code;
+    # without the header GraphQL answers for the default store view
+    prefix = urlparse(base_url).path.strip("/").split("/")[0]
+    return {"Store": prefix} if prefix else {}
+
+
+def magento_products(payload):
+    # Returns (items, total_pages)
+    if not isinstance(payload, dict):
+        raise CatalogApiError("unexpected GraphQL response")
+    if payload.get("errors"):
+        raise CatalogApiError("; ".join(e.get("message", "?") for e in payload["errors"]))
+    products = (payload.get("data") or {}).get("products")
+    if not products:
+        raise CatalogApiError("no products in GraphQL response")
+    total_pages = (products.get("page_info") or {}).get("total_pages") or 1
+    return products.get("items") or [], int(total_pages)
+
+
+def magento_record(item, base_url):
+    record = _blank_record()
+    record["name"] = item.get("name") or ""
+    record["sku"] = item.get("sku") or ""
+    image = (item.get("image") or {}).get("url") or (item.get("small_image") or {}).get("url") or ""
+    record["image_link"] = "" if "placeholder" in image else image
+    description = (item.get("description") or {}).get("html") or ""
+    short_description = (item.get("short_description") or {}).get("html") or ""
+    record["overview"] = html_text(description) or html_text(short_description)
+    record["meta_description"] = (item.get("meta_description") or "").strip()
+    price = ((item.get("price_range") or {}).get("minimum_price") or {}).get("regular_price") or {}
+    record["price"] = price.get("value", "")
+    status = item.get("stock_status")
+    record["in_stock"] = None if status is None else status == "IN_STOCK"
+    record["categories"] = [c["name"] for c in item.get("categories") or [] if c.get("name")]
+    if item.get("url_key"):
+        suffix = item.get("url_suffix")
+        suffix = ".html" if suffix is None else suffix
+        record["product_url"] = urljoin(base_url.rstrip("/") + "/", f"{item['url_key']}{suffix}")
+    _apply_specs(record, html_specs(description))
+    return record
+
+
+def magento_url_key(product_url):
+    # https://host/store/some-product.html -> some-product
+    path = urlparse(product_url).path.rstrip("/")
+    key = path.rsplit("/", 1)[-1]
+    return key[:-5] if key.endswith(".html") else key
@@ -1,5 +1,6 @@
 import pandas as pd
-import csv
+
+from product_dataset import read_source
 
 # Check Excel
 df_excel = pd.read_excel('results/STEELITE_Populated_v0.5.xlsx')
@@ -10,22 +11,16 @@ print(f'  Sample Mfr Codes (first 10):')
 for code in df_excel["Mfr Catalog No."].head(10):
     print(f'    {code}')
 
-# Check steelitehome CSV
-with open('steelite/steelitehome_products.csv', encoding='utf-8') as f:
-    rows = list(csv.DictReader(f))
-    print(f'\nSteeliteHome CSV:')
-    print(f'  Total products: {len(rows)}')
-    print(f'  Has images: {sum(1 for r in rows if r.get("image_link") and r["image_link"] != "N/A")}')
-    print(f'  Sample manufacturers (first 5):')
-    for r in rows[:5]:
-        print(f'    {r["manufacturer"][:30]}')
+def load_spider(name):
+    # Parquet dataset if the spider wrote one, else its CSV; only the two columns used here
+    return read_source('steelite/dataset', name, columns=['manufacturer', 'image_link'],
+                       csv_path=f'steelite/{name}_products.csv')
 
-# Check wasserstrom CSV  
-with open('steelite/wasserstrom_products.csv', encoding='utf-8') as f:
-    rows = list(csv.DictReader(f))
-    print(f'\nWasserstrom CSV:')
-    print(f'  Total products: {len(rows)}')
-    print(f'  Has images: {sum(1 for r in rows if r.get("image_link") and r["image_link"] != "N/A")}')
+for name, label in [('steelitehome', 'SteeliteHome'), ('wasserstrom', 'Wasserstrom')]:
+    df = load_spider(name)
+    print(f'\n{label} CSV:')
+    print(f'  Total products: {len(df)}')
+    print(f'  Has images: {df["image_link"].notna().sum() if "image_link" in df else 0}')
     print(f'  Sample manufacturers (first 5):')
-    for r in rows[:5]:
-        print(f'    {r["manufacturer"][:30]}')
+    for code in df['manufacturer'].head(5) if 'manufacturer' in df else []:
+        print(f'    {str(code)[:30]}')
@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_JOBS_DIR = PROJECT_ROOT / ".crawl_state" / "jobs"
+
+_open_jobs = {}
+_open_jobs_lock = threading.Lock()
+
+
+def job_dir(job, base=None):
+    return Path(base or os.getenv("CRAWL_JOBS_DIR", str(DEFAULT_JOBS_DIR))) / job
+
+
+def new_crawl_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def item_sku(item):
+    for field in ("item_sku", "sku"):
+        value = item.get(field)
+        if value and value != "N/A":
+            return str(value)
+    return ""
+
+
+class CheckpointStore:
+    # Crash-safe crawl state, committed to SQLite as the crawl runs:
+    #   pending  - requests scheduled but whose callback has not finished
+    #   done     - fingerprints of requests whose callback finished
+    #   failed   - requests whose download or callback failed for good
+    #   emitted  - (sku, product_url) pairs already handed to the pipelines
+    # Scrapy's own JOBDIR queues are only consistent after a clean shutdown;
+    # this store survives a kill -9 at any point.
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint TEXT NOT NULL,
+                url TEXT NOT NULL,
+                request BLOB NOT NULL,
+                scheduled_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS done (
+                fingerprint TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                finished_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS failed (
+                fingerprint TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                reason TEXT,
+                failed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS emitted (
+                sku TEXT NOT NULL,
+                url TEXT NOT NULL,
+                emitted_at REAL NOT NULL,
+                PRIMARY KEY (sku, url)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self.db.commit()
+        # Decided once, before anything below changes the status
+        self.resuming = self.get_meta("status") == "running"
+        # Every run of a resumed job belongs to the same crawl; a job that starts over is a new one
+        self.crawl_id = (self.resuming and self.get_meta("crawl_id")) or new_crawl_id()
+        self.started_at = float((self.resuming and self.get_meta("started_at")) or time.time())
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+            self.db.commit()
+
+    def begin(self, spider_name):
+        if not self.resuming:
+            with self._lock:
+                for table in ("pending", "done", "failed", "emitted", "meta"):
+                    self.db.execute(f"DELETE FROM {table}")
+                self.db.commit()
+            self.set_meta("spider", spider_name)
+            self.set_meta("crawl_id", self.crawl_id)
+            self.set_meta("started_at", self.started_at)
+        self.set_meta("runs", int(self.get_meta("runs", 0)) + 1)
+        self.set_meta("status", "running")
+
+    def finish(self):
+        with self._lock:
+            self.db.execute("DELETE FROM pending")
+            self.db.commit()
+        self.set_meta("status", "finished")
+
+    def add_pending(self, fingerprint, url, request_blob):
+        with self._lock:
+            cursor = self.db.execute(
+                "INSERT INTO pending (fingerprint, url, request, scheduled_at) VALUES (?, ?, ?, ?)",
+                (fingerprint, url, request_blob, time.time()),
+            )
+            self.db.commit()
+            return cursor.lastrowid
+
+    def take_pending(self):
+        # Pending rows are re-inserted when the requests are scheduled again
+        with self._lock:
+            rows = self.db.execute("SELECT request FROM pending ORDER BY id").fetchall()
+            self.db.execute("DELETE FROM pending")
+            self.db.commit()
+        return [row[0] for row in rows]
+
+    def complete(self, pending_id, fingerprint, url):
+        with self._lock:
+            if pending_id is not None:
+                self.db.execute("DELETE FROM pending WHERE id = ?", (pending_id,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO done (fingerprint, url, finished_at) VALUES (?, ?, ?)",
+                (fingerprint, url, time.time()),
+            )
+            self.db.commit()
+
+    def fail(self, pending_id, fingerprint, url, reason):
+        with self._lock:
+            if pending_id is not None:
+                self.db.execute("DELETE FROM pending WHERE id = ?", (pending_id,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO failed (fingerprint, url, reason, failed_at) VALUES (?, ?, ?, ?)",
+                (fingerprint, url, reason, time.time()),
+            )
+            self.db.commit()
+
+    def discard(self, pending_id):
+        # A request that was never going to run (dropped as a duplicate, ignored)
+        if pending_id is None:
+            return
+        with self._lock:
+            self.db.execute("DELETE FROM pending WHERE id = ?", (pending_id,))
+            self.db.commit()
+
+    def is_done(self, fingerprint):
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM done WHERE fingerprint = ?", (fingerprint,)).fetchone() is not None
+
+    def is_emitted(self, sku, url):
+        with self._lock:
+            return self.db.execute(
+                "SELECT 1 FROM emitted WHERE sku = ? AND url = ?", (sku, url or "")
+            ).fetchone() is not None
+
+    def mark_emitted(self, sku, url):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO emitted (sku, url, emitted_at) VALUES (?, ?, ?)",
+                (sku, url or "", time.time()),
+            )
+            self.db.commit()
+
+    def counts(self):
+        with self._lock:
+            return {
+                table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("pending", "done", "failed", "emitted")
+            }
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def open_job(job, base=None):
+    # The middleware and the CSV pipeline share one store per job, so both agree
+    # on whether this run is a resume
+    path = job_dir(job, base) / "checkpoint.sqlite"
+    with _open_jobs_lock:
+        store = _open_jobs.get(path)
+        if store is None:
+            store = CheckpointStore(path)
+            _open_jobs[path] = store
+        return store
+
+
+def close_job(store):
+    with _open_jobs_lock:
+        _open_jobs.pop(store.path, None)
+    store.close()
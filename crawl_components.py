@@ -0,0 +1,1100 @@
+import csv
+import os
+import pickle
+import time
+from pathlib import Path
+
+from itemadapter import ItemAdapter, is_item
+from scrapy import Request, signals
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers, TextResponse
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.asyncio import create_looping_call
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.request import request_from_dict
+from twisted.internet.threads import deferToThread
+
+from adaptive_throttle import AdaptiveThrottle
+from crawl_checkpoint import close_job, item_sku, new_crawl_id, open_job
+from crawl_fingerprints import merge_csv_snapshot
+from crawl_telemetry import render_wait_seconds, telemetry_for, url_domain
+from csv_stream import CsvStreamWriter
+from fixture_corpus import portable_meta, record_fixture
+from http_cache import ResponseCache
+from playwright_tuning import PageRateLog
+from product_dataset import HAVE_ARROW, ParquetStreamWriter, mark_finished
+from product_schema import normalize_records
+from product_store import ProductStore
+from render_routing import BROWSER, STATIC, RenderRouter, route_host, selector_present
+from replay_server import replay_url
+from warc_archive import WarcArchive
+
+PROJECT_ROOT = Path(__file__).parent
+REPLAY_STATE_DIR = PROJECT_ROOT / ".crawl_state" / "replay"
+
+# Scrapy components shared by both projects (steelite/ and sanneng/). Each project
+# imports them into its own middlewares.py, pipelines.py, extensions.py or replay.py,
+# and its settings.py enables them from there, e.g. "steelite.middlewares.ResponseCacheMiddleware".
+# The project is the crawler's BOT_NAME wherever a component needs it.
+
+
+
+# Downloader middlewares
+
+def render_probe_hit(request, response):
+    # None when the response carries no render probe, else whether its raw HTML has the
+    # selector; shared by the cache (which runs first) and RenderRoutingMiddleware
+    selector = request.meta.get("render_probe")
+    if not selector or response.status != 200:
+        return None
+    if "render_probe_hit" not in request.meta:
+        request.meta["render_probe_hit"] = isinstance(response, TextResponse) and selector_present(response.text, selector)
+    return request.meta["render_probe_hit"]
+
+
+class ResponseCacheMiddleware:
+    # Serves fresh responses from the shared on-disk cache (http_cache.py) and
+    # revalidates stale ones with If-None-Match / If-Modified-Since. Entries are
+    # keyed on the render mode too: a rendered page never answers a plain fetch.
+
+    def __init__(self, cache, default_ttl, ttl_per_spider, stats):
+        self.cache = cache
+        self.default_ttl = default_ttl
+        self.ttl_per_spider = ttl_per_spider
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("RESPONSE_CACHE_ENABLED"):
+            raise NotConfigured
+        cache = ResponseCache(
+            cache_dir=settings.get("RESPONSE_CACHE_DIR"),
+            max_bytes=settings.getint("RESPONSE_CACHE_MAX_BYTES"),
+        )
+        s = cls(
+            cache,
+            settings.getint("RESPONSE_CACHE_TTL"),
+            settings.getdict("RESPONSE_CACHE_TTL_PER_SPIDER"),
+            crawler.stats,
+        )
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _ttl(self, spider):
+        return int(self.ttl_per_spider.get(spider.name, self.default_ttl))
+
+    @staticmethod
+    def _render(request):
+        # Runs after RenderRoutingMiddleware, so meta["playwright"] is already decided
+        return BROWSER if request.meta.get("playwright") else STATIC
+
+    async def _io(self, func, *args):
+        # SQLite lookups, gzip and body files are handled in the reactor's thread pool
+        return await maybe_deferred_to_future(deferToThread(func, *args))
+
+    def _cached_response(self, request, entry):
+        body = self.cache.load_body(entry)
+        headers = Headers(entry.headers)
+        respcls = responsetypes.from_args(headers=headers, url=entry.url, body=body)
+        return respcls(url=entry.url, status=entry.status, headers=headers, body=body, request=request, flags=["cached"])
+
+    def _revalidated_response(self, request, render):
+        entry = self.cache.get(request.url, render)
+        if entry is None:
+            return None
+        self.cache.revalidated(entry)
+        return self._cached_response(request, entry)
+
+    async def process_request(self, request, spider):
+        if request.method != "GET" or request.meta.get("dont_cache"):
+            return None
+
+        render = self._render(request)
+        entry = await self._io(self.cache.get, request.url, render)
+        if entry is None:
+            self.stats.inc_value("response_cache/miss", spider=spider)
+            return None
+
+        if entry.is_fresh(self._ttl(spider)):
+            self.stats.inc_value("response_cache/hit", spider=spider)
+            return await self._io(self._cached_response, request, entry)
+
+        # A browser navigation can't be answered with a bare 304, so rendered pages are simply refetched
+        if render == BROWSER:
+            self.stats.inc_value("response_cache/stale", spider=spider)
+            return None
+
+        for name, value in entry.conditional_headers().items():
+            request.headers[name] = value
+        request.meta["response_cache_revalidate"] = True
+        return None
+
+    async def process_response(self, request, response, spider):
+        if "cached" in response.flags or request.method != "GET" or request.meta.get("dont_cache"):
+            return response
+
+        render = self._render(request)
+        if response.status == 304 and request.meta.get("response_cache_revalidate"):
+            cached = await self._io(self._revalidated_response, request, render)
+            if cached is not None:
+                self.stats.inc_value("response_cache/revalidated", spider=spider)
+                return cached
+
+        # A static page that failed the render probe is retried in the browser; caching it
+        # would hand the same incomplete page to the callback on the next run
+        if response.status == 200 and render_probe_hit(request, response) is not False:
+            headers = {
+                k.decode("latin-1"): v[-1].decode("latin-1")
+                for k, v in response.headers.items()
+                if v
+            }
+            await self._io(self.cache.put, request.url, response.status, headers, response.body, render)
+            self.stats.inc_value("response_cache/stored", spider=spider)
+        return response
+
+    def spider_closed(self, spider):
+        stats = self.stats
+        spider.logger.info(
+            "Response cache: %s hits, %s revalidated (304), %s misses, %s stored",
+            stats.get_value("response_cache/hit", 0, spider=spider),
+            stats.get_value("response_cache/revalidated", 0, spider=spider),
+            stats.get_value("response_cache/miss", 0, spider=spider),
+            stats.get_value("response_cache/stored", 0, spider=spider),
+        )
+        self.cache.close()
+
+
+class RenderRoutingMiddleware:
+    # Sends each request through plain HTTP or the Playwright browser according to
+    # RENDER_ROUTES (see render_routing.py). A static fetch whose HTML lacks the
+    # selector the callback needs is retried once in the browser before the spider
+    # sees it. meta["render"] = "static" / "browser" overrides the route for a request.
+
+    def __init__(self, router, stats):
+        self.router = router
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("RENDER_ROUTING_ENABLED"):
+            raise NotConfigured
+        router = RenderRouter(
+            settings.getdict("RENDER_ROUTES"),
+            misses=settings.getint("RENDER_PROBE_MISSES"),
+            path=settings.get("RENDER_ROUTES_PATH"),
+        )
+        mw = cls(router, crawler.stats)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def process_request(self, request, spider):
+        meta = request.meta
+        if meta.get("render_fallback"):
+            return None
+
+        callback = getattr(request.callback, "__name__", "parse")
+        selector = meta.get("render_selector") or self.router.selector_for(
+            request.url, callback, meta.get("playwright_page_methods")
+        )
+        mode = meta.get("render") or self.router.mode_for(request.url, selector)
+        if mode == BROWSER:
+            meta["playwright"] = True
+            self.stats.inc_value("render_routing/browser")
+        elif mode == STATIC:
+            meta["playwright"] = False
+            if selector:
+                meta["render_probe"] = selector
+            self.stats.inc_value("render_routing/static")
+        return None
+
+    def process_response(self, request, response, spider):
+        hit = render_probe_hit(request, response)
+        if hit is None:
+            return response
+
+        # Cached pages (stored before the probe ran, or revalidated) are probed like
+        # fresh ones but don't count again towards the route decision
+        selector = request.meta["render_probe"]
+        if "cached" not in response.flags and self.router.record_probe(request.url, selector, hit):
+            decision = "plain HTTP" if hit else "the browser"
+            spider.logger.info(f"Render routing: {route_host(request.url)} '{selector}' now goes through {decision}")
+        if hit:
+            self.stats.inc_value("render_routing/probe_hit")
+            return response
+
+        self.stats.inc_value("render_routing/fallback")
+        meta = dict(request.meta)
+        meta.pop("render_probe")
+        meta.pop("render_probe_hit")
+        meta.update(playwright=True, render_fallback=True)
+        return request.replace(meta=meta, dont_filter=True)
+
+    def spider_closed(self, spider):
+        self.router.save()
+        spider.logger.info(
+            "Render routing: %s static, %s browser, %s rendered after a static miss",
+            self.stats.get_value("render_routing/static", 0),
+            self.stats.get_value("render_routing/browser", 0),
+            self.stats.get_value("render_routing/fallback", 0),
+        )
+
+
+class PlaywrightPagePoolMiddleware:
+    # Keeps up to PLAYWRIGHT_PAGE_POOL_SIZE rendered pages open after their response
+    # and hands them to the next playwright request, so a page (and its renderer
+    # process) is not created and torn down for every URL. Also measures rendered
+    # pages per second for the spider and compares it with the last run in the
+    # other mode (pool on vs PLAYWRIGHT_PAGE_POOL_SIZE=0).
+
+    def __init__(self, pool_size, stats, rate_log):
+        self.pool_size = pool_size
+        self.stats = stats
+        self.rate_log = rate_log
+        self.pools = {}
+        self.pages = 0
+        self.started = None
+        self.last_page = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        mw = cls(
+            settings.getint("PLAYWRIGHT_PAGE_POOL_SIZE"),
+            crawler.stats,
+            PageRateLog(settings.get("PLAYWRIGHT_RATES_PATH")),
+        )
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _poolable(self, request):
+        # Pages the spider keeps itself, or that carry per-request hooks, are left alone
+        meta = request.meta
+        return (
+            self.pool_size > 0
+            and not meta.get("playwright_include_page")
+            and not meta.get("playwright_page")
+            and not meta.get("playwright_page_event_handlers")
+            and not meta.get("playwright_page_init_callback")
+        )
+
+    def process_request(self, request, spider):
+        if not request.meta.get("playwright"):
+            return None
+        if self.started is None:
+            self.started = time.monotonic()
+        if not self._poolable(request):
+            return None
+
+        pool = self.pools.setdefault(request.meta.get("playwright_context", "default"), [])
+        while pool:
+            page = pool.pop()
+            if not page.is_closed():
+                request.meta["playwright_page"] = page
+                self.stats.inc_value("playwright_pool/reused", spider=spider)
+                break
+        request.meta["playwright_include_page"] = True
+        request.meta["page_pool"] = True
+        return None
+
+    async def _release(self, request, spider):
+        page = request.meta.pop("playwright_page", None)
+        request.meta.pop("playwright_include_page", None)
+        request.meta.pop("page_pool", None)
+        if page is None or page.is_closed():
+            return
+        pool = self.pools.setdefault(request.meta.get("playwright_context", "default"), [])
+        if len(pool) < self.pool_size:
+            pool.append(page)
+            return
+        try:
+            await page.close()
+        except Exception as e:
+            spider.logger.debug(f"Page pool: closing surplus page failed: {e}")
+
+    async def process_response(self, request, response, spider):
+        if not request.meta.get("playwright") or "cached" in response.flags:
+            return response
+        self.pages += 1
+        self.last_page = time.monotonic()
+        if request.meta.get("page_pool"):
+            await self._release(request, spider)
+        return response
+
+    async def process_exception(self, request, exception, spider):
+        # A page that failed mid-navigation is not trusted again
+        if not request.meta.get("page_pool"):
+            return None
+        request.meta.pop("playwright_include_page", None)
+        request.meta.pop("page_pool", None)
+        page = request.meta.pop("playwright_page", None)
+        if page is not None and not page.is_closed():
+            try:
+                await page.close()
+            except Exception:
+                pass
+        return None
+
+    async def spider_closed(self, spider):
+        for pool in self.pools.values():
+            for page in pool:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+        self.pools = {}
+
+        if not self.pages or self.started is None:
+            return
+        seconds = max(self.last_page - self.started, 1e-6)
+        mode = "pooled" if self.pool_size > 0 else "unpooled"
+        rates = self.rate_log.record(spider.name, mode, self.pages, seconds)
+        rate = rates[mode]["pages_per_second"]
+        self.stats.set_value("playwright_pool/pages_per_second", rate, spider=spider)
+
+        message = (
+            f"Rendered {self.pages} pages in {seconds:.1f}s ({rate:.2f} pages/s, {mode}, "
+            f"{self.stats.get_value('playwright_pool/reused', 0, spider=spider)} reused pages, "
+            f"{self.stats.get_value('playwright/request_count/aborted', 0)} blocked subrequests)"
+        )
+        other = rates.get("unpooled" if mode == "pooled" else "pooled")
+        if other and other["pages_per_second"]:
+            baseline, tuned = (other, rates[mode]) if mode == "pooled" else (rates[mode], other)
+            gain = (tuned["pages_per_second"] / baseline["pages_per_second"] - 1) * 100
+            message += f"; pooled vs unpooled: {gain:+.0f}%"
+        spider.logger.info(message)
+
+
+class FixtureRecorderMiddleware:
+    # Saves the first FIXTURE_RECORD_PER_CALLBACK responses of each callback into
+    # fixtures/<project>/<spider>/ for fixture_corpus.py and bench_parsers.py, enabled
+    # by FIXTURE_RECORD (scrapy crawl <spider> -s FIXTURE_RECORD=1). Sits next to
+    # the downloader, so rendered pages are saved as the callback sees them, and
+    # replayed ResponseCache entries can be recorded without the network.
+
+    def __init__(self, project, limit, stats):
+        self.project = project
+        self.limit = limit
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("FIXTURE_RECORD"):
+            raise NotConfigured
+        return cls(s.get("BOT_NAME"), s.getint("FIXTURE_RECORD_PER_CALLBACK", 2), crawler.stats)
+
+    def process_response(self, request, response, spider):
+        if response.status != 200:
+            return response
+        callback = getattr(request.callback, "__name__", None) or "parse"
+        name = record_fixture(self.project, spider.name, request, response, callback, self.limit)
+        if name:
+            self.stats.inc_value("fixtures/recorded")
+            spider.logger.info(f"Fixture: saved {response.url} as {spider.name}/{name}")
+        return response
+
+
+class WarcArchiveMiddleware:
+    # Writes every response, as received, to WARC files (see warc_archive.py) so
+    # a spider's callbacks can be rerun over them after a selector fix with
+    # `warc_archive.py reextract <project> <spider>`. Enabled by
+    # WARC_ARCHIVE_ENABLED; sits next to the downloader, before decompression.
+
+    def __init__(self, archive, stats):
+        self.archive = archive
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("WARC_ARCHIVE_ENABLED"):
+            raise NotConfigured
+        archive = WarcArchive(s.get("WARC_ARCHIVE_DIR"), s.getint("WARC_ARCHIVE_MAX_BYTES"))
+        mw = cls(archive, crawler.stats)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def process_response(self, request, response, spider):
+        headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, values in response.headers.items() for v in values]
+        written = self.archive.write(
+            spider.name, response.url, response.status, headers, response.body,
+            callback=getattr(request.callback, "__name__", None) or "parse",
+            cb_kwargs={k: v for k, v in request.cb_kwargs.items() if isinstance(v, (str, int, float, bool, type(None)))},
+            meta=portable_meta(request.meta),
+        )
+        if written:
+            self.stats.inc_value("warc/records")
+            self.stats.inc_value("warc/bytes", written)
+        else:
+            self.stats.inc_value("warc/unchanged")
+        return response
+
+    def spider_closed(self, spider):
+        spider.logger.info(
+            f"WARC archive: {self.stats.get_value('warc/records', 0)} responses "
+            f"({self.stats.get_value('warc/bytes', 0) / 1024 ** 2:.1f} MB) written to {self.archive.directory}, "
+            f"{self.stats.get_value('warc/unchanged', 0)} unchanged"
+        )
+        self.archive.close()
+
+
+# Spider middlewares
+
+class CheckpointMiddleware:
+    # Spider middleware that makes a crawl resumable after any interruption,
+    # enabled by CHECKPOINT_JOB (scrapy crawl <spider> --resume <job>).
+    # Every scheduled request is recorded as pending and only marked done once
+    # its callback has finished, so a restart re-queues exactly the unfinished
+    # frontier and never refetches completed pages or re-emits products.
+
+    def __init__(self, crawler, store):
+        self.crawler = crawler
+        self.store = store
+        self.stats = crawler.stats
+        self.resumed = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        job = crawler.settings.get("CHECKPOINT_JOB")
+        if not job:
+            raise NotConfigured
+        mw = cls(crawler, open_job(job, crawler.settings.get("CHECKPOINT_DIR")))
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(mw.request_dropped, signal=signals.request_dropped)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _fingerprint(self, request):
+        return self.crawler.request_fingerprinter.fingerprint(request).hex()
+
+    def spider_opened(self, spider):
+        self.store.begin(spider.name)
+        if not self.store.resuming:
+            spider.logger.info(f"Checkpoint: new job in {self.store.path.parent}")
+            return
+
+        pending = self.store.take_pending()
+        counts = self.store.counts()
+        spider.logger.info(
+            f"Checkpoint: resuming {self.store.path.parent.name} "
+            f"({counts['done']} requests done, {counts['emitted']} products emitted, {len(pending)} pending)"
+        )
+        for blob in pending:
+            request = request_from_dict(pickle.loads(blob), spider=spider)
+            self.resumed.add(self._fingerprint(request))
+            self.crawler.engine.crawl(request.replace(dont_filter=True))
+        self.stats.set_value("checkpoint/resumed_pending", len(pending))
+
+    def request_scheduled(self, request, spider):
+        if "checkpoint_id" in request.meta:
+            # A retry or render fallback of a request that is already pending
+            return
+        try:
+            blob = pickle.dumps(request.to_dict(spider=spider), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            spider.logger.debug(f"Checkpoint: cannot persist {request.url}: {e}")
+            return
+        request.meta["checkpoint_id"] = self.store.add_pending(self._fingerprint(request), request.url, blob)
+
+    def request_dropped(self, request, spider):
+        # request_scheduled fires before the dupefilter; a duplicate never runs
+        self.store.discard(request.meta.get("checkpoint_id"))
+        self.stats.inc_value("checkpoint/dropped")
+
+    def _check(self, entry, parent):
+        # False drops the entry; an item returns the (sku, url) key to record once it is passed on
+        if isinstance(entry, Request) and self.store.resuming:
+            # A callback re-yielding its own request (429 retry) is never skipped
+            fingerprint = self._fingerprint(entry)
+            if fingerprint != parent and self.store.is_done(fingerprint):
+                self.stats.inc_value("checkpoint/skipped_done")
+                return False
+        elif is_item(entry):
+            adapter = ItemAdapter(entry)
+            key = (item_sku(adapter), adapter.get("product_url"))
+            if self.store.is_emitted(*key):
+                self.stats.inc_value("checkpoint/skipped_emitted")
+                return False
+            return key
+        return None
+
+    def process_spider_output(self, response, result, spider):
+        parent = self._fingerprint(response.request)
+        for entry in result:
+            key = self._check(entry, parent)
+            if key is False:
+                continue
+            yield entry
+            if key:
+                # Recorded once the pipelines have it; a crash in between repeats the row rather than losing it
+                self.store.mark_emitted(*key)
+        self.store.complete(response.request.meta.get("checkpoint_id"), parent, response.request.url)
+
+    async def process_spider_output_async(self, response, result, spider):
+        parent = self._fingerprint(response.request)
+        async for entry in result:
+            key = self._check(entry, parent)
+            if key is False:
+                continue
+            yield entry
+            if key:
+                self.store.mark_emitted(*key)
+        self.store.complete(response.request.meta.get("checkpoint_id"), parent, response.request.url)
+
+    def process_spider_exception(self, response, exception, spider):
+        # The callback (or a middleware before it) raised: nothing of this page will come
+        request = response.request
+        self.store.fail(request.meta.get("checkpoint_id"), self._fingerprint(request), request.url, repr(exception))
+        self.stats.inc_value("checkpoint/failed")
+        return None
+
+    async def process_start(self, start):
+        async for entry in start:
+            if self.store.resuming and isinstance(entry, Request):
+                fingerprint = self._fingerprint(entry)
+                if fingerprint in self.resumed or self.store.is_done(fingerprint):
+                    self.stats.inc_value("checkpoint/skipped_done")
+                    continue
+            yield entry
+
+    def spider_closed(self, spider, reason):
+        counts = self.store.counts()
+        if reason == "finished":
+            self.store.finish()
+            spider.logger.info(
+                f"Checkpoint: job finished ({counts['done']} requests, {counts['failed']} failed, "
+                f"{counts['emitted']} products)"
+            )
+        else:
+            spider.logger.info(
+                f"Checkpoint: stopped ({reason}) with {counts['pending']} pending; "
+                f"rerun with --resume {self.store.path.parent.name} to continue"
+            )
+        close_job(self.store)
+
+
+class CheckpointDownloaderMiddleware:
+    # Download failures never reach the spider middlewares (the errback is called
+    # directly), so this ends their pending rows in CheckpointMiddleware's job.
+    # Placed below RetryMiddleware, it only sees exceptions retries gave up on.
+
+    def __init__(self, crawler, store):
+        self.crawler = crawler
+        self.store = store
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        job = crawler.settings.get("CHECKPOINT_JOB")
+        if not job:
+            raise NotConfigured
+        return cls(crawler, open_job(job, crawler.settings.get("CHECKPOINT_DIR")))
+
+    def process_exception(self, request, exception, spider):
+        pending_id = request.meta.get("checkpoint_id")
+        if isinstance(exception, IgnoreRequest):
+            self.store.discard(pending_id)
+            return None
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        self.store.fail(pending_id, fingerprint, request.url, repr(exception))
+        self.stats.inc_value("checkpoint/failed")
+        return None
+
+
+class TelemetrySpiderMiddleware:
+    # Callback and pipeline timings for TelemetryExtension. Sits next to the spider,
+    # so only the time spent producing each entry is counted as callback time, not
+    # what later middlewares and the engine do with it; an item's pipeline time runs
+    # from here to its item_scraped/item_dropped signal.
+
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("TELEMETRY_ENABLED"):
+            raise NotConfigured
+        return cls(telemetry_for(crawler, directory=s.get("TELEMETRY_DIR"), fmt=s.get("TELEMETRY_FORMAT", "jsonl")))
+
+    def _callback_name(self, response):
+        callback = response.request.callback if response.request is not None else None
+        return getattr(callback, "__name__", None) or "parse"
+
+    def process_spider_output(self, response, result, spider):
+        name = self._callback_name(response)
+        spent = 0.0
+        iterator = iter(result)
+        while True:
+            started = time.perf_counter()
+            try:
+                entry = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                spent += time.perf_counter() - started
+            if is_item(entry):
+                self.telemetry.item_yielded(entry)
+            yield entry
+        self.telemetry.observe("callback", name, spent)
+
+    async def process_spider_output_async(self, response, result, spider):
+        name = self._callback_name(response)
+        spent = 0.0
+        iterator = result.__aiter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                entry = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                spent += time.perf_counter() - started
+            if is_item(entry):
+                self.telemetry.item_yielded(entry)
+            yield entry
+        self.telemetry.observe("callback", name, spent)
+
+
+# Extensions
+
+class AdaptiveThrottleExtension:
+    # Sets each downloader slot's concurrency and delay from the per-domain AIMD
+    # controller in adaptive_throttle.py, fed with every response's status, latency and
+    # Retry-After, and with download errors. DOWNLOAD_DELAY and
+    # CONCURRENT_REQUESTS_PER_DOMAIN only set where a domain starts the first time;
+    # after that it starts from the rate learned last run.
+
+    def __init__(self, crawler, throttle, debug):
+        self.crawler = crawler
+        self.throttle = throttle
+        self.debug = debug
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("ADAPTIVE_THROTTLE_ENABLED"):
+            raise NotConfigured
+        if s.getbool("AUTOTHROTTLE_ENABLED"):
+            # Both would set the slot delay on every response
+            raise NotConfigured("AutoThrottle is enabled, leaving the delay to it")
+        throttle = AdaptiveThrottle(
+            start_delay=s.getfloat("DOWNLOAD_DELAY"),
+            start_concurrency=s.getint("CONCURRENT_REQUESTS_PER_DOMAIN"),
+            min_delay=s.getfloat("ADAPTIVE_THROTTLE_MIN_DELAY", 0.25),
+            max_delay=s.getfloat("ADAPTIVE_THROTTLE_MAX_DELAY", 120),
+            max_concurrency=s.getint("ADAPTIVE_THROTTLE_MAX_CONCURRENCY", 4),
+            max_pause=s.getfloat("ADAPTIVE_THROTTLE_MAX_PAUSE", 600),
+            path=s.get("ADAPTIVE_THROTTLE_STATE_PATH"),
+        )
+        ext = cls(crawler, throttle, s.getbool("ADAPTIVE_THROTTLE_DEBUG"))
+        crawler.signals.connect(ext.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(ext.request_left_downloader, signal=signals.request_left_downloader)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def _apply(self, request):
+        key = request.meta.get("download_slot")
+        slot = self.crawler.engine.downloader.slots.get(key) if key else None
+        rate = self.throttle.state(request.url)
+        if slot is not None:
+            slot.concurrency = rate.slots
+            slot.delay = rate.current_delay()
+        return rate
+
+    def request_reached_downloader(self, request, spider):
+        request.meta["adaptive_throttle_sent"] = time.monotonic()
+        self._apply(request)
+
+    def response_downloaded(self, response, request, spider):
+        request.meta["adaptive_throttle_answered"] = True
+        verdict = self.throttle.on_response(
+            request.url,
+            response.status,
+            latency=request.meta.get("download_latency"),
+            retry_after=response.headers.get("Retry-After"),
+            sent_at=request.meta.get("adaptive_throttle_sent"),
+            kind="browser" if request.meta.get("playwright") else "static",
+        )
+        self.stats.inc_value(f"adaptive_throttle/{verdict}")
+        rate = self._apply(request)
+        if verdict == "throttled":
+            spider.logger.info(
+                f"Adaptive throttle: {response.status} from {request.url}, now {rate.slots} in flight, "
+                f"{rate.current_delay():.1f}s between requests"
+            )
+        elif self.debug:
+            spider.logger.info(
+                f"Adaptive throttle: {verdict} {response.status} {request.meta.get('download_latency', 0):.2f}s "
+                f"-> {rate.slots} in flight, delay {rate.delay:.2f}s ({request.url})"
+            )
+
+    def request_left_downloader(self, request, spider):
+        # Left the downloader without a response: timeout or connection error
+        if request.meta.pop("adaptive_throttle_answered", False):
+            return
+        self.throttle.on_error(request.url, sent_at=request.meta.get("adaptive_throttle_sent"))
+        self.stats.inc_value("adaptive_throttle/error")
+        self._apply(request)
+
+    def spider_closed(self, spider):
+        self.throttle.save()
+        for domain, rate in sorted(self.throttle.domains.items()):
+            if not rate.responses:
+                continue
+            spider.logger.info(
+                f"Adaptive throttle: {domain} ended at {rate.slots} in flight, delay {rate.delay:.2f}s "
+                f"(~{rate.requests_per_second():.2f} requests/s); {rate.throttled} throttled, "
+                f"{rate.slow} slow, {rate.errors} errors in {rate.responses} responses"
+            )
+
+
+class TelemetryExtension:
+    # Per-stage timing histograms for every request (crawl_telemetry.py): time queued in
+    # the downloader slot, download (keyed by domain and static/browser), the settle
+    # and wait_for_timeout part of a render, plus bytes per domain and items/s. The
+    # callback and pipeline stages come from TelemetrySpiderMiddleware. Written to
+    # TELEMETRY_DIR every TELEMETRY_INTERVAL seconds and on close, with a summary
+    # table in the log.
+
+    def __init__(self, crawler, telemetry, interval):
+        self.crawler = crawler
+        self.telemetry = telemetry
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("TELEMETRY_ENABLED"):
+            raise NotConfigured
+        telemetry = telemetry_for(crawler, directory=s.get("TELEMETRY_DIR"), fmt=s.get("TELEMETRY_FORMAT", "jsonl"))
+        ext = cls(crawler, telemetry, s.getfloat("TELEMETRY_INTERVAL", 60))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(ext.item_error, signal=signals.item_error)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.telemetry.spider_name = spider.name
+        if self.interval > 0:
+            self.task = create_looping_call(self.telemetry.write)
+            self.task.start(self.interval, now=False)
+
+    def request_reached_downloader(self, request, spider):
+        request.meta["telemetry_reached"] = time.monotonic()
+
+    def response_downloaded(self, response, request, spider):
+        browser = bool(request.meta.get("playwright"))
+        latency = request.meta.get("download_latency")
+        reached = request.meta.pop("telemetry_reached", None)
+        if latency is None:
+            return
+        domain = url_domain(request.url)
+        self.telemetry.observe("download", f"{domain}/{'browser' if browser else 'static'}", latency)
+        if reached is not None:
+            self.telemetry.observe("queue", domain, max(0.0, time.monotonic() - reached - latency))
+        if browser:
+            waited = render_wait_seconds(request.meta.get("playwright_page_methods") or ())
+            if waited:
+                self.telemetry.observe("render_wait", domain, waited)
+
+    def response_received(self, response, request, spider):
+        self.telemetry.response(response.url, response.status, len(response.body), cached="cached" in response.flags)
+
+    def item_scraped(self, item, response, spider):
+        self.telemetry.item_done(item)
+
+    def item_dropped(self, item, response, exception, spider):
+        self.telemetry.item_done(item, dropped=True)
+
+    def item_error(self, item, response, spider, failure):
+        self.telemetry.item_done(item, dropped=True)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        path = self.telemetry.write(final=True)
+        lines = self.telemetry.summary_lines()
+        spider.logger.info("Telemetry (%s): %s\n%s", path, lines[0], "\n".join(lines[1:]))
+
+
+# Item pipelines
+
+class CsvExportPipeline:
+    # Streams every item to <spider.csv_filename> (default <name>_products.csv) in
+    # batches instead of each spider buffering its whole catalogue until closed()
+
+    def __init__(self, batch_size, flush_interval, fsync, missing_value, checkpoint=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.missing_value = missing_value
+        self.checkpoint = checkpoint
+        self.writer = None
+        self.filename = None
+        self.fingerprints = None
+        self.spider_name = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        job = s.get("CHECKPOINT_JOB")
+        return cls(
+            batch_size=s.getint("CSV_EXPORT_BATCH_SIZE", 50),
+            flush_interval=s.getfloat("CSV_EXPORT_FLUSH_INTERVAL", 30.0),
+            fsync=s.getbool("CSV_EXPORT_FSYNC", True),
+            checkpoint=open_job(job, s.get("CHECKPOINT_DIR")) if job else None,
+            missing_value=s.get("CSV_EXPORT_MISSING_VALUE", "N/A"),
+        )
+
+    def open_spider(self, spider):
+        self.filename = getattr(spider, "csv_filename", None) or f"{spider.name}_products.csv"
+        target = self.filename
+        self.fingerprints = getattr(spider, "fingerprints", None)
+        self.spider_name = spider.name
+        if self.fingerprints:
+            # Incremental runs write only the deltas and merge them into the snapshot on close
+            target = f"{self.filename}.delta"
+            if os.path.exists(target):
+                # Left over from an interrupted run whose fingerprints were already recorded
+                self._merge_delta(target, spider)
+        self.writer = CsvStreamWriter(
+            target,
+            fieldnames=getattr(spider, "csv_fieldnames", None),
+            # A checkpointed page is marked done right after its items reach this
+            # pipeline, so they must already be on disk by then
+            batch_size=1 if self.checkpoint else self.batch_size,
+            flush_interval=self.flush_interval,
+            fsync=self.fsync,
+            restval=self.missing_value,
+            append=bool(self.checkpoint and self.checkpoint.resuming),
+            normalizer=self._normalize,
+            on_flush=self._flushed,
+        )
+
+    def _flushed(self, rows):
+        # Incremental runs: a product's fingerprint is stored only once its row is on disk
+        if self.fingerprints:
+            self.fingerprints.commit(self.spider_name, [row.get("product_url") for row in rows])
+
+    def _normalize(self, rows, fieldnames):
+        # Whole batch at once: whitespace, N/A placeholders, absolute URLs (product_schema.py)
+        return normalize_records(rows, fieldnames, na=self.missing_value)
+
+    def process_item(self, item, spider):
+        self.writer.write(ItemAdapter(item).asdict())
+        return item
+
+    def close_spider(self, spider):
+        self.writer.close()
+        count = self.writer.rows_written
+        if count == 0:
+            spider.logger.info("No product data to save")
+            return
+
+        if self.writer.filename != self.filename:
+            total = self._merge_delta(self.writer.filename, spider)
+            spider.logger.info(f"✓ Merged {count} updated products into {self.filename} ({total} rows)")
+        else:
+            spider.logger.info(f"✓ Saved {count} products to {self.filename}")
+
+    def _merge_delta(self, delta_filename, spider):
+        with open(delta_filename, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames = getattr(spider, "csv_fieldnames", None) or reader.fieldnames
+            total = merge_csv_snapshot(self.filename, fieldnames, reader)
+        os.remove(delta_filename)
+        return total
+
+
+def crawl_run(settings):
+    # (crawl id, start time) the dataset and the product store record a crawl under;
+    # a resumed checkpoint job keeps both
+    job = settings.get("CHECKPOINT_JOB")
+    if job:
+        checkpoint = open_job(job, settings.get("CHECKPOINT_DIR"))
+        return checkpoint.crawl_id, checkpoint.started_at
+    return new_crawl_id(), time.time()
+
+
+class ParquetExportPipeline:
+    # Writes the same rows as CsvExportPipeline to the Parquet dataset
+    # (PARQUET_DATASET_DIR/source=<spider>/crawl_date=<day>/, see product_dataset.py)
+    # and records the crawl there once it has finished
+
+    def __init__(self, dataset_dir, batch_size, missing_value, crawl_id):
+        self.dataset_dir = dataset_dir
+        self.batch_size = batch_size
+        self.missing_value = missing_value
+        self.crawl_id = crawl_id
+        self.writer = None
+        self.incremental = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("PARQUET_EXPORT_ENABLED", True):
+            raise NotConfigured
+        if not HAVE_ARROW:
+            raise NotConfigured("pyarrow is not installed; writing CSV only")
+        pipeline = cls(
+            dataset_dir=s.get("PARQUET_DATASET_DIR", "dataset"),
+            batch_size=s.getint("PARQUET_EXPORT_BATCH_SIZE", 1000),
+            missing_value=s.get("CSV_EXPORT_MISSING_VALUE", "N/A"),
+            crawl_id=crawl_run(s)[0],
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        # Incremental runs only yield the products that changed
+        self.incremental = bool(getattr(spider, "fingerprints", None))
+        self.writer = ParquetStreamWriter(
+            self.dataset_dir,
+            spider.name,
+            fieldnames=getattr(spider, "csv_fieldnames", None),
+            batch_size=self.batch_size,
+            normalizer=lambda rows, fieldnames: normalize_records(rows, fieldnames, na=self.missing_value),
+            crawl_id=self.crawl_id,
+        )
+
+    def process_item(self, item, spider):
+        self.writer.write(ItemAdapter(item).asdict())
+        return item
+
+    def close_spider(self, spider):
+        self.writer.close()
+        if self.writer.rows_written:
+            spider.logger.info(
+                f"✓ Wrote {self.writer.rows_written} rows to {len(self.writer.paths)} part files in {self.writer.partition}"
+            )
+
+    def spider_closed(self, spider, reason):
+        # Readers ignore the parts of crawls that were stopped or produced nothing
+        if reason == "finished" and self.writer is not None and self.writer.rows_written:
+            mark_finished(self.dataset_dir, spider.name, self.crawl_id, full=not self.incremental)
+
+
+class ProductStorePipeline:
+    # Upserts every item into the SQLite product store (PRODUCT_STORE_PATH, see
+    # product_store.py), keyed on (spider, first non-empty PRODUCT_STORE_SKU_FIELDS,
+    # product_url). A finished full crawl then drops the products it didn't see.
+
+    def __init__(self, project, path, batch_size, sku_fields, crawl_id, started_at):
+        self.project = project
+        self.path = path
+        self.batch_size = batch_size
+        self.sku_fields = sku_fields
+        self.crawl_id = crawl_id
+        self.started_at = started_at
+        self.store = None
+        self.batch = []
+        self.products_written = 0
+        self.incremental = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("PRODUCT_STORE_ENABLED", True):
+            raise NotConfigured
+        crawl_id, started_at = crawl_run(s)
+        pipeline = cls(
+            project=s.get("BOT_NAME"),
+            path=s.get("PRODUCT_STORE_PATH"),
+            batch_size=s.getint("PRODUCT_STORE_BATCH_SIZE", 200),
+            sku_fields=s.getlist("PRODUCT_STORE_SKU_FIELDS", ["sku"]),
+            crawl_id=crawl_id,
+            started_at=started_at,
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.incremental = bool(getattr(spider, "fingerprints", None))
+        self.store = ProductStore(self.path)
+
+    def process_item(self, item, spider):
+        self.batch.append(ItemAdapter(item).asdict())
+        if len(self.batch) >= self.batch_size:
+            self._flush(spider)
+        return item
+
+    def _flush(self, spider):
+        if not self.batch:
+            return
+        fieldnames = list(dict.fromkeys(field for row in self.batch for field in row))
+        rows = normalize_records(self.batch, fieldnames, na="")
+        self.products_written += self.store.upsert(
+            spider.name, rows, self.sku_fields, project=self.project, crawl_id=self.crawl_id
+        )
+        self.batch = []
+
+    def close_spider(self, spider):
+        self._flush(spider)
+        if self.products_written:
+            spider.logger.info(f"✓ Upserted {self.products_written} products into {self.store.path}")
+
+    def spider_closed(self, spider, reason):
+        # The close reason only arrives with the signal, after close_spider
+        if self.store is None:
+            return
+        if reason == "finished" and self.products_written:
+            full = not self.incremental
+            removed = self.store.finish_crawl(spider.name, self.crawl_id, self.started_at, full=full)
+            if removed:
+                spider.logger.info(f"✓ Removed {removed} products the crawl no longer found from {self.store.path}")
+        self.store.close()
+
+
+# Offline crawls against replay_server.py: with REPLAY_SERVER set, every download
+# goes to http://<server>/<original url> instead of the site. Only the download
+# handler changes, so request.url, download slots, the adaptive throttle, telemetry
+# and the callbacks all still see the original URLs and hosts.
+
+class ReplayDownloadHandler(HTTP11DownloadHandler):
+    # Browser renders are replayed as the HTML recorded for the URL (the rendered
+    # capture when the session has one), so playwright requests come here too and
+    # are answered without a browser
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.server = crawler.settings.get("REPLAY_SERVER")
+
+    async def download_request(self, request):
+        replayed = request.replace(url=replay_url(self.server, request.url))
+        if request.meta.get("playwright"):
+            replayed.headers["X-Replay-Render"] = BROWSER
+        response = await super().download_request(replayed)
+        # The agent times the copy; the throttle and telemetry read the original
+        if "download_latency" in replayed.meta:
+            request.meta["download_latency"] = replayed.meta["download_latency"]
+        return response.replace(url=request.url, request=request)
+
+
+class ReplayAddon:
+    # Add-ons run after the spider's custom_settings, so this also replaces the
+    # DOWNLOAD_HANDLERS that spiders set for themselves
+
+    def update_settings(self, settings):
+        if not settings.get("REPLAY_SERVER"):
+            raise NotConfigured
+        handler = f"{__name__}.ReplayDownloadHandler"
+        settings.set("DOWNLOAD_HANDLERS", {"http": handler, "https": handler}, priority="spider")
+        # A local cache hit would skip the server, and replayed runs should not
+        # teach live crawls their rates or render routes
+        settings.set("RESPONSE_CACHE_ENABLED", False, priority="spider")
+        for name, filename in (("ADAPTIVE_THROTTLE_STATE_PATH", "throttle.json"), ("RENDER_ROUTES_PATH", "render_routes.json")):
+            if not settings.get(name) and not os.getenv(name):
+                settings.set(name, str(REPLAY_STATE_DIR / filename), priority="spider")
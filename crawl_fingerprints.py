@@ -0,0 +1,167 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_STORE_PATH = PROJECT_ROOT / ".crawl_state" / "fingerprints.sqlite"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def listing_card(link, product_hrefs, max_depth=8):
+    # The card is the largest ancestor whose product links all point at this product
+    href = link.attrib.get("href")
+    card = link
+    for parent in reversed(link.xpath("ancestor::*")[-max_depth:]):
+        if set(parent.xpath(".//a/@href").getall()) & product_hrefs != {href}:
+            break
+        card = parent
+    return card
+
+
+def card_hash(card):
+    # Hash of what a listing card shows (visible text plus image/link targets), so a
+    # changed price, name, stock badge or picture makes the product page due again
+    if card is None:
+        return None
+    parts = [t.strip() for t in card.css("*::text").getall() if t.strip()]
+    parts += card.css("img::attr(src), a::attr(href)").getall()
+    text = _WHITESPACE.sub(" ", " ".join(parts))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def content_hash(product, ignore=("product_url",)):
+    payload = {k: v for k, v in product.items() if k not in ignore}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    # One row per (spider, product URL): the listing card hash that led to the last fetch,
+    # a hash of the extracted fields, the SKU and when the product was last seen.
+    # Spiders stage() a product when they yield it; the CSV pipeline commit()s it once
+    # its row is on disk, so a crash never leaves a fingerprint for an unwritten row.
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._staged = {}
+        self.db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                spider TEXT NOT NULL,
+                url TEXT NOT NULL,
+                card_hash TEXT,
+                content_hash TEXT,
+                sku TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (spider, url)
+            );
+            CREATE INDEX IF NOT EXISTS fingerprints_sku ON fingerprints (spider, sku);
+            """
+        )
+        self.db.commit()
+
+    def get(self, spider, url):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT card_hash, content_hash, sku, first_seen, last_seen FROM fingerprints WHERE spider = ? AND url = ?",
+                (spider, url),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("card_hash", "content_hash", "sku", "first_seen", "last_seen"), row))
+
+    def is_unchanged(self, spider, url, listing_hash):
+        # Only a stored, completed fetch with the same card counts as unchanged
+        if listing_hash is None:
+            return False
+        known = self.get(spider, url)
+        return bool(known and known["content_hash"] and known["card_hash"] == listing_hash)
+
+    def touch(self, spider, url):
+        with self._lock:
+            self.db.execute(
+                "UPDATE fingerprints SET last_seen = ? WHERE spider = ? AND url = ?",
+                (time.time(), spider, url),
+            )
+            self.db.commit()
+
+    def record(self, spider, url, listing_hash, product_hash, sku):
+        # Returns True if the URL was already known (refetch), False if it is new
+        now = time.time()
+        with self._lock:
+            known = self.db.execute(
+                "SELECT 1 FROM fingerprints WHERE spider = ? AND url = ?", (spider, url)
+            ).fetchone()
+            self.db.execute(
+                """
+                INSERT INTO fingerprints (spider, url, card_hash, content_hash, sku, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (spider, url) DO UPDATE SET
+                    card_hash = excluded.card_hash,
+                    content_hash = excluded.content_hash,
+                    sku = excluded.sku,
+                    last_seen = excluded.last_seen
+                """,
+                (spider, url, listing_hash, product_hash, sku, now, now),
+            )
+            self.db.commit()
+        return known is not None
+
+    def stage(self, spider, url, listing_hash, product_hash, sku, product_url=None):
+        # Held until commit(spider, [product_url]); returns True if the URL is already known
+        self._staged[(spider, product_url or url)] = (url, listing_hash, product_hash, sku)
+        return self.get(spider, url) is not None
+
+    def commit(self, spider, product_urls):
+        for product_url in product_urls:
+            staged = self._staged.pop((spider, product_url), None)
+            if staged is not None:
+                self.record(spider, *staged)
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def merge_csv_snapshot(filename, fieldnames, deltas, key="product_url"):
+    # Streams the previous snapshot, swapping in the delta row for each changed key and
+    # appending new keys at the end. Only the deltas are held in memory; the file is
+    # rewritten through a temp file so an interrupted run leaves the old one intact
+    pending = {}
+    for product in deltas:
+        pending[product.get(key)] = product
+
+    total = 0
+    tmp_name = f"{filename}.tmp"
+    with open(tmp_name, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        if os.path.exists(filename):
+            with open(filename, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    writer.writerow(pending.pop(row.get(key), row))
+                    total += 1
+        for product in pending.values():
+            writer.writerow(product)
+            total += 1
+    os.replace(tmp_name, filename)
+    return total
+
+
+def open_store_for(spider, incremental):
+    if str(incremental).lower() not in ("1", "true", "yes", "on"):
+        return None
+    path = os.getenv("CRAWL_FINGERPRINT_STORE", str(DEFAULT_STORE_PATH))
+    spider.logger.info(f"Incremental mode: fingerprint store at {path}")
+    return FingerprintStore(path)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+PROJECTS = {
+    "steelite": PROJECT_ROOT / "steelite",
+    "sanneng": PROJECT_ROOT / "sanneng",
+}
+
+# Runs several spiders of one Scrapy project in a single CrawlerProcess instead of one
+# `scrapy crawl` per spider. Spiders are grouped into lanes by the domain they crawl:
+# lanes run concurrently, spiders sharing a domain run one after another in their lane,
+# so each site still sees only its own spider's CONCURRENT_REQUESTS_PER_DOMAIN /
+# DOWNLOAD_DELAY. One reactor and (for projects that render with Playwright) one
+# Chromium serve every crawler; each crawler gets its own browser contexts on it.
+# Wall time approaches that of the slowest site rather than the sum of all of them.
+
+
+def spider_domain(spidercls):
+    domains = getattr(spidercls, "allowed_domains", None) or []
+    if not domains:
+        return spidercls.name
+    domain = domains[0].lower()
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+def uses_playwright(settings):
+    # Replayed crawls (replay_server.py) never start a browser
+    if settings.get("REPLAY_SERVER"):
+        return False
+    handlers = settings.getdict("DOWNLOAD_HANDLERS")
+    return any("scrapy_playwright" in str(path) for path in handlers.values())
+
+
+def project_settings(project):
+    project_dir = PROJECTS[project]
+    if str(project_dir) not in sys.path:
+        sys.path.insert(0, str(project_dir))
+    os.environ["SCRAPY_SETTINGS_MODULE"] = f"{project}.settings"
+    from scrapy.utils.project import get_project_settings
+
+    return get_project_settings()
+
+
+class SharedBrowser:
+    # One Chromium started with a DevTools port; crawlers attach to it through
+    # PLAYWRIGHT_CDP_URL instead of each launching its own browser
+
+    def __init__(self, launch_options=None, timeout=30):
+        self.launch_options = dict(launch_options or {})
+        self.timeout = timeout
+        self.process = None
+        self.profile_dir = None
+        self.cdp_url = None
+
+    def start(self):
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as playwright:
+            executable = self.launch_options.get("executable_path") or playwright.chromium.executable_path
+        if not executable or not os.path.exists(executable):
+            raise RuntimeError(f"Chromium not found at {executable} (run: playwright install chromium)")
+
+        self.profile_dir = tempfile.mkdtemp(prefix="crawl-browser-")
+        command = [
+            executable,
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self.profile_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+        ]
+        if self.launch_options.get("headless", True):
+            command.append("--headless=new")
+        command += list(self.launch_options.get("args", []))
+        command.append("about:blank")
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Chromium writes the port it picked to <profile>/DevToolsActivePort
+        port_file = Path(self.profile_dir) / "DevToolsActivePort"
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Chromium exited with code {self.process.returncode}")
+            lines = port_file.read_text().split() if port_file.exists() else []
+            if lines:
+                self.cdp_url = f"http://127.0.0.1:{lines[0]}"
+                return self.cdp_url
+            time.sleep(0.1)
+        self.stop()
+        raise RuntimeError("Chromium did not open its DevTools port in time")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.process = None
+
+
+class CrawlOrchestrator:
+    def __init__(self, project, spiders=None, max_parallel=None, share_browser=True, settings=None):
+        if project not in PROJECTS:
+            raise ValueError(f"Unknown project {project!r} (expected one of {', '.join(PROJECTS)})")
+        self.project = project
+        # Spider names or Spider classes, or (spider, kwargs) pairs to pass spider
+        # arguments as `scrapy crawl -a` would; all spiders of the project when empty
+        self.spiders = list(spiders or [])
+        self.max_parallel = max_parallel
+        self.share_browser = share_browser
+        self.overrides = dict(settings or {})
+        self.results = []
+        self.wall_time = 0.0
+
+    def _settings(self):
+        os.chdir(PROJECTS[self.project])  # CSV outputs and scrapy.cfg are relative to the project
+        settings = project_settings(self.project)
+        settings.setdict(self.overrides, priority="cmdline")
+        return settings
+
+    def lanes(self, process):
+        # domain -> [(spider class, kwargs), ...] in the order the spiders were given
+        lanes = {}
+        for spider in self.spiders or process.spider_loader.list():
+            spider, kwargs = spider if isinstance(spider, tuple) else (spider, {})
+            spidercls = process.spider_loader.load(spider) if isinstance(spider, str) else spider
+            lanes.setdefault(spider_domain(spidercls), []).append((spidercls, dict(kwargs)))
+        return lanes
+
+    def run(self):
+        original_cwd = os.getcwd()
+        browser = None
+        try:
+            settings = self._settings()
+            if self.share_browser and uses_playwright(settings) and not settings.get("PLAYWRIGHT_CDP_URL"):
+                options = settings.getdict("PLAYWRIGHT_LAUNCH_OPTIONS") or settings.getdict("PLAYWRIGHT_LAUNCH_ARGS")
+                browser = SharedBrowser(options)
+                try:
+                    settings.set("PLAYWRIGHT_CDP_URL", browser.start(), priority="cmdline")
+                except Exception as e:
+                    print(f"Shared browser unavailable ({e}); each spider launches its own")
+                    browser = None
+            self._crawl(settings)
+        finally:
+            if browser is not None:
+                browser.stop()
+            os.chdir(original_cwd)
+        return self.results
+
+    def _crawl(self, settings):
+        from scrapy.crawler import CrawlerProcess
+        from twisted.internet import defer
+
+        process = CrawlerProcess(settings)
+        lanes = self.lanes(process)
+        semaphore = defer.DeferredSemaphore(max(1, self.max_parallel or len(lanes) or 1))
+        started = time.monotonic()
+
+        @defer.inlineCallbacks
+        def run_lane(domain, spiders):
+            for spidercls, kwargs in spiders:
+                crawler = process.create_crawler(spidercls)
+                result = {"spider": spidercls.name, "domain": domain, "args": kwargs, "start": time.monotonic() - started}
+                try:
+                    yield process.crawl(crawler, **kwargs)
+                    result["error"] = None
+                except Exception as e:
+                    result["error"] = repr(e)
+                result["seconds"] = time.monotonic() - started - result["start"]
+                stats = crawler.stats.get_stats() if crawler.stats else {}
+                result["items"] = stats.get("item_scraped_count", 0)
+                result["responses"] = stats.get("response_received_count", 0)
+                result["errors"] = stats.get("log_count/ERROR", 0)
+                result["finish_reason"] = stats.get("finish_reason")
+                result["success"] = result["error"] is None and result["finish_reason"] == "finished"
+                self.results.append(result)
+
+        done = defer.DeferredList(
+            [semaphore.run(run_lane, domain, classes) for domain, classes in lanes.items()],
+            consumeErrors=True,
+        )
+        # Imported only now: the first crawler created above installs the reactor the
+        # project asks for (TWISTED_REACTOR), importing it earlier would install the default
+        from twisted.internet import reactor
+
+        done.addBoth(lambda _: reactor.callLater(0, reactor.stop))
+        process.start(stop_after_crawl=False)
+        self.wall_time = time.monotonic() - started
+
+    def report(self):
+        print("-" * 86)
+        print(f"{'Spider':<24} {'Domain':<26} {'Status':<8} {'Items':>6} {'Resp':>6} {'Start':>7} {'Time':>8}")
+        print("-" * 86)
+        for r in sorted(self.results, key=lambda r: r["start"]):
+            status = "OK" if r["success"] else "FAILED"
+            print(
+                f"{r['spider']:<24} {r['domain'][:26]:<26} {status:<8} {r['items']:>6} {r['responses']:>6} "
+                f"{r['start']:>6.1f}s {r['seconds']:>7.1f}s"
+            )
+        total = sum(r["seconds"] for r in self.results)
+        slowest = max((r["seconds"] for r in self.results), default=0.0)
+        print("-" * 86)
+        print(f"Wall time {self.wall_time:.1f}s | sum of spider times {total:.1f}s | slowest spider {slowest:.1f}s")
+        if self.wall_time > 0:
+            print(f"Speed-up over running them one by one: {total / self.wall_time:.1f}x")
+        print("-" * 86)
+
+    def save_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"project": self.project, "wall_time": self.wall_time, "spiders": self.results},
+                f,
+                indent=2,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a project's spiders concurrently in one Scrapy process")
+    parser.add_argument("project", choices=sorted(PROJECTS))
+    parser.add_argument("spiders", nargs="*", help="spider names (default: every spider in the project)")
+    parser.add_argument("--max-parallel", type=int, default=None, help="domains crawled at the same time")
+    parser.add_argument("--no-shared-browser", action="store_true", help="let every spider launch its own browser")
+    parser.add_argument("--report", help="also write the timing report as JSON to this file")
+    parser.add_argument("-s", "--set", action="append", default=[], metavar="NAME=VALUE", help="Scrapy setting override")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.set)
+    orchestrator = CrawlOrchestrator(
+        args.project,
+        args.spiders,
+        max_parallel=args.max_parallel,
+        share_browser=not args.no_shared_browser,
+        settings=overrides,
+    )
+    orchestrator.run()
+    orchestrator.report()
+    if args.report:
+        orchestrator.save_report(args.report)
+    sys.exit(0 if orchestrator.results and all(r["success"] for r in orchestrator.results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from crawl_orchestrator import PROJECTS, CrawlOrchestrator, project_settings
+
+PROJECT_ROOT = Path(__file__).parent
+SHARDS_DIR = PROJECT_ROOT / ".crawl_state" / "shards"
+
+# Spiders whose crawl can be split into page ranges: (project, spider) -> the
+# spider arguments bounding the range, the range sharded by default (None: only
+# with --pages) and spider arguments every shard gets.
+# kitchenrestock reads products.json by default, a handful of pages that are not
+# worth sharding; only its search pages (1-861) are, so it is sharded when --pages
+# gives a range and those shards crawl the search pages (api=0).
+PAGED_SPIDERS = {
+    ("steelite", "kitchenrestock"): ("start_page", "end_page", None, {"api": "0"}),
+    ("steelite", "wasserstrom"): ("start_page", "end_page", (1, 30), {}),
+}
+
+# Spreads a project's crawl over several worker processes, one Scrapy reactor (and
+# one core) each. The work units are whole spiders plus page-range shards of the
+# PAGED_SPIDERS; units are dealt round-robin to the workers and every worker runs
+# its units with crawl_orchestrator.py. Each unit writes only its own CSV partition
+# (.crawl_state/shards/<project>/<spider>/shard-<n>.csv). Once all workers are done
+# the partitions are merged in shard order, the first row of a product_url winning,
+# into the spider's usual CSV, the Parquet dataset and the product store, so the
+# result does not depend on which worker finished first.
+# Each shard crawls at its spider's own per-domain settings: a spider split into
+# N shards puts up to N times its usual load on the site.
+
+
+def split_range(first, last, shards):
+    # [first, last] as up to `shards` contiguous, near-equal (start, end) ranges
+    pages = last - first + 1
+    shards = max(1, min(shards, pages))
+    size, extra = divmod(pages, shards)
+    ranges = []
+    start = first
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0) - 1
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def plan_units(project, spiders, shards, page_ranges=None):
+    # One unit per shard: {"spider", "shard", "shards", "pages", "args", "note"}; args
+    # are the spider arguments for the unit's page range, if the spider is sharded
+    units = []
+    for spider in spiders:
+        paged = PAGED_SPIDERS.get((project, spider))
+        pages = (page_ranges or {}).get(spider) or (paged[2] if paged else None)
+        if paged is None or pages is None or shards <= 1:
+            note = None
+            if paged is not None and pages is None:
+                note = f"not sharded by default; --pages {spider}=FIRST-LAST shards it with {_args_text(paged[3])}"
+            units.append({"spider": spider, "shard": 0, "shards": 1, "pages": None, "args": {}, "note": note})
+            continue
+        start_arg, end_arg, _, fixed_args = paged
+        ranges = split_range(pages[0], pages[1], shards)
+        for i, (start, end) in enumerate(ranges):
+            units.append({
+                "spider": spider,
+                "shard": i,
+                "shards": len(ranges),
+                "pages": [start, end],
+                "args": {**fixed_args, start_arg: str(start), end_arg: str(end)},
+                "note": f"shards run with {_args_text(fixed_args)}" if fixed_args else None,
+            })
+    return units
+
+
+def _args_text(args):
+    return " ".join(f"-a {name}={value}" for name, value in args.items())
+
+
+def partition_path(project, spider, shard):
+    return SHARDS_DIR / project / spider / f"shard-{shard:03d}.csv"
+
+
+def _row_key(row):
+    url = (row.get("product_url") or "").strip()
+    if url and url.upper() not in ("N/A", "NA"):
+        return url
+    return tuple(row.values())
+
+
+def merge_partitions(project, spider, settings, crawl_id, complete=False):
+    # Shard partitions -> the spider's CSV in the project directory, plus the Parquet
+    # dataset and the product store when the project writes them. With complete=True
+    # (every shard finished) the merge is recorded as a finished full crawl there.
+    # Returns merge stats.
+    from scrapy.spiderloader import SpiderLoader
+
+    from csv_stream import CsvStreamWriter
+    from product_dataset import HAVE_ARROW, ParquetStreamWriter, mark_finished
+    from product_schema import normalize_records
+    from product_store import ProductStore
+
+    spidercls = SpiderLoader.from_settings(settings).load(spider)
+    csv_filename = getattr(spidercls, "csv_filename", None) or f"{spider}_products.csv"
+    missing_value = settings.get("CSV_EXPORT_MISSING_VALUE", "N/A")
+    partitions = sorted((SHARDS_DIR / project / spider).glob("shard-*.csv"))
+
+    rows = []
+    seen = set()
+    rows_in = 0
+    fieldnames = list(getattr(spidercls, "csv_fieldnames", None) or [])
+    for path in partitions:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames += [c for c in reader.fieldnames or [] if c not in fieldnames]
+            for row in reader:
+                rows_in += 1
+                key = _row_key(row)
+                if key in seen:
+                    continue
+                seen.add(key)
+                rows.append(row)
+    stats = {"spider": spider, "partitions": len(partitions), "rows_in": rows_in, "rows_out": len(rows)}
+    if not rows:
+        return stats
+    started_at = time.time()
+
+    # Written beside the target and renamed, so readers never see half a merge
+    target = PROJECTS[project] / csv_filename
+    tmp_path = target.with_name(f".{target.name}.merge")
+    writer = CsvStreamWriter(str(tmp_path), fieldnames=fieldnames, batch_size=1000, fsync=False, restval=missing_value)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+    os.replace(tmp_path, target)
+    stats["csv"] = str(target)
+
+    if settings.getbool("PARQUET_EXPORT_ENABLED", True) and HAVE_ARROW:
+        parquet = ParquetStreamWriter(
+            settings.get("PARQUET_DATASET_DIR", "dataset"),
+            spider,
+            fieldnames=fieldnames,
+            batch_size=settings.getint("PARQUET_EXPORT_BATCH_SIZE", 1000),
+            normalizer=lambda batch, names: normalize_records(batch, names, na=missing_value),
+            crawl_id=crawl_id,
+        )
+        for row in rows:
+            parquet.write(row)
+        parquet.close()
+        if complete:
+            mark_finished(parquet.dataset_dir, spider, crawl_id)
+        stats["parquet"] = str(parquet.partition)
+
+    if settings.getbool("PRODUCT_STORE_ENABLED", True):
+        store = ProductStore(settings.get("PRODUCT_STORE_PATH"))
+        batch_size = settings.getint("PRODUCT_STORE_BATCH_SIZE", 200)
+        sku_fields = settings.getlist("PRODUCT_STORE_SKU_FIELDS", ["manufacturer", "item_sku"])
+        written = 0
+        try:
+            for i in range(0, len(rows), batch_size):
+                batch = normalize_records(rows[i:i + batch_size], fieldnames, na="")
+                written += store.upsert(spider, batch, sku_fields, project=project, crawl_id=crawl_id)
+            if complete:
+                stats["store_removed"] = store.finish_crawl(spider, crawl_id, started_at)
+        finally:
+            store.close()
+        stats["store_upserts"] = written
+    return stats
+
+
+def run_worker(plan_path, worker):
+    # Child process: crawl this worker's units in one CrawlerProcess, then record timings
+    with open(plan_path, encoding="utf-8") as f:
+        plan = json.load(f)
+    units = [u for u in plan["units"] if u["worker"] == worker]
+    spiders = [(u["spider"], {**u["args"], "csv_filename": u["partition"]}) for u in units]
+    orchestrator = CrawlOrchestrator(
+        plan["project"],
+        spiders,
+        share_browser=plan["share_browser"],
+        settings={
+            **plan["settings"],
+            # The merge step writes these once, from the merged rows
+            "PARQUET_EXPORT_ENABLED": False,
+            "PRODUCT_STORE_ENABLED": False,
+        },
+    )
+    cpu_started = time.process_time()
+    orchestrator.run()
+    report = {
+        "worker": worker,
+        "wall_time": orchestrator.wall_time,
+        "cpu_time": time.process_time() - cpu_started,
+        "spiders": orchestrator.results,
+    }
+    with open(Path(plan_path).with_name(f"worker-{worker:02d}.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+class ShardedCrawl:
+    def __init__(self, project, spiders=None, workers=None, shards=None, page_ranges=None, share_browser=True,
+                 settings=None):
+        if project not in PROJECTS:
+            raise ValueError(f"Unknown project {project!r} (expected one of {', '.join(PROJECTS)})")
+        self.project = project
+        self.spiders = list(spiders or [])
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.shards = max(1, shards or self.workers)
+        self.page_ranges = dict(page_ranges or {})
+        self.share_browser = share_browser
+        self.overrides = dict(settings or {})
+        self.crawl_id = f"shards-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.units = []
+        self.worker_reports = []
+        self.merges = []
+        self.wall_time = 0.0
+        self.merge_time = 0.0
+
+    def _settings(self):
+        settings = project_settings(self.project)
+        settings.setdict(self.overrides, priority="cmdline")
+        return settings
+
+    def _spider_names(self, settings):
+        if self.spiders:
+            return self.spiders
+        from scrapy.spiderloader import SpiderLoader
+
+        return SpiderLoader.from_settings(settings).list()
+
+    def crawl(self):
+        settings = self._settings()
+        self.units = plan_units(self.project, self._spider_names(settings), self.shards, self.page_ranges)
+        for i, unit in enumerate(self.units):
+            unit["worker"] = i % self.workers
+            unit["partition"] = str(partition_path(self.project, unit["spider"], unit["shard"]))
+        # Partitions left from an earlier run would be merged with this one's
+        for spider in {u["spider"] for u in self.units}:
+            shutil.rmtree(SHARDS_DIR / self.project / spider, ignore_errors=True)
+
+        run_dir = SHARDS_DIR / self.project / "_runs" / self.crawl_id
+        run_dir.mkdir(parents=True, exist_ok=True)
+        plan_path = run_dir / "plan.json"
+        with open(plan_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "project": self.project,
+                "share_browser": self.share_browser,
+                "settings": self.overrides,
+                "units": self.units,
+            }, f, indent=2)
+
+        started = time.monotonic()
+        workers = sorted({u["worker"] for u in self.units})
+        processes = [
+            (worker, subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()), self.project, "--worker", str(plan_path), str(worker)],
+                cwd=str(PROJECT_ROOT),
+            ))
+            for worker in workers
+        ]
+        for worker, process in processes:
+            process.wait()
+            report_path = run_dir / f"worker-{worker:02d}.json"
+            if report_path.exists():
+                with open(report_path, encoding="utf-8") as f:
+                    self.worker_reports.append(json.load(f))
+            else:
+                print(f"Worker {worker} exited with code {process.returncode} without a report")
+                self.worker_reports.append({"worker": worker, "wall_time": 0.0, "cpu_time": 0.0, "spiders": []})
+        self.wall_time = time.monotonic() - started
+        return self.merge(settings)
+
+    def merge(self, settings=None):
+        settings = settings or self._settings()
+        spiders = list(dict.fromkeys(u["spider"] for u in self.units)) if self.units else self._spider_names(settings)
+        started = time.monotonic()
+        # Only a spider whose shards all finished replaces what the dataset and store hold for it
+        complete = {r["spider"] for r in self.spider_results() if r["success"]}
+        self.merges = [
+            merge_partitions(self.project, spider, settings, self.crawl_id, complete=spider in complete)
+            for spider in spiders
+        ]
+        self.merge_time = time.monotonic() - started
+        return self.merges
+
+    def shard_results(self):
+        # unit + its crawl result, in plan order
+        results = {}
+        for report in self.worker_reports:
+            for r in report["spiders"]:
+                results[r["args"].get("csv_filename")] = r
+        return [(u, results.get(u["partition"])) for u in self.units]
+
+    def spider_results(self):
+        # Per spider, the shape crawl_orchestrator reports: success, seconds (slowest shard), items
+        combined = {}
+        for unit, result in self.shard_results():
+            entry = combined.setdefault(unit["spider"], {"spider": unit["spider"], "success": True, "seconds": 0.0,
+                                                         "items": 0, "responses": 0, "shards": 0})
+            entry["shards"] += 1
+            entry["success"] = entry["success"] and bool(result and result["success"])
+            if result:
+                entry["seconds"] = max(entry["seconds"], result["seconds"])
+                entry["items"] += result["items"]
+                entry["responses"] += result["responses"]
+        return list(combined.values())
+
+    def report(self):
+        print("-" * 96)
+        print(f"{'Spider':<22} {'Shard':>7} {'Pages':>11} {'Worker':>6} {'Status':<7} {'Items':>7} {'Resp':>6} "
+              f"{'Time':>8} {'Items/s':>8} {'Resp/s':>7}")
+        print("-" * 96)
+        for unit, r in self.shard_results():
+            shard = f"{unit['shard'] + 1}/{unit['shards']}"
+            pages = "-" if not unit["pages"] else f"{unit['pages'][0]}-{unit['pages'][1]}"
+            if r is None:
+                print(f"{unit['spider']:<22} {shard:>7} {pages:>11} {unit['worker']:>6} {'MISSING':<7}")
+                continue
+            seconds = r["seconds"] or 0.0
+            rate = (lambda n: n / seconds if seconds > 0 else 0.0)
+            status = "OK" if r["success"] else "FAILED"
+            print(f"{unit['spider']:<22} {shard:>7} {pages:>11} {unit['worker']:>6} {status:<7} {r['items']:>7} "
+                  f"{r['responses']:>6} {seconds:>7.1f}s {rate(r['items']):>8.2f} {rate(r['responses']):>7.2f}")
+        print("-" * 96)
+        for spider, note in dict.fromkeys((u["spider"], u["note"]) for u in self.units if u.get("note")):
+            print(f"{spider}: {note}")
+        for w in sorted(self.worker_reports, key=lambda w: w["worker"]):
+            busy = w["cpu_time"] / w["wall_time"] if w["wall_time"] else 0.0
+            print(f"Worker {w['worker']:>2}: {len(w['spiders'])} shards, wall {w['wall_time']:.1f}s, "
+                  f"CPU {w['cpu_time']:.1f}s ({busy:.0%} of a core)")
+        for m in self.merges:
+            print(f"Merged {m['spider']}: {m['partitions']} partitions, {m['rows_in']} rows -> {m['rows_out']} "
+                  f"(dropped {m['rows_in'] - m['rows_out']} duplicates)")
+        items = sum(r["items"] for _, r in self.shard_results() if r)
+        total_cpu = sum(w["cpu_time"] for w in self.worker_reports)
+        print("-" * 96)
+        if not self.worker_reports:
+            print(f"Merge {self.merge_time:.1f}s")
+            print("-" * 96)
+            return
+        print(f"Crawl wall time {self.wall_time:.1f}s with {len(self.worker_reports)} workers | "
+              f"{items} items ({items / self.wall_time if self.wall_time else 0.0:.2f}/s) | "
+              f"worker CPU {total_cpu:.1f}s | merge {self.merge_time:.1f}s")
+        print("-" * 96)
+
+    def save_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "project": self.project,
+                "crawl_id": self.crawl_id,
+                "wall_time": self.wall_time,
+                "merge_time": self.merge_time,
+                "spiders": self.spider_results(),
+                "shards": [{**unit, "result": result} for unit, result in self.shard_results()],
+                "workers": self.worker_reports,
+                "merges": self.merges,
+            }, f, indent=2)
+
+
+def _page_range(value):
+    spider, _, pages = value.partition("=")
+    first, _, last = pages.partition("-")
+    return spider, (int(first), int(last or first))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a project's spiders sharded across worker processes")
+    parser.add_argument("project", choices=sorted(PROJECTS))
+    parser.add_argument("spiders", nargs="*", help="spider names (default: every spider in the project)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, default=None, help="page-range shards per paged spider (default: workers)")
+    parser.add_argument("--pages", action="append", default=[], type=_page_range, metavar="SPIDER=FIRST-LAST",
+                        help="page range to shard for a paged spider")
+    parser.add_argument("--merge-only", action="store_true", help="only merge the partitions already on disk")
+    parser.add_argument("--no-shared-browser", action="store_true", help="let every spider launch its own browser")
+    parser.add_argument("--report", help="also write the report as JSON to this file")
+    parser.add_argument("-s", "--set", action="append", default=[], metavar="NAME=VALUE", help="Scrapy setting override")
+    parser.add_argument("--worker", nargs=2, metavar=("PLAN", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], int(args.worker[1]))
+        return
+
+    sharded = ShardedCrawl(
+        args.project,
+        args.spiders,
+        workers=args.workers,
+        shards=args.shards,
+        page_ranges=dict(args.pages),
+        share_browser=not args.no_shared_browser,
+        settings=dict(item.split("=", 1) for item in args.set),
+    )
+    if args.merge_only:
+        sharded.merge()
+    else:
+        sharded.crawl()
+    sharded.report()
+    if args.report:
+        sharded.save_report(args.report)
+    results = sharded.spider_results()
+    sys.exit(0 if args.merge_only or (results and all(r["success"] for r in results)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import bisect
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from urllib.parse import urlparse
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_TELEMETRY_DIR = PROJECT_ROOT / ".crawl_state" / "telemetry"
+
+# Seconds; anything slower lands in the +Inf bucket
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Where a request's time goes, in the order the summary lists them:
+#   queue        waiting in the downloader slot (DOWNLOAD_DELAY, per-domain concurrency)
+#   download     connect + server time for plain HTTP, the whole render for the browser
+#   render_wait  the part of a render spent in settle()/wait_for_timeout page methods
+#   callback     the spider callback's own code, pipelines excluded
+#   pipeline     item pipelines (CSV/Parquet/store writes), per item; items go through
+#                them concurrently (CONCURRENT_ITEMS), so these overlap
+STAGES = ("queue", "download", "render_wait", "callback", "pipeline")
+
+
+def url_domain(url):
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def render_wait_seconds(page_methods):
+    # Fixed or settling waits in a render's page methods: settle() returns what it
+    # waited, wait_for_timeout is taken at its declared milliseconds
+    waited = 0.0
+    for pm in page_methods:
+        method = getattr(pm, "method", None)
+        if method == "wait_for_timeout" and getattr(pm, "args", None):
+            waited += float(pm.args[0]) / 1000
+        elif callable(method) and isinstance(getattr(pm, "result", None), (int, float)):
+            waited += float(pm.result)
+    return waited
+
+
+class Histogram:
+    # Cumulative-bucket histogram, as Prometheus keeps them; percentiles are
+    # interpolated inside the bucket they fall in
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        seconds = max(0.0, float(seconds))
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i > 0 else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                value = low + (high - low) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {("+Inf" if i == len(BUCKETS) else str(BUCKETS[i])): n for i, n in enumerate(self.counts)},
+        }
+
+
+class CrawlTelemetry:
+    # Timings, bytes and counts for one spider's crawl, written as a JSON line per
+    # snapshot (<dir>/<spider>.jsonl) or as a Prometheus text file (<dir>/<spider>.prom,
+    # rewritten each snapshot, for node_exporter's textfile collector)
+
+    def __init__(self, spider_name, directory=None, fmt="jsonl"):
+        if fmt not in ("jsonl", "prometheus"):
+            raise ValueError(f"Unknown telemetry format {fmt!r} (expected jsonl or prometheus)")
+        self.spider_name = spider_name
+        self.directory = Path(directory or os.getenv("TELEMETRY_DIR", str(DEFAULT_TELEMETRY_DIR)))
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self.histograms = {}  # (stage, key) -> Histogram
+        self.bytes = {}  # domain -> bytes downloaded
+        self.statuses = {}
+        self.responses = 0
+        self.cached = 0
+        self.items = 0
+        self.dropped = 0
+        self.started = time.time()
+        self._pending_items = {}
+
+    def observe(self, stage, key, seconds):
+        with self._lock:
+            histogram = self.histograms.get((stage, key))
+            if histogram is None:
+                histogram = self.histograms[(stage, key)] = Histogram()
+            histogram.add(seconds)
+
+    def response(self, url, status, size, cached=False):
+        with self._lock:
+            self.responses += 1
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            if cached:
+                self.cached += 1
+            else:
+                domain = url_domain(url)
+                self.bytes[domain] = self.bytes.get(domain, 0) + size
+
+    def item_yielded(self, item):
+        # Paired with item_done() to time the pipelines
+        self._pending_items[id(item)] = time.perf_counter()
+
+    def item_done(self, item, dropped=False):
+        started = self._pending_items.pop(id(item), None)
+        with self._lock:
+            if dropped:
+                self.dropped += 1
+            else:
+                self.items += 1
+        if started is not None:
+            self.observe("pipeline", "items", time.perf_counter() - started)
+
+    def snapshot(self, final=False):
+        elapsed = max(time.time() - self.started, 1e-6)
+        with self._lock:
+            return {
+                "spider": self.spider_name,
+                "pid": os.getpid(),
+                "final": final,
+                "started_at": self.started,
+                "elapsed": round(elapsed, 3),
+                "items": self.items,
+                "items_dropped": self.dropped,
+                "items_per_second": round(self.items / elapsed, 3),
+                "responses": self.responses,
+                "responses_cached": self.cached,
+                "statuses": dict(self.statuses),
+                "bytes": dict(self.bytes),
+                "bytes_total": sum(self.bytes.values()),
+                "histograms": {
+                    stage: {key: h.as_dict() for (s, key), h in sorted(self.histograms.items()) if s == stage}
+                    for stage in STAGES
+                    if any(s == stage for s, _ in self.histograms)
+                },
+            }
+
+    def write(self, final=False):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        record = self.snapshot(final)
+        if self.fmt == "jsonl":
+            path = self.directory / f"{self.spider_name}.jsonl"
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            return path
+        path = self.directory / f"{self.spider_name}.prom"
+        tmp_name = f"{path}.tmp"
+        with open(tmp_name, "w", encoding="utf-8") as f:
+            f.write(prometheus_text(record))
+        os.replace(tmp_name, path)
+        return path
+
+    def summary_lines(self):
+        # The five keys with the most total time per stage
+        record = self.snapshot()
+        lines = [
+            f"{record['items']} items in {record['elapsed']:.1f}s ({record['items_per_second']:.2f} items/s), "
+            f"{record['responses']} responses ({record['responses_cached']} cached), "
+            f"{record['bytes_total'] / 1024 ** 2:.1f} MB downloaded"
+        ]
+        lines.append(f"{'stage':<12} {'key':<34} {'count':>7} {'total s':>9} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+        for stage, keys in record["histograms"].items():
+            rows = sorted(keys.items(), key=lambda kv: kv[1]["sum"], reverse=True)
+            for key, h in rows[:5]:
+                mean = h["sum"] / h["count"] if h["count"] else 0.0
+                lines.append(
+                    f"{stage:<12} {str(key)[:34]:<34} {h['count']:>7} {h['sum']:>9.1f} {mean:>8.3f} "
+                    f"{h['p50']:>8.3f} {h['p90']:>8.3f} {h['p99']:>8.3f} {h['max']:>8.3f}"
+                )
+        return lines
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def prometheus_text(record):
+    spider = _label(record["spider"])
+    out = [
+        "# HELP crawl_stage_seconds Time spent per crawl stage",
+        "# TYPE crawl_stage_seconds histogram",
+    ]
+    for stage, keys in record["histograms"].items():
+        for key, h in keys.items():
+            labels = f'spider="{spider}",stage="{_label(stage)}",key="{_label(key)}"'
+            cumulative = 0
+            for bound, n in h["buckets"].items():
+                cumulative += n
+                out.append(f'crawl_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            out.append(f"crawl_stage_seconds_sum{{{labels}}} {h['sum']}")
+            out.append(f"crawl_stage_seconds_count{{{labels}}} {h['count']}")
+    out += [
+        "# HELP crawl_bytes_total Response bytes downloaded per domain",
+        "# TYPE crawl_bytes_total counter",
+    ]
+    for domain, n in sorted(record["bytes"].items()):
+        out.append(f'crawl_bytes_total{{spider="{spider}",domain="{_label(domain)}"}} {n}')
+    out += [
+        "# HELP crawl_responses_total Responses per HTTP status",
+        "# TYPE crawl_responses_total counter",
+    ]
+    for status, n in sorted(record["statuses"].items()):
+        out.append(f'crawl_responses_total{{spider="{spider}",status="{_label(status)}"}} {n}')
+    out += [
+        "# HELP crawl_items_total Items that went through the pipelines",
+        "# TYPE crawl_items_total counter",
+        f'crawl_items_total{{spider="{spider}"}} {record["items"]}',
+        "# HELP crawl_items_per_second Items per second since the crawl started",
+        "# TYPE crawl_items_per_second gauge",
+        f'crawl_items_per_second{{spider="{spider}"}} {record["items_per_second"]}',
+    ]
+    return "\n".join(out) + "\n"
+
+
+# The extension and the spider middleware of one crawler share a recorder
+_recorders = weakref.WeakKeyDictionary()
+
+
+def telemetry_for(crawler, spider_name=None, **kwargs):
+    recorder = _recorders.get(crawler)
+    if recorder is None:
+        name = spider_name or getattr(crawler.spidercls, "name", "spider")
+        recorder = _recorders[crawler] = CrawlTelemetry(name, **kwargs)
+    return recorder
@@ -0,0 +1,81 @@
+import csv
+import os
+import time
+
+
+class CsvStreamWriter:
+    # Appends rows in small batches so memory stays flat and a crash only loses the
+    # current batch. The file is created on the first row, so an empty run leaves any
+    # previous output untouched.
+
+    def __init__(self, filename, fieldnames=None, batch_size=50, flush_interval=30.0, fsync=True, restval="", append=False,
+                 normalizer=None, on_flush=None):
+        self.filename = filename
+        self.append = append
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.restval = restval
+        # Called as normalizer(rows, fieldnames) on each batch just before it is written
+        self.normalizer = normalizer
+        # Called as on_flush(rows) with the rows as written once they are on disk
+        self.on_flush = on_flush
+
+        self.rows_written = 0
+        self._batch = []
+        self._file = None
+        self._writer = None
+        self._last_flush = time.monotonic()
+
+    def _open(self, first_row):
+        existing_header = None
+        if self.append and os.path.exists(self.filename) and os.path.getsize(self.filename) > 0:
+            with open(self.filename, newline="", encoding="utf-8") as f:
+                existing_header = next(csv.reader(f), None)
+
+        if existing_header:
+            self.fieldnames = existing_header
+        elif self.fieldnames is None:
+            # Same rule as Scrapy's CSV feed export: the first item decides the columns
+            self.fieldnames = list(first_row.keys())
+
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.filename, "a" if existing_header else "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, restval=self.restval, extrasaction="ignore")
+        if not existing_header:
+            self._writer.writeheader()
+
+    def write(self, row):
+        if self._file is None:
+            self._open(row)
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            return
+        rows = self._batch
+        if rows:
+            if self.normalizer is not None:
+                rows = self.normalizer(rows, self.fieldnames)
+            self._writer.writerows(rows)
+            self.rows_written += len(rows)
+            self._batch = []
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+        if rows and self.on_flush is not None:
+            self.on_flush(rows)
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
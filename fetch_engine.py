@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from http_client import HttpClient
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile, good enough for a run report
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class FetchEngine:
+    def __init__(self, max_workers=8, per_host=4, headers=None, timeout=30, deterministic=False, client=None):
+        # Deterministic mode runs everything on the calling thread in input order
+        self.deterministic = deterministic
+        self.max_workers = 1 if deterministic else max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.timeout = timeout
+
+        # One pooled keep-alive client shared by every worker thread
+        self.client = client or HttpClient(
+            headers=headers,
+            timeout=timeout,
+            pool_size=max(self.per_host, self.max_workers),
+        )
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self.latencies = []
+        self.errors = 0
+        self.started_at = time.perf_counter()
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with self._host_slot(url):
+            start = time.perf_counter()
+            failed = False
+            try:
+                return self.client.get(url, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.latencies.append(elapsed)
+                    if failed:
+                        self.errors += 1
+
+    def map(self, func, items):
+        # Yields (item, result) pairs as soon as each call finishes
+        if self.deterministic:
+            for item in items:
+                yield item, func(item)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(func, item): item for item in items}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self.latencies)
+            errors = self.errors
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "pages": len(latencies),
+            "errors": errors,
+            "elapsed": elapsed,
+            "pages_per_sec": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+        }
+
+    def report(self):
+        s = self.stats()
+        print("-" * 60)
+        print(f"Fetched {s['pages']} pages in {s['elapsed']:.1f}s ({s['pages_per_sec']:.2f} pages/s, {s['errors']} errors)")
+        print(f"Latency p50: {s['p50'] * 1000:.0f} ms | p95: {s['p95'] * 1000:.0f} ms")
+        print(f"Workers: {self.max_workers} | Per-host cap: {self.per_host} | Deterministic: {self.deterministic}")
+        print("-" * 60)
+        return s
@@ -1,36 +1,37 @@
 #!/usr/bin/env python
 import os
-import csv
 from pathlib import Path
 from openpyxl import load_workbook
 
+from product_dataset import read_source
+from product_store import store_from_env
+
 PROJECT_ROOT = Path(__file__).parent
 SANNENG_DIR = PROJECT_ROOT / "sanneng"
 EXCEL_PATH = PROJECT_ROOT / "sources" / "SAN NENG_updated.xlsx"
 
-def count_csv_products(csv_file):
-    if not csv_file.exists():
-        return 0
+STORE = store_from_env()
+STORED = STORE.sources('sanneng') if STORE else []
+
+def load_skus(csv_file):
+    # The spider's rows from the product store, else the Parquet dataset, else the CSV
+    source = csv_file.name[:-len('_products.csv')]
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            return sum(1 for _ in reader)
-    except:
-        return 0
+        if source in STORED:
+            return STORE.frame('sanneng', [source], ['sku'])
+        return read_source(SANNENG_DIR / "dataset", source, columns=['sku'], csv_path=csv_file)
+    except Exception:
+        return None
+
+def count_csv_products(csv_file):
+    df = load_skus(csv_file)
+    return 0 if df is None else len(df)
 
 def get_unique_skus(csv_file):
-    skus = set()
-    if not csv_file.exists():
-        return skus
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get('sku') and row['sku'] != 'N/A':
-                    skus.add(row['sku'])
-    except:
-        pass
-    return skus
+    df = load_skus(csv_file)
+    if df is None or 'sku' not in df:
+        return set()
+    return set(df['sku'].dropna())
 
 print("""
 ╔════════════════════════════════════════════════════════════════════╗
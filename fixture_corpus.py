@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+import argparse
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from crawl_orchestrator import PROJECTS, project_settings
+
+PROJECT_ROOT = Path(__file__).parent
+FIXTURES_DIR = Path(os.getenv("FIXTURES_DIR", str(PROJECT_ROOT / "fixtures")))
+
+# Offline pages for the spiders' parse_* callbacks, one directory per spider:
+#   fixtures/<project>/<spider>/manifest.json   url, callback, cb_kwargs, meta, headers
+#   fixtures/<project>/<spider>/<name>.html     the body (.json for catalogue APIs)
+# Entries marked "source": "recorded" were saved from a real crawl by
+# FixtureRecorderMiddleware (scrapy crawl <spider> -s FIXTURE_RECORD=1); "synthetic"
+# ones are hand-built to each site's markup and are replaced by recording.
+# "expected" holds the item/request counts and a digest of the callback's output,
+# so `fixture_corpus.py check` catches parser regressions without the network.
+
+# Request meta that only means something to a live crawl
+VOLATILE_META = re.compile(r"^(playwright|download_|adaptive_throttle|telemetry|checkpoint|depth$|retry_times$|is_start_request$|_)")
+
+
+def spider_dir(project, spider):
+    return FIXTURES_DIR / project / spider
+
+
+def load_manifest(project, spider):
+    try:
+        with open(spider_dir(project, spider) / "manifest.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"spider": spider, "fixtures": []}
+
+
+def save_manifest(project, spider, manifest):
+    path = spider_dir(project, spider) / "manifest.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    manifest["fixtures"].sort(key=lambda e: e["name"])
+    tmp_name = f"{path}.tmp"
+    with open(tmp_name, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_name, path)
+
+
+def corpus(projects=None, spiders=None):
+    # (project, spider, manifest) for every spider that has fixtures
+    found = []
+    for project in projects or PROJECTS:
+        base = FIXTURES_DIR / project
+        if not base.is_dir():
+            continue
+        for path in sorted(base.iterdir()):
+            if (path / "manifest.json").exists() and (not spiders or path.name in spiders):
+                found.append((project, path.name, load_manifest(project, path.name)))
+    return found
+
+
+def portable_meta(meta):
+    kept = {}
+    for key, value in meta.items():
+        if VOLATILE_META.match(key):
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        kept[key] = value
+    return kept
+
+
+def record_fixture(project, spider, request, response, callback, limit):
+    # Saves the response as a fixture unless `callback` already has `limit` of them;
+    # returns the fixture name or None
+    manifest = load_manifest(project, spider)
+    directory = spider_dir(project, spider)
+    recorded = [e for e in manifest["fixtures"] if e["callback"] == callback and e.get("source") == "recorded"]
+    if len(recorded) >= limit or any(e["url"] == response.url for e in recorded):
+        return None
+    # Recorded pages replace the synthetic ones for the same callback
+    for entry in [e for e in manifest["fixtures"] if e["callback"] == callback and e.get("source") != "recorded"]:
+        manifest["fixtures"].remove(entry)
+        (directory / entry["file"]).unlink(missing_ok=True)
+    content_type = response.headers.get("Content-Type", b"text/html").decode("latin-1")
+    name = f"{callback}-{len(recorded) + 1:02d}"
+    filename = f"{name}.{'json' if 'json' in content_type else 'html'}"
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / filename).write_bytes(response.body)
+    manifest["fixtures"].append({
+        "name": name,
+        "file": filename,
+        "url": response.url,
+        "status": response.status,
+        "headers": {"Content-Type": content_type},
+        "callback": callback,
+        "cb_kwargs": {k: v for k, v in request.cb_kwargs.items() if isinstance(v, (str, int, float, bool, type(None)))},
+        "meta": portable_meta(request.meta),
+        "source": "recorded",
+    })
+    save_manifest(project, spider, manifest)
+    return name
+
+
+def build_response(project, spider, entry):
+    from scrapy import Request
+    from scrapy.http import Headers
+    from scrapy.responsetypes import responsetypes
+
+    body = (spider_dir(project, spider) / entry["file"]).read_bytes()
+    headers = Headers(entry.get("headers") or {})
+    request = Request(entry["url"], meta=dict(entry.get("meta") or {}), cb_kwargs=dict(entry.get("cb_kwargs") or {}))
+    respcls = responsetypes.from_args(headers=headers, url=entry["url"], body=body)
+    return respcls(url=entry["url"], status=entry.get("status", 200), headers=headers, body=body, request=request)
+
+
+def spider_factory(project, name, **kwargs):
+    # Returns a function making fresh spider instances (spiders keep per-crawl state
+    # such as seen URLs), each bound to a crawler with the project's settings;
+    # nothing is started
+    from scrapy.crawler import Crawler
+    from scrapy.spiderloader import SpiderLoader
+
+    settings = project_settings(project)
+    spidercls = SpiderLoader.from_settings(settings).load(name)
+    return lambda: spidercls.from_crawler(Crawler(spidercls, settings), **kwargs)
+
+
+def run_callback(spider, entry, response):
+    # Everything the callback yields, as a list
+    result = getattr(spider, entry["callback"])(response, **response.request.cb_kwargs)
+    if inspect.isasyncgen(result):
+        async def drain():
+            return [x async for x in result]
+        return asyncio.run(drain())
+    if inspect.iscoroutine(result):
+        result = asyncio.run(result)
+    return list(result or ())
+
+
+def summarize(outputs):
+    from scrapy import Request
+    from itemadapter import ItemAdapter
+
+    items, requests = [], []
+    for entry in outputs:
+        if isinstance(entry, Request):
+            requests.append(f"{entry.method} {entry.url} {getattr(entry.callback, '__name__', None)}")
+        else:
+            items.append(ItemAdapter(entry).asdict())
+    payload = json.dumps({"items": items, "requests": sorted(requests)}, sort_keys=True, ensure_ascii=False, default=str)
+    return {"items": len(items), "requests": len(requests), "digest": hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]}
+
+
+def check(projects=None, spiders=None, update=False):
+    # Runs every fixture through its callback; returns the entries whose output changed
+    changed = []
+    for project, name, manifest in corpus(projects, spiders):
+        new_spider = spider_factory(project, name)
+        for entry in manifest["fixtures"]:
+            got = summarize(run_callback(new_spider(), entry, build_response(project, name, entry)))
+            expected = entry.get("expected")
+            status = "ok" if got == expected else ("new" if expected is None else "CHANGED")
+            print(f"{status:<8} {project + '/' + name + '/' + entry['name']:<56} {got['items']:>4} items {got['requests']:>4} requests  {got['digest']}"
+                  + (f"  (was {expected['items']} items, {expected['requests']} requests, {expected['digest']})" if status == "CHANGED" else ""))
+            if status != "ok":
+                changed.append((project, name, entry["name"]))
+            entry["expected"] = got
+        if update:
+            save_manifest(project, name, manifest)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline fixture corpus for the spiders' parse callbacks")
+    parser.add_argument("command", choices=["check", "update", "list"])
+    parser.add_argument("spiders", nargs="*", help="Only these spiders (default: every spider with fixtures)")
+    parser.add_argument("--project", choices=sorted(PROJECTS), action="append")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for project, name, manifest in corpus(args.project, args.spiders):
+            for entry in manifest["fixtures"]:
+                size = (spider_dir(project, name) / entry["file"]).stat().st_size
+                print(f"{project + '/' + name + '/' + entry['file']:<58} {entry['callback']:<24} {entry.get('source', '?'):<10} {size:>8,} bytes  {entry['url']}")
+        return
+    changed = check(args.project, args.spiders, update=args.command == "update")
+    if args.command == "check" and changed:
+        print(f"\n{len(changed)} fixture(s) changed or have no expected output yet; run `update` if that is intended")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_CACHE_DIR = PROJECT_ROOT / ".http_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_TTL = 24 * 3600
+
+# Headers that describe the transfer rather than the content; bodies are stored decoded
+SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+
+class CacheEntry:
+    def __init__(self, url, status, headers, body_hash, etag, last_modified, stored_at, render=None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body_hash = body_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.render = render
+
+    def is_fresh(self, ttl):
+        return ttl is not None and ttl > 0 and time.time() - self.stored_at < ttl
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    # Bodies are gzip blobs named by their SHA-256, so identical pages are stored once.
+    # A small SQLite index maps URLs to blobs and tracks access times for LRU eviction.
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.db = sqlite3.connect(str(self.cache_dir / "index.sqlite"), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+            CREATE INDEX IF NOT EXISTS entries_body ON entries (body_hash);
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            """
+        )
+        self.db.commit()
+
+    @staticmethod
+    def make_key(url, method="GET", render=None):
+        # A browser-rendered page and the plain HTTP body of the same URL are
+        # different responses; plain fetches keep the key they always had
+        suffix = f" {render}" if render and render != "static" else ""
+        return hashlib.sha1(f"{method.upper()} {url}{suffix}".encode("utf-8")).hexdigest()
+
+    def _blob_path(self, body_hash):
+        return self.objects_dir / body_hash[:2] / f"{body_hash}.gz"
+
+    def get(self, url, render=None):
+        key = self.make_key(url, render=render)
+        with self._lock:
+            row = self.db.execute(
+                "SELECT url, status, headers, body_hash, etag, last_modified, stored_at FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if not self._blob_path(row[3]).exists():
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return CacheEntry(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6], render)
+
+    def load_body(self, entry):
+        with gzip.open(self._blob_path(entry.body_hash), "rb") as f:
+            return f.read()
+
+    def put(self, url, status, headers, body, render=None):
+        clean_headers = {k: v for k, v in headers.items() if k.lower() not in SKIP_HEADERS}
+        lowered = {k.lower(): v for k, v in clean_headers.items()}
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(body_hash)
+        now = time.time()
+
+        with self._lock:
+            known = self.db.execute("SELECT 1 FROM blobs WHERE hash = ?", (body_hash,)).fetchone()
+            if known is None or not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+                with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO blobs (hash, size) VALUES (?, ?)",
+                    (body_hash, path.stat().st_size),
+                )
+
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.make_key(url, render=render), url, status, json.dumps(clean_headers), body_hash,
+                    lowered.get("etag"), lowered.get("last-modified"), now, now,
+                ),
+            )
+            self.db.commit()
+            self._evict()
+
+    def revalidated(self, entry):
+        # A 304 means the stored copy is current again
+        entry.stored_at = time.time()
+        with self._lock:
+            self.db.execute(
+                "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (entry.stored_at, entry.stored_at, self.make_key(entry.url, render=entry.render)),
+            )
+            self.db.commit()
+
+    def total_bytes(self):
+        with self._lock:
+            return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self.db.execute("SELECT key, body_hash FROM entries ORDER BY accessed_at ASC").fetchall()
+        for key, body_hash in rows:
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            still_used = self.db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+            if still_used:
+                continue
+            size_row = self.db.execute("SELECT size FROM blobs WHERE hash = ?", (body_hash,)).fetchone()
+            self.db.execute("DELETE FROM blobs WHERE hash = ?", (body_hash,))
+            try:
+                self._blob_path(body_hash).unlink()
+            except FileNotFoundError:
+                pass
+            total -= size_row[0] if size_row else 0
+        self.db.commit()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def cache_from_env():
+    # Standalone scripts opt out with HTTP_CACHE_ENABLED=0
+    if os.getenv("HTTP_CACHE_ENABLED", "1") != "1":
+        return None
+    return ResponseCache(
+        cache_dir=os.getenv("HTTP_CACHE_DIR", str(DEFAULT_CACHE_DIR)),
+        max_bytes=int(os.getenv("HTTP_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+    )
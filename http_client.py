@@ -0,0 +1,165 @@
+import os
+import random
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from adaptive_throttle import retry_after_seconds
+from http_cache import DEFAULT_TTL, cache_from_env
+from replay_server import replay_url
+
+try:
+    import brotli  # noqa: F401  urllib3 decodes "br" bodies when this is importable
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+}
+
+# Minimum seconds between two requests to the same host, with +/- jitter as a fraction.
+# This is the one place to tune politeness for the standalone scrapers.
+HOST_RATE_LIMITS = {
+    "www.meilleurduchef.com": (1.0, 0.5),
+    "www.southernhospitality.co.nz": (2.0, 0.5),
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class PooledAdapter(HTTPAdapter):
+    # Every pooled connection shares one SSL context instead of building a new one per call
+    def __init__(self, ssl_context=None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+
+class HttpClient:
+    def __init__(self, headers=None, timeout=30, retries=3, backoff=1.0, max_backoff=30.0,
+                 rate_limits=None, pool_size=10, use_cloudscraper=False, cache=None, cache_ttl=None,
+                 replay=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limits = dict(HOST_RATE_LIMITS)
+        if rate_limits:
+            self.rate_limits.update(rate_limits)
+
+        if use_cloudscraper:
+            import cloudscraper
+            # cloudscraper mounts its own cipher-suite adapter for https; keep it
+            self.session = cloudscraper.create_scraper()
+            self.session.mount("http://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        else:
+            self.session = requests.Session()
+            adapter = PooledAdapter(
+                ssl_context=ssl.create_default_context(),
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self.session.headers.update(DEFAULT_HEADERS)
+
+        if headers:
+            self.session.headers.update(headers)
+
+        # REPLAY_SERVER (replay_server.py) sends every request through the replay
+        # server; the local cache is skipped so each run does the same fetches
+        self.replay_server = os.getenv("REPLAY_SERVER") if replay is None else (replay or None)
+        if self.replay_server:
+            cache = False
+
+        # cache=None reads HTTP_CACHE_* from the environment, cache=False disables it
+        self.cache = cache_from_env() if cache is None else (cache or None)
+        self.cache_ttl = cache_ttl if cache_ttl is not None else int(os.getenv("HTTP_CACHE_TTL", str(DEFAULT_TTL)))
+
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def _wait_for_host(self, host):
+        interval, jitter = self.rate_limits.get(host, (0.0, 0.0))
+        if interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + interval * random.uniform(1 - jitter, 1 + jitter)
+        if start > now:
+            time.sleep(start - now)
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+        delay = self.backoff * (2 ** attempt)
+        return min(delay * random.uniform(0.5, 1.5), self.max_backoff)
+
+    def _cached_response(self, entry):
+        response = requests.Response()
+        response.status_code = entry.status
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response._content = self.cache.load_body(entry)
+        response.url = entry.url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlparse(url).netloc
+        cacheable = self.cache is not None and method.upper() == "GET"
+
+        entry = self.cache.get(url) if cacheable else None
+        if entry is not None:
+            if entry.is_fresh(self.cache_ttl):
+                return self._cached_response(entry)
+            headers = dict(kwargs.get("headers") or {})
+            headers.update(entry.conditional_headers())
+            kwargs["headers"] = headers
+
+        target = replay_url(self.replay_server, url) if self.replay_server else url
+        for attempt in range(self.retries + 1):
+            self._wait_for_host(host)
+            try:
+                response = self.session.request(method, target, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                time.sleep(self._retry_delay(attempt, response))
+                continue
+            break
+
+        if self.replay_server:
+            response.url = url
+        if entry is not None and response.status_code == 304:
+            self.cache.revalidated(entry)
+            return self._cached_response(entry)
+        if cacheable and response.status_code == 200:
+            self.cache.put(url, response.status_code, dict(response.headers), response.content)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
@@ -1,24 +1,24 @@
-import cloudscraper
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 import pandas as pd
 import json
 import re
-import time
-import random
 import os
 
+from http_client import HttpClient
+from product_schema import CATALOGUE_SCHEMA, normalize_frame
+
 BASE_URL = "https://www.meilleurduchef.com"
 START_URL = "https://www.meilleurduchef.com/en/shop/brands/silikomart.html"
 
-scraper = cloudscraper.create_scraper()
+# Requests to this host are spaced out by HOST_RATE_LIMITS in http_client
+scraper = HttpClient(use_cloudscraper=True)
 
 def get_product_links(start_url):
     product_links = set()
     
     print(f"Scanning page: {start_url}")
     try:
-        time.sleep(random.uniform(1, 2))
         r = scraper.get(start_url)
         if r.status_code != 200:
             print(f"Failed to load page: {r.status_code}")
@@ -49,7 +49,6 @@ def get_product_links(start_url):
 
 def scrape_single_product(url):
     try:
-        time.sleep(random.uniform(0.5, 1.5))
         r = scraper.get(url)
         if r.status_code != 200: return None
         
@@ -207,15 +206,7 @@ if __name__ == "__main__":
     if all_data:
         df = pd.DataFrame(all_data)
         
-        cols = [
-            "Item No.", "Mfr Catalog No.", "Group Name", "Ecom Picture Name", 
-            "SAP Picture", "Inactive", "Indent Item", "# In Stock", 
-            "Production Date", "Item Description", "Stock Description", 
-            "Warranty", "Serial Managed", "# List Price", "Main Category", 
-            "Sub1 Category", "Sub2 Category", "Short Description"
-        ]
-        
-        df = df.reindex(columns=cols, fill_value="N/A")
+        df = normalize_frame(df.reindex(columns=CATALOGUE_SCHEMA.names, fill_value="N/A"), CATALOGUE_SCHEMA)
         
         folder_name = "results"
         file_name = "MeilleurDuChef_Silikomart_NoPage.xlsx"
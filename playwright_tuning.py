@@ -0,0 +1,67 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_RATES_PATH = PROJECT_ROOT / ".crawl_state" / "playwright_rates.json"
+
+# Nothing the spiders parse comes from these; the HTML and the scripts that build it still load
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_URL_PATTERNS = re.compile(
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|googlesyndication\.com"
+    r"|connect\.facebook\.net|facebook\.com/tr|hotjar\.com|clarity\.ms|bat\.bing\.com"
+    r"|segment\.(?:io|com)|newrelic\.com|nr-data\.net|tiktok\.com|pinimg\.com|klaviyo\.com",
+    re.I,
+)
+
+
+def should_abort_request(request):
+    # PLAYWRIGHT_ABORT_REQUEST hook, called for every request a rendered page makes
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    return bool(BLOCKED_URL_PATTERNS.search(request.url))
+
+
+async def settle(page, budget_ms=1500):
+    # Replaces a fixed wait_for_timeout: returns as soon as the network goes quiet,
+    # and never waits longer than the old sleep did. Returns the seconds waited, which
+    # scrapy-playwright keeps on the PageMethod for crawl telemetry
+    started = time.monotonic()
+    try:
+        await page.wait_for_load_state("networkidle", timeout=budget_ms)
+    except Exception:
+        pass
+    return time.monotonic() - started
+
+
+class PageRateLog:
+    # Last measured pages/s per spider, split by whether the page pool was on,
+    # so a run with PLAYWRIGHT_PAGE_POOL_SIZE=0 gives the baseline to compare against
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv("PLAYWRIGHT_RATES_PATH", str(DEFAULT_RATES_PATH)))
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, spider, mode, pages, seconds):
+        rates = self.load()
+        rate = pages / seconds if seconds > 0 else 0.0
+        rates.setdefault(spider, {})[mode] = {
+            "pages": pages,
+            "seconds": round(seconds, 2),
+            "pages_per_second": round(rate, 3),
+            "recorded_at": time.time(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_name = f"{self.path}.tmp"
+        with open(tmp_name, "w", encoding="utf-8") as f:
+            json.dump(rates, f, indent=2, sort_keys=True)
+        os.replace(tmp_name, self.path)
+        return rates[spider]
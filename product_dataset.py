@@ -0,0 +1,206 @@
+import json
+import os
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from crawl_checkpoint import new_crawl_id
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+# Spider output as a Parquet dataset next to the CSVs:
+#
+#   <dataset_dir>/source=<spider>/crawl_date=<YYYY-MM-DD>/part-<crawl id>-<n>.parquet
+#   <dataset_dir>/source=<spider>/_crawls.json    the crawls that finished, oldest first
+#
+# Every column is a string column stored dictionary-encoded (names, materials and
+# sources repeat a lot), so a reader that needs three columns reads three columns.
+# Every flushed batch becomes its own finished part file (written as "_inprogress-..."
+# and renamed when complete; readers skip those), so a killed crawl keeps every batch
+# it flushed and never leaves a half-written file in the dataset.
+#
+# Readers only use finished crawls: the newest full one plus the incremental ones
+# (changed products only) that finished after it. Rows of aborted or stray runs and
+# products a full crawl no longer found drop out that way; the part files stay.
+
+# Values pd.read_csv turns into NaN; the dataset readers do the same so callers see
+# the same frame whichever storage it came from
+CSV_NA_VALUES = {"", "N/A", "n/a", "NA", "#N/A", "NULL", "null", "NaN", "nan", "None", "<NA>"}
+
+CRAWLS_FILE = "_crawls.json"
+
+
+class ParquetStreamWriter:
+    def __init__(self, dataset_dir, source, fieldnames=None, batch_size=1000, crawl_date=None, normalizer=None,
+                 crawl_id=None):
+        if not HAVE_ARROW:
+            raise RuntimeError("pyarrow is required for the Parquet dataset (pip install pyarrow)")
+        self.dataset_dir = Path(dataset_dir)
+        self.source = source
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.batch_size = max(1, int(batch_size))
+        self.crawl_date = crawl_date or date.today().isoformat()
+        self.crawl_id = crawl_id or new_crawl_id()
+        # Called as normalizer(rows, fieldnames) on each batch, like CsvStreamWriter
+        self.normalizer = normalizer
+
+        self.rows_written = 0
+        self.partition = None
+        self.paths = []
+        self._prefix = None
+        self._batch = []
+        self._schema = None
+
+    def _open(self, first_row):
+        if self.fieldnames is None:
+            self.fieldnames = list(first_row.keys())
+        self.partition = self.dataset_dir / f"source={self.source}" / f"crawl_date={self.crawl_date}"
+        self.partition.mkdir(parents=True, exist_ok=True)
+        # Parts of one crawl share the prefix; a resumed crawl adds parts after its earlier ones
+        self._prefix = f"part-{self.crawl_id}-{uuid.uuid4().hex[:8]}"
+        self._schema = pa.schema([(field, pa.string()) for field in self.fieldnames])
+
+    def write(self, row):
+        if self._schema is None:
+            self._open(row)
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._schema is None or not self._batch:
+            return
+        rows = self._batch
+        if self.normalizer is not None:
+            rows = self.normalizer(rows, self.fieldnames)
+        columns = {
+            field: [None if r.get(field) is None else str(r.get(field)) for r in rows]
+            for field in self.fieldnames
+        }
+        path = self.partition / f"{self._prefix}-{len(self.paths):05d}.parquet"
+        tmp_path = path.with_name(f"_inprogress-{path.name}")
+        pq.write_table(pa.table(columns, schema=self._schema), str(tmp_path), use_dictionary=True, compression="zstd")
+        os.replace(tmp_path, path)
+        self.paths.append(path)
+        self.rows_written += len(rows)
+        self._batch = []
+
+    def close(self):
+        self.flush()
+
+
+def finished_crawls(dataset_dir, source):
+    # [{"crawl_id", "finished_at", "full"}, ...] oldest first
+    try:
+        with open(Path(dataset_dir) / f"source={source}" / CRAWLS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def mark_finished(dataset_dir, source, crawl_id, full=True):
+    # full=False for incremental crawls, which only wrote the products that changed
+    path = Path(dataset_dir) / f"source={source}" / CRAWLS_FILE
+    crawls = [c for c in finished_crawls(dataset_dir, source) if c["crawl_id"] != crawl_id]
+    crawls.append({"crawl_id": crawl_id, "finished_at": time.time(), "full": bool(full)})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_name = f"{path}.tmp"
+    with open(tmp_name, "w", encoding="utf-8") as f:
+        json.dump(crawls, f, indent=2)
+    os.replace(tmp_name, path)
+
+
+def current_crawls(crawls):
+    # The newest full crawl and the incremental ones after it; None until a full crawl
+    # has finished (datasets written before crawls were recorded are read whole)
+    full = [i for i, c in enumerate(crawls) if c["full"]]
+    return crawls[full[-1]:] if full else None
+
+
+def dataset_sources(dataset_dir):
+    root = Path(dataset_dir)
+    if not HAVE_ARROW or not root.is_dir():
+        return []
+    return sorted(p.name.split("=", 1)[1] for p in root.glob("source=*") if _part_files(p))
+
+
+def _part_files(source_dir, crawl_ids=None):
+    files = [p for p in Path(source_dir).glob("crawl_date=*/*.parquet") if not p.name.startswith(("_", "."))]
+    if crawl_ids is None:
+        # Oldest first: crawl_date partitions sort by date, part files by crawl
+        return sorted(files)
+    # Only these crawls, oldest first, each one's parts in the order they were written
+    order = {crawl_id: i for i, crawl_id in enumerate(crawl_ids)}
+    picked = []
+    for path in files:
+        crawl_id = next((c for c in order if path.name.startswith(f"part-{c}-")), None)
+        if crawl_id is not None:
+            picked.append((order[crawl_id], path.stat().st_mtime, path.name, path))
+    return [path for *_, path in sorted(picked)]
+
+
+def _as_csv_frame(df):
+    for column in df.columns:
+        df[column] = df[column].astype(object).mask(df[column].isin(CSV_NA_VALUES))
+    return df
+
+
+def read_source(dataset_dir, source, columns=None, csv_path=None, key="product_url", latest=True, csv_dtype=str):
+    # One source's rows, only the requested columns. Read from the dataset's current
+    # crawls when it has this source, otherwise (or when csv_path was written after
+    # them) from csv_path. With latest=True a product seen in several crawls (a full
+    # one and the incremental runs after it) keeps only its newest row.
+    files = []
+    if HAVE_ARROW:
+        crawls = current_crawls(finished_crawls(dataset_dir, source))
+        files = _part_files(Path(dataset_dir) / f"source={source}", crawls and [c["crawl_id"] for c in crawls])
+        if files and csv_path and os.path.exists(csv_path):
+            written = crawls[-1]["finished_at"] if crawls else max(p.stat().st_mtime for p in files)
+            if os.path.getmtime(csv_path) > written:
+                files = []
+    if not files:
+        if not csv_path or not os.path.exists(csv_path):
+            return pd.DataFrame(columns=columns)
+        usecols = None if columns is None else (lambda c: c in columns)
+        df = pd.read_csv(csv_path, dtype=csv_dtype, encoding="utf-8", usecols=usecols)
+        return df if columns is None else df.reindex(columns=list(columns))
+
+    wanted = None if columns is None else list(dict.fromkeys(list(columns) + ([key] if latest and key else [])))
+    frames = []
+    for path in files:
+        available = pq.read_schema(path).names
+        read = available if wanted is None else [c for c in wanted if c in available]
+        frames.append(pq.read_table(path, columns=read).to_pandas().reindex(columns=wanted or read))
+    df = pd.concat(frames, ignore_index=True)
+    if latest and key and key in df.columns:
+        has_key = df[key].notna() & ~df[key].isin(CSV_NA_VALUES)
+        newest = ~df.duplicated(subset=[key], keep="last") | ~has_key
+        df = df[newest].reset_index(drop=True)
+    if columns is not None:
+        df = df.reindex(columns=[c for c in wanted if c in columns])
+    return _as_csv_frame(df)
+
+
+def read_sources(dataset_dir, csv_paths=None, columns=None, sources=None, **kwargs):
+    # csv_paths maps source -> fallback CSV. Sources are read in the order given
+    # (csv_paths order, then any dataset-only sources), each tagged with _source.
+    csv_paths = dict(csv_paths or {})
+    names = list(sources) if sources is not None else list(csv_paths)
+    if sources is None:
+        names += [s for s in dataset_sources(dataset_dir) if s not in csv_paths]
+    frames = []
+    for name in names:
+        df = read_source(dataset_dir, name, columns=columns, csv_path=csv_paths.get(name), **kwargs)
+        if len(df):
+            frames.append(df.assign(_source=name))
+    if not frames:
+        return pd.DataFrame(columns=(list(columns) if columns else []) + ["_source"])
+    return pd.concat(frames, ignore_index=True)
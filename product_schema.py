@@ -0,0 +1,216 @@
+import re
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import pandas as pd
+
+# One place for the three output layouts and the cleaning rules they share.
+# Cleaning runs column by column over a whole DataFrame (pandas string ops), so a
+# 100k-row export is a few dozen vectorised passes instead of a Python call per cell.
+
+NA = "N/A"
+# Placeholders read as missing in any column. Text columns keep words like "None"
+# or "NA" (a colour, a pattern name); codes and links also drop the strings that
+# str(None) / str(nan) and empty database values leave behind.
+NA_TOKENS = {"", "N/A"}
+CODE_NA_TOKENS = NA_TOKENS | {"NA", "NAN", "NONE", "NULL"}
+SKU_PATTERN = r"SN\d+[A-Z0-9-]*"
+
+_WHITESPACE = re.compile(r"\s+")
+_ORIGIN = r"^(https?://[^/]+)"
+
+# text   - whitespace collapsed, blanks become N/A
+# code   - SKUs, EANs, barcodes: trimmed, blanks become N/A, inner spacing kept
+# url    - trimmed, protocol-relative and root-relative links made absolute
+# image  - like url, relative links resolved against the row's product_url
+Field = namedtuple("Field", ["name", "kind"])
+
+FIELD_KINDS = {
+    "sku": "code", "item_sku": "code", "model_number": "code", "manufacturer": "code",
+    "ean_code": "code", "barcode": "code", "upc": "code", "upc_barcode": "code",
+    "Item No.": "code", "Mfr Catalog No.": "code",
+    "product_url": "url",
+    "image_link": "image", "Ecom Picture Name": "image",
+}
+
+
+def field_kind(name):
+    return FIELD_KINDS.get(name, "text")
+
+
+class Schema:
+    def __init__(self, name, field_names):
+        self.name = name
+        self.fields = [Field(f, field_kind(f)) for f in field_names]
+
+    @property
+    def names(self):
+        return [f.name for f in self.fields]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+
+# steelite/*_products.csv (Scrapy spiders)
+STEELITE_SCHEMA = Schema("steelite", [
+    "name", "item_sku", "model_number", "manufacturer",
+    "image_link", "overview", "material", "color", "pattern",
+    "length", "width", "height", "volume_capacity", "diameter",
+    "country_of_origin", "upc_barcode", "ean_code",
+    "hazmat", "oversize", "marketplace_uom", "product_url",
+])
+
+# sanneng/*_products.csv and the SKU search add-on
+SANNENG_SCHEMA = Schema("sanneng", [
+    "sku", "name", "image_link", "overview",
+    "length", "width", "height", "diameter", "volume",
+    "material", "color", "pattern",
+    "ean_code", "barcode", "upc", "product_url", "source",
+])
+
+# results/*.xlsx written by the standalone scripts
+CATALOGUE_SCHEMA = Schema("catalogue", [
+    "Item No.", "Mfr Catalog No.", "Group Name", "Ecom Picture Name",
+    "SAP Picture", "Inactive", "Indent Item", "# In Stock",
+    "Production Date", "Item Description", "Stock Description",
+    "Warranty", "Serial Managed", "# List Price", "Main Category",
+    "Sub1 Category", "Sub2 Category", "Short Description",
+])
+
+
+def _str(series):
+    # The .str accessor, or None for columns holding no strings at all
+    try:
+        return series.str
+    except AttributeError:
+        return None
+
+
+def collapse_whitespace(series):
+    s = _str(series)
+    if s is None:
+        return series
+    cleaned = s.replace(_WHITESPACE, " ", regex=True).str.strip()
+    # Non-string cells (numbers, dates) come back as NaN and keep their value
+    return cleaned.where(cleaned.notna(), series)
+
+
+def strip(series):
+    s = _str(series)
+    if s is None:
+        return series
+    cleaned = s.strip()
+    return cleaned.where(cleaned.notna(), series)
+
+
+def canonical_na(series, na=NA, tokens=NA_TOKENS):
+    missing = series.isna()
+    s = _str(series)
+    if s is not None:
+        missing |= s.upper().isin(tokens)
+    if not missing.any():
+        return series
+    return series.astype(object).mask(missing, na)
+
+
+def absolutize_urls(series, base_url=None):
+    # base_url is one URL for the whole column or a Series of page URLs (one per row)
+    s = _str(series)
+    if s is None:
+        return series
+    protocol_relative = s.startswith("//").fillna(False).astype(bool)
+    series = series.mask(protocol_relative, "https:" + series.where(protocol_relative, ""))
+    if base_url is None:
+        return series
+
+    relative = series.str.startswith("/").fillna(False).astype(bool)
+    if isinstance(base_url, pd.Series):
+        origins = base_url.astype(str).str.extract(_ORIGIN, expand=False)
+        relative &= origins.notna()
+    else:
+        parsed = urlparse(base_url)
+        origins = f"{parsed.scheme}://{parsed.netloc}"
+    if not relative.any():
+        return series
+    return series.mask(relative, origins + series.where(relative, ""))
+
+
+def normalize_sku_series(series):
+    # Vectorised normalize_sku: same result for every cell, None where there is no SKU
+    text = series.astype(str).str.strip().str.upper()
+    invalid = series.isna() | text.isin({"", "N/A", "NAN", "NONE"})
+    text = text.str.replace(" ", "", regex=False)
+    result = text.str.extract(f"({SKU_PATTERN})", expand=False).fillna(text)
+    return result.astype(object).where(~invalid, None)
+
+
+def normalize_image_series(series):
+    # Vectorised normalize_image_link
+    text = series.astype(str).str.strip()
+    invalid = series.isna() | (text == "") | text.str.upper().isin({"N/A", "NONE", "NAN"})
+    text = text.mask(text.str.startswith("//"), "https:" + text)
+    return text.astype(object).where(~invalid, NA)
+
+
+def normalize_sku(value):
+    if pd.isna(value):
+        return None
+    text = str(value).strip().upper()
+    if not text or text in {"N/A", "NAN", "NONE"}:
+        return None
+    text = text.replace(" ", "")
+    match = re.search(SKU_PATTERN, text)
+    if match:
+        return match.group(0)
+    return text
+
+
+def normalize_image_link(link):
+    if link is None or (not isinstance(link, str) and pd.isna(link)):
+        return NA
+    text = str(link).strip()
+    if not text or text.upper() in {"N/A", "NONE", "NAN"}:
+        return NA
+    if text.startswith("//"):
+        return f"https:{text}"
+    return text
+
+
+def normalize_frame(df, schema=None, base_url=None, na=NA):
+    # Cleans every known column of df in place of a per-row loop and returns a new frame.
+    # Columns not in the schema are cleaned by name (see FIELD_KINDS), defaulting to text.
+    kinds = {f.name: f.kind for f in schema} if schema is not None else {}
+    df = df.copy()
+    page_urls = df["product_url"] if "product_url" in df.columns else None
+    if page_urls is not None:
+        page_urls = absolutize_urls(canonical_na(strip(page_urls), na, CODE_NA_TOKENS), base_url)
+
+    for column in df.columns:
+        kind = kinds.get(column) or field_kind(column)
+        series = df[column]
+        if kind == "text":
+            series = canonical_na(collapse_whitespace(series), na)
+        elif kind == "code":
+            series = canonical_na(strip(series), na, CODE_NA_TOKENS)
+        elif kind == "url":
+            series = page_urls if column == "product_url" else absolutize_urls(
+                canonical_na(strip(series), na, CODE_NA_TOKENS), base_url
+            )
+        elif kind == "image":
+            series = absolutize_urls(
+                canonical_na(strip(series), na, CODE_NA_TOKENS), page_urls if page_urls is not None else base_url
+            )
+        df[column] = series
+    return df
+
+
+def normalize_records(rows, fieldnames=None, na=NA):
+    # Batch form for row-at-a-time writers (the CSV export pipelines)
+    if not rows:
+        return rows
+    df = pd.DataFrame.from_records(rows, columns=fieldnames)
+    df = normalize_frame(df, Schema("rows", df.columns), na=na)
+    return df.to_dict("records")
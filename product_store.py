@@ -0,0 +1,292 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from product_dataset import dataset_sources, read_source
+from product_schema import NA_TOKENS, normalize_sku
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_STORE_PATH = PROJECT_ROOT / ".crawl_state" / "products.sqlite"
+
+# Values that never overwrite a stored field; rows arrive normalized (product_schema.py),
+# so codes and links already hold "" for the "None"/"nan" leftovers
+EMPTY_VALUES = NA_TOKENS
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if not isinstance(value, str) and pd.isna(value):
+        return True
+    return str(value).strip().upper() in EMPTY_VALUES
+
+
+SCHEMA_VERSION = 2
+
+
+class ProductStore:
+    # Every product both Scrapy projects have scraped, one row per (source, SKU,
+    # product URL): sites reuse a SKU for several pages, so the SKU alone mixes products.
+    #
+    # products        source, sku, product_url, normalized_sku, project, first/last seen
+    # product_fields  one row per (source, sku, product_url, field) with its value and
+    #                 provenance: the crawl that set it and when
+    #
+    # crawls          source, crawl_id, started/finished at, full: the crawls that finished
+    #
+    # Upserts are field by field: a crawl that found a value overwrites the stored
+    # one, a crawl that found nothing leaves it (and its provenance) alone. A full
+    # crawl that finishes removes the source's products it did not see; incremental
+    # crawls only upsert what changed and remove nothing.
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv("PRODUCT_STORE_PATH", str(DEFAULT_STORE_PATH)))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Version 1 was keyed on (source, sku) and merged products sharing a SKU;
+            # its rows can't be split again, so the next crawls refill the store
+            self.db.executescript("DROP TABLE IF EXISTS products; DROP TABLE IF EXISTS product_fields;")
+        self.db.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS products (
+                source TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                product_url TEXT NOT NULL,
+                normalized_sku TEXT,
+                project TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (source, sku, product_url)
+            );
+            CREATE INDEX IF NOT EXISTS products_normalized_sku ON products (normalized_sku);
+            CREATE INDEX IF NOT EXISTS products_source ON products (source);
+            CREATE INDEX IF NOT EXISTS products_project ON products (project, source);
+            CREATE TABLE IF NOT EXISTS product_fields (
+                source TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                product_url TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                crawl_id TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, sku, product_url, field)
+            );
+            CREATE TABLE IF NOT EXISTS crawls (
+                source TEXT NOT NULL,
+                crawl_id TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL NOT NULL,
+                full INTEGER NOT NULL,
+                PRIMARY KEY (source, crawl_id)
+            );
+            PRAGMA user_version = {SCHEMA_VERSION};
+            """
+        )
+        self.db.commit()
+
+    @staticmethod
+    def product_key(row, sku_fields):
+        # (SKU, product URL): the SKU is the first non-empty SKU field; either part is
+        # "" when missing, and a row with neither is not stored
+        sku = next((str(row[f]).strip() for f in sku_fields if not _is_empty(row.get(f))), "")
+        url = "" if _is_empty(row.get("product_url")) else str(row["product_url"]).strip()
+        return (sku, url) if sku or url else None
+
+    def upsert(self, source, rows, sku_fields, project=None, crawl_id=None):
+        # One transaction per batch; returns the number of products written
+        now = time.time()
+        products = []
+        fields = []
+        for row in rows:
+            key = self.product_key(row, sku_fields)
+            if key is None:
+                continue
+            sku, url = key
+            normalized = normalize_sku(sku) if sku else None
+            products.append((source, sku, url, normalized or None, project, now, now))
+            for field, value in row.items():
+                if not _is_empty(value):
+                    fields.append((source, sku, url, field, str(value), crawl_id, now))
+
+        with self._lock:
+            with self.db:
+                self.db.executemany(
+                    """
+                    INSERT INTO products (source, sku, product_url, normalized_sku, project, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (source, sku, product_url) DO UPDATE SET
+                        normalized_sku = excluded.normalized_sku,
+                        project = COALESCE(excluded.project, products.project),
+                        last_seen = excluded.last_seen
+                    """,
+                    products,
+                )
+                self.db.executemany(
+                    """
+                    INSERT INTO product_fields (source, sku, product_url, field, value, crawl_id, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (source, sku, product_url, field) DO UPDATE SET
+                        value = excluded.value,
+                        crawl_id = excluded.crawl_id,
+                        updated_at = excluded.updated_at
+                    WHERE excluded.value IS NOT product_fields.value
+                    """,
+                    fields,
+                )
+        return len(products)
+
+    def finish_crawl(self, source, crawl_id, started_at, full=True):
+        # Records a finished crawl; a full one prunes the products it did not upsert
+        # (last seen before it started). Returns the number of products removed.
+        with self._lock:
+            with self.db:
+                removed = 0
+                if full:
+                    removed = self.db.execute(
+                        "DELETE FROM products WHERE source = ? AND last_seen < ?", (source, started_at)
+                    ).rowcount
+                    self.db.execute(
+                        "DELETE FROM product_fields WHERE source = ? AND NOT EXISTS (SELECT 1 FROM products p "
+                        "WHERE p.source = product_fields.source AND p.sku = product_fields.sku "
+                        "AND p.product_url = product_fields.product_url)",
+                        (source,),
+                    )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO crawls (source, crawl_id, started_at, finished_at, full) VALUES (?, ?, ?, ?, ?)",
+                    (source, crawl_id, started_at, time.time(), int(bool(full))),
+                )
+        return removed
+
+    def last_finished(self, source):
+        # finished_at of the source's newest finished crawl, or None
+        with self._lock:
+            return self.db.execute("SELECT MAX(finished_at) FROM crawls WHERE source = ?", (source,)).fetchone()[0]
+
+    def sources(self, project=None):
+        sql = "SELECT DISTINCT source FROM products"
+        params = ()
+        if project:
+            sql += " WHERE project = ?"
+            params = (project,)
+        with self._lock:
+            return sorted(row[0] for row in self.db.execute(sql, params))
+
+    def existing_skus(self, project=None, sources=None):
+        # Normalized SKUs, straight off the normalized_sku index
+        sql = "SELECT DISTINCT normalized_sku FROM products WHERE normalized_sku IS NOT NULL"
+        params = []
+        if project:
+            sql += " AND project = ?"
+            params.append(project)
+        if sources:
+            sql += f" AND source IN ({','.join('?' * len(sources))})"
+            params.extend(sources)
+        with self._lock:
+            return {row[0] for row in self.db.execute(sql, params)}
+
+    def counts(self, project=None):
+        # source -> (products, distinct normalized SKUs, last crawl time)
+        sql = "SELECT source, COUNT(*), COUNT(DISTINCT normalized_sku), MAX(last_seen) FROM products"
+        params = ()
+        if project:
+            sql += " WHERE project = ?"
+            params = (project,)
+        sql += " GROUP BY source"
+        with self._lock:
+            return {row[0]: row[1:] for row in self.db.execute(sql, params)}
+
+    def frame(self, project=None, sources=None, fields=None, until=None):
+        # Wide DataFrame, one row per product in first-seen order, with _source and
+        # the requested fields (all of them if fields is None). Missing fields are NaN.
+        # until leaves out products first seen after that time (by an unfinished run).
+        sql = (
+            "SELECT p.rowid, p.source, f.field, f.value FROM products p "
+            "JOIN product_fields f ON f.source = p.source AND f.sku = p.sku AND f.product_url = p.product_url "
+            "WHERE 1 = 1"
+        )
+        params = []
+        if project:
+            sql += " AND p.project = ?"
+            params.append(project)
+        if sources:
+            sql += f" AND p.source IN ({','.join('?' * len(sources))})"
+            params.extend(sources)
+        if fields:
+            sql += f" AND f.field IN ({','.join('?' * len(fields))})"
+            params.extend(fields)
+        if until is not None:
+            sql += " AND p.first_seen <= ?"
+            params.append(until)
+        with self._lock:
+            long = pd.DataFrame(self.db.execute(sql, params).fetchall(), columns=["rowid", "_source", "field", "value"])
+        if long.empty:
+            return pd.DataFrame(columns=list(fields or []) + ["_source"])
+
+        wide = long.pivot(index=["rowid", "_source"], columns="field", values="value")
+        wide = wide.sort_index(level="rowid").reset_index(level="_source").reset_index(drop=True)
+        wide.columns.name = None
+        if fields:
+            wide = wide.reindex(columns=list(fields) + ["_source"])
+        if sources:
+            order = {name: i for i, name in enumerate(sources)}
+            wide = wide.sort_values("_source", key=lambda s: s.map(order), kind="stable").reset_index(drop=True)
+        return wide
+
+    def provenance(self, source, sku, product_url=""):
+        # field -> (value, crawl_id, updated_at)
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT field, value, crawl_id, updated_at FROM product_fields "
+                "WHERE source = ? AND sku = ? AND product_url = ?",
+                (source, sku, product_url),
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def store_from_env():
+    # None when there is no store yet (nothing has been crawled into it) or it is disabled
+    if os.getenv("PRODUCT_STORE_ENABLED", "1") != "1":
+        return None
+    path = Path(os.getenv("PRODUCT_STORE_PATH", str(DEFAULT_STORE_PATH)))
+    if not path.exists():
+        return None
+    return ProductStore(path)
+
+
+def read_project_sources(project, dataset_dir, csv_paths=None, columns=None, sources=None, store=None, **kwargs):
+    # Like product_dataset.read_sources, but a source with a finished crawl in the store
+    # is read from there (one row per product, as of that crawl) unless its CSV was
+    # written after it; the others still come from the dataset or their CSV
+    csv_paths = dict(csv_paths or {})
+    stored = store.sources(project) if store is not None else []
+    names = list(sources) if sources is not None else list(csv_paths)
+    if sources is None:
+        names += [s for s in dataset_sources(dataset_dir) + stored if s not in names]
+        names = list(dict.fromkeys(names))
+    frames = []
+    for name in names:
+        finished = store.last_finished(name) if name in stored else None
+        csv_path = csv_paths.get(name)
+        if finished is not None and csv_path and os.path.exists(csv_path) and os.path.getmtime(csv_path) > finished:
+            finished = None
+        if finished is not None:
+            df = store.frame(project, [name], columns, until=finished).drop(columns="_source")
+        else:
+            df = read_source(dataset_dir, name, columns=columns, csv_path=csv_paths.get(name), **kwargs)
+        if len(df):
+            frames.append(df.assign(_source=name))
+    if not frames:
+        return pd.DataFrame(columns=(list(columns) if columns else []) + ["_source"])
+    return pd.concat(frames, ignore_index=True)
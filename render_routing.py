@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+
+from parsel import Selector
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_DECISIONS_PATH = PROJECT_ROOT / ".crawl_state" / "render_routes.json"
+
+STATIC = "static"
+BROWSER = "browser"
+AUTO = "auto"
+MODES = (STATIC, BROWSER, AUTO)
+
+
+def route_host(url):
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def selector_present(html, selector):
+    # True if the CSS selector matches anything in the raw (unrendered) HTML
+    if not html or not selector:
+        return False
+    try:
+        return bool(Selector(text=html).css(selector))
+    except ValueError:
+        return False
+
+
+def page_method_selector(page_methods):
+    # The selector a rendered request was going to wait for is the one the callback needs
+    if isinstance(page_methods, dict):
+        page_methods = page_methods.values()
+    for method in page_methods or ():
+        if getattr(method, "method", None) == "wait_for_selector" and method.args:
+            return method.args[0]
+    return None
+
+
+class RenderRouter:
+    # Decides per request whether a page needs the browser.
+    #
+    # routes maps a domain (without "www.") to a mode or to a dict:
+    #     "wasserstrom.com": "static",
+    #     "steelite-utopia.com": "browser",
+    #     "kitchenrestock.com": {"mode": "auto", "selectors": {"parse_product": "h1.heading-title"}},
+    # selectors are keyed by callback name and default to the request's wait_for_selector.
+    # In auto mode each (domain, selector) pair is fetched statically and rendered only
+    # when the static page misses the selector; after `misses` misses in a row the pair
+    # goes straight to the browser. Decisions are kept on disk so the next crawl does not
+    # probe again. Domains without a route keep whatever the spider asked for.
+
+    def __init__(self, routes=None, misses=2, path=None):
+        self.routes = {}
+        for domain, route in (routes or {}).items():
+            if isinstance(route, str):
+                route = {"mode": route}
+            mode = route.get("mode", AUTO)
+            if mode not in MODES:
+                raise ValueError(f"RENDER_ROUTES[{domain!r}]: unknown mode {mode!r}")
+            self.routes[route_host(f"//{domain}")] = {"mode": mode, "selectors": dict(route.get("selectors") or {})}
+        self.misses = max(1, int(misses))
+        self.path = Path(path or os.getenv("RENDER_ROUTES_PATH", str(DEFAULT_DECISIONS_PATH)))
+        self._lock = threading.Lock()
+        self.decisions = self._load()
+        self.probe_misses = {}
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_name = f"{self.path}.tmp"
+            with open(tmp_name, "w", encoding="utf-8") as f:
+                json.dump(self.decisions, f, indent=2, sort_keys=True)
+            os.replace(tmp_name, self.path)
+
+    def route(self, url):
+        host = route_host(url)
+        while host:
+            if host in self.routes:
+                return self.routes[host]
+            host = host.partition(".")[2]
+        return None
+
+    def selector_for(self, url, callback_name, page_methods=None):
+        route = self.route(url)
+        if route and callback_name in route["selectors"]:
+            return route["selectors"][callback_name]
+        return page_method_selector(page_methods)
+
+    def mode_for(self, url, selector=None):
+        # Returns STATIC or BROWSER for this request, or None to leave the spider's choice
+        route = self.route(url)
+        if route is None:
+            return None
+        if route["mode"] != AUTO:
+            return route["mode"]
+        if not selector:
+            return None
+        learned = self.decisions.get(route_host(url), {}).get(selector)
+        return BROWSER if learned == BROWSER else STATIC
+
+    def record_probe(self, url, selector, hit):
+        host = route_host(url)
+        key = (host, selector)
+        with self._lock:
+            domain = self.decisions.setdefault(host, {})
+            if hit:
+                self.probe_misses.pop(key, None)
+                changed = domain.get(selector) != STATIC
+                domain[selector] = STATIC
+                return changed
+            self.probe_misses[key] = self.probe_misses.get(key, 0) + 1
+            if domain.get(selector) != BROWSER and self.probe_misses[key] >= self.misses:
+                domain[selector] = BROWSER
+                return True
+        return False
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+from http_cache import DEFAULT_CACHE_DIR, SKIP_HEADERS, ResponseCache
+
+PROJECT_ROOT = Path(__file__).parent
+SESSIONS_DIR = Path(os.getenv("REPLAY_SESSIONS_DIR", str(PROJECT_ROOT / ".crawl_state" / "sessions")))
+STATS_PATH = "/__replay__/stats"
+
+# Local record/replay server for repeatable end-to-end crawls without the network.
+# A session is a frozen copy of the response cache (http_cache.py), so whatever a
+# live crawl fetched, browser renders included, can be served again:
+#
+#   replay_server.py capture NAME                 freeze .http_cache into a session
+#   replay_server.py serve NAME --profile hostile
+#   REPLAY_SERVER=http://127.0.0.1:8765 python run_all_scrapers.py
+#   replay_server.py run NAME --profile hostile -- python run_sanneng_spiders.py
+#
+# Clients ask for http://127.0.0.1:8765/<original url>; HttpClient and the Scrapy
+# projects do that rewriting themselves when REPLAY_SERVER is set. Injected faults
+# are decided per URL and attempt from --seed, so every run sees the same failures
+# whatever order the requests arrive in; only 429s depend on timing, like a real
+# per-host rate limit.
+
+# latency/jitter in seconds (jitter is a +/- fraction), error_rate and drop_rate per
+# request, rate_limit requests/second per host (0 = none) with `burst` allowed at once
+PROFILES = {
+    "clean": {"latency": 0.0, "jitter": 0.0, "error_rate": 0.0, "drop_rate": 0.0, "rate_limit": 0.0, "burst": 1},
+    "typical": {"latency": 0.15, "jitter": 0.5, "error_rate": 0.01, "drop_rate": 0.0, "rate_limit": 0.0, "burst": 1},
+    "hostile": {"latency": 0.4, "jitter": 0.8, "error_rate": 0.05, "drop_rate": 0.02, "rate_limit": 2.0, "burst": 2},
+}
+
+
+def session_dir(name):
+    return SESSIONS_DIR / name
+
+
+def replay_url(server, url):
+    return f"{server.rstrip('/')}/{url}"
+
+
+def capture(name, source=DEFAULT_CACHE_DIR):
+    # Copies the cache index (SQLite backup, consistent even while a crawl writes to
+    # it) and hard-links the bodies, which are never rewritten in place
+    source = Path(source)
+    if not (source / "index.sqlite").exists():
+        raise FileNotFoundError(f"No response cache at {source}")
+    target = session_dir(name)
+    if target.exists():
+        shutil.rmtree(target)
+    (target / "objects").mkdir(parents=True)
+
+    src = sqlite3.connect(str(source / "index.sqlite"), timeout=30)
+    dst = sqlite3.connect(str(target / "index.sqlite"))
+    with dst:
+        src.backup(dst)
+    hashes = [row[0] for row in dst.execute("SELECT DISTINCT body_hash FROM entries")]
+    entries = dst.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    src.close()
+    dst.close()
+
+    for body_hash in hashes:
+        blob = source / "objects" / body_hash[:2] / f"{body_hash}.gz"
+        if not blob.exists():
+            continue
+        path = target / "objects" / body_hash[:2] / blob.name
+        path.parent.mkdir(exist_ok=True)
+        try:
+            os.link(blob, path)
+        except OSError:
+            shutil.copy2(blob, path)
+    info = {"name": name, "source": str(source), "captured_at": time.time(), "entries": entries}
+    with open(target / "session.json", "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def list_sessions():
+    sessions = []
+    if SESSIONS_DIR.is_dir():
+        for path in sorted(SESSIONS_DIR.iterdir()):
+            try:
+                with open(path / "session.json", encoding="utf-8") as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # --record may have added responses since the capture
+            db = sqlite3.connect(str(path / "index.sqlite"))
+            info["entries"] = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            db.close()
+            info["bytes"] = sum(p.stat().st_size for p in (path / "objects").rglob("*.gz"))
+            sessions.append(info)
+    return sessions
+
+
+class FaultProfile:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, drop_rate=0.0, rate_limit=0.0, burst=1, seed=0):
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.error_rate = float(error_rate)
+        self.drop_rate = float(drop_rate)
+        self.rate_limit = float(rate_limit)
+        self.burst = max(1, int(burst))
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self._buckets = {}  # host -> (tokens, last refill)
+
+    def decide(self, url):
+        # ("drop" | "error" | "ok", latency) for this URL's next attempt
+        with self._lock:
+            attempt = self._attempts[url] = self._attempts.get(url, 0) + 1
+        rng = random.Random(f"{self.seed}:{attempt}:{url}")
+        delay = max(0.0, self.latency * rng.uniform(1 - self.jitter, 1 + self.jitter))
+        roll = rng.random()
+        if roll < self.drop_rate:
+            return "drop", delay
+        if roll < self.drop_rate + self.error_rate:
+            return "error", delay
+        return "ok", delay
+
+    def throttle(self, host):
+        # Seconds until the host has a token again, or 0 if this request may go ahead
+        if self.rate_limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(host, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate_limit)
+            if tokens >= 1:
+                self._buckets[host] = (tokens - 1, now)
+                return 0.0
+            self._buckets[host] = (tokens, now)
+            return (1 - tokens) / self.rate_limit
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cache, profile, record=False):
+        super().__init__(address, ReplayHandler)
+        self.cache = cache
+        self.profile = profile
+        self.record = record
+        self.client = None
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.hosts = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, outcome, host=None):
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            if host:
+                per_host = self.hosts.setdefault(host, {})
+                per_host[outcome] = per_host.get(outcome, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {"requests": sum(self.counts.values()), **self.counts, "hosts": json.loads(json.dumps(self.hosts))}
+
+    def fetch_upstream(self, url, headers):
+        # --record: a miss is fetched for real and added to the session
+        from http_client import HttpClient
+
+        with self._lock:
+            if self.client is None:
+                self.client = HttpClient(cache=False, replay=False, retries=1)
+        response = self.client.get(url, headers=headers)
+        clean = {k: v for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS}
+        if response.status_code == 200:
+            self.cache.put(url, response.status_code, clean, response.content)
+        return response.status_code, clean, response.content
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, headers, body, outcome):
+        self.send_response(status)
+        for key, value in headers.items():
+            if key.lower() not in SKIP_HEADERS:
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Replay", outcome)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == STATS_PATH:
+            body = json.dumps(self.server.stats(), indent=2).encode("utf-8")
+            return self._send(200, {"Content-Type": "application/json"}, body, "stats")
+
+        url = self.path.lstrip("/")
+        host = urlparse(url).hostname
+        if not url.startswith(("http://", "https://")) or not host:
+            self.server.count("bad_request")
+            return self._send(400, {"Content-Type": "text/plain"}, b"Expected /<absolute url>\n", "bad-request")
+
+        wait = self.server.profile.throttle(host)
+        if wait:
+            self.server.count("throttled", host)
+            headers = {"Content-Type": "text/plain", "Retry-After": str(math.ceil(wait))}
+            return self._send(429, headers, b"Too Many Requests\n", "throttled")
+
+        fate, delay = self.server.profile.decide(url)
+        if delay:
+            time.sleep(delay)
+        if fate == "drop":
+            # Connection closed with no answer, as a timed-out upstream would
+            self.server.count("dropped", host)
+            self.close_connection = True
+            return
+        if fate == "error":
+            self.server.count("errors", host)
+            return self._send(503, {"Content-Type": "text/plain"}, b"Service Unavailable\n", "error")
+
+        # Rendered and plain captures of a URL are cached apart; prefer the kind asked for
+        render = self.headers.get("X-Replay-Render", "static")
+        entry = self.server.cache.get(url, render) or self.server.cache.get(url, "browser" if render == "static" else "static")
+        if entry is not None:
+            self.server.count("hits", host)
+            return self._send(entry.status, entry.headers, self.server.cache.load_body(entry), "hit")
+        if self.server.record:
+            forward = {k: v for k, v in self.headers.items() if k.lower() not in ("host", "connection", "accept-encoding", "x-replay-render")}
+            try:
+                status, headers, body = self.server.fetch_upstream(url, forward)
+            except Exception as e:
+                self.server.count("record_failed", host)
+                return self._send(502, {"Content-Type": "text/plain"}, f"{e}\n".encode("utf-8"), "record-failed")
+            self.server.count("recorded", host)
+            return self._send(status, headers, body, "recorded")
+        self.server.count("misses", host)
+        return self._send(404, {"Content-Type": "text/plain"}, b"Not in this replay session\n", "miss")
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        # Sessions only hold GETs, as the response cache does
+        self.server.count("unsupported")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self._send(405, {"Content-Type": "text/plain", "Allow": "GET, HEAD"}, b"Replay serves GET only\n", "unsupported")
+
+
+def make_server(name, host="127.0.0.1", port=8765, profile="clean", record=False, seed=0, **overrides):
+    directory = session_dir(name)
+    if not (directory / "index.sqlite").exists() and not record:
+        raise FileNotFoundError(f"No replay session {name!r} in {SESSIONS_DIR} (run: replay_server.py capture {name})")
+    options = dict(PROFILES[profile])
+    options.update({k: v for k, v in overrides.items() if v is not None})
+    # Replays never evict: the session is a fixed workload
+    cache = ResponseCache(cache_dir=directory, max_bytes=1 << 62)
+    if not (directory / "session.json").exists():
+        with open(directory / "session.json", "w", encoding="utf-8") as f:
+            json.dump({"name": name, "source": "recorded", "captured_at": time.time(), "entries": 0}, f, indent=2)
+    return ReplayServer((host, port), cache, FaultProfile(seed=seed, **options), record=record)
+
+
+def print_stats(stats):
+    print(" ".join(f"{k}={v}" for k, v in stats.items() if k != "hosts"))
+    for host, counts in sorted(stats["hosts"].items()):
+        print(f"  {host:<40} " + " ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay HTTP server for offline end-to-end crawls")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cap = sub.add_parser("capture", help="Freeze a response cache into a named session")
+    cap.add_argument("name")
+    cap.add_argument("--from", dest="source", type=Path, default=DEFAULT_CACHE_DIR)
+
+    sub.add_parser("list", help="List captured sessions")
+
+    for command, help_text in (("serve", "Serve a session until interrupted"),
+                               ("run", "Serve a session while a command runs with REPLAY_SERVER set")):
+        p = sub.add_parser(command, help=help_text)
+        p.add_argument("name")
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=0 if command == "run" else 8765)
+        p.add_argument("--profile", choices=sorted(PROFILES), default="clean")
+        p.add_argument("--latency", type=float, help="Seconds added to every response")
+        p.add_argument("--jitter", type=float, help="+/- fraction of the latency")
+        p.add_argument("--error-rate", type=float, help="Share of requests answered 503")
+        p.add_argument("--drop-rate", type=float, help="Share of connections closed without an answer")
+        p.add_argument("--rate-limit", type=float, help="Requests/second per host before 429s (0 = off)")
+        p.add_argument("--burst", type=int)
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--record", action="store_true", help="Fetch misses from the live site and add them to the session")
+    # `run NAME [options] -- command...`
+    argv, cmd = sys.argv[1:], []
+    if "--" in argv:
+        argv, cmd = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+
+    if args.command == "capture":
+        info = capture(args.name, args.source)
+        print(f"Captured {info['entries']} responses from {info['source']} into {session_dir(args.name)}")
+        return
+    if args.command == "list":
+        for info in list_sessions():
+            captured = time.strftime("%Y-%m-%d %H:%M", time.localtime(info["captured_at"]))
+            print(f"{info['name']:<24} {info['entries']:>7} responses {info['bytes'] / 1024 ** 2:>8.1f} MB  {captured}  {info['source']}")
+        return
+
+    server = make_server(
+        args.name, args.host, args.port, args.profile, args.record, args.seed,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, rate_limit=args.rate_limit, burst=args.burst,
+    )
+    if args.command == "serve":
+        print(f"Replaying {args.name} on {server.url} (profile {args.profile}, seed {args.seed}); "
+              f"set REPLAY_SERVER={server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            print_stats(server.stats())
+        return
+
+    if not cmd:
+        parser.error("run needs a command after --")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    started = time.monotonic()
+    try:
+        code = subprocess.call(cmd, env={**os.environ, "REPLAY_SERVER": server.url})
+    finally:
+        server.shutdown()
+        server.server_close()
+    print(f"\n{' '.join(cmd)} exited {code} after {time.monotonic() - started:.1f}s "
+          f"(session {args.name}, profile {args.profile}, seed {args.seed})")
+    print_stats(server.stats())
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import os
 import csv
 from pathlib import Path
 
+from product_store import store_from_env
+
 def get_file_size(path):
     if not path.exists():
         return 0
@@ -40,13 +42,17 @@ spiders = [
     ("coupang", "React Marketplace - Taiwan", "coupang_products"),
 ]
 
+# Products per spider from the product store; spiders not in it are counted from their CSV
+store = store_from_env()
+store_counts = store.counts("sanneng") if store else {}
+
 working = []
 total_items = 0
 
 for spider, description, csv_name in spiders:
     csv_path = SANNENG_DIR / f"{csv_name}.csv"
     size = get_file_size(csv_path)
-    items = count_csv_rows(csv_path)
+    items = store_counts[spider][0] if spider in store_counts else count_csv_rows(csv_path)
     
     if items > 0:
         status = "WORKING"
@@ -3,10 +3,9 @@ import subprocess
 import sys
 import os
 from pathlib import Path
-import time
 import platform
 
-# Spiders to run in order - All 9 website scrapers
+# Spiders to run - All 9 website scrapers, crawled concurrently one lane per site
 SPIDERS = [
     "wasserstrom",                  # Wasserstrom.com - WORKING (100+ products)
     "steelitehome",                 # SteeliteHome.com - WORKING (325+ products)
@@ -57,59 +56,37 @@ def print_error(text):
     print(f"{Colors.FAIL}[ERROR] {text}{Colors.ENDC}")
 
 
-def run_spider(spider_name):
-    print_info(f"Starting spider: {spider_name}")
-    
+def run_spiders():
+    # All spiders share one Scrapy process and one browser; different sites crawl
+    # concurrently, each at its own per-domain limits (crawl_orchestrator.py).
+    # CRAWL_WORKERS=N spreads them, and page ranges of the big paginated spiders,
+    # over N processes instead (crawl_shards.py)
+    workers = int(os.getenv("CRAWL_WORKERS", "1"))
+    if workers > 1:
+        from crawl_shards import ShardedCrawl
+        runner = ShardedCrawl("steelite", SPIDERS, workers=workers)
+    else:
+        from crawl_orchestrator import CrawlOrchestrator
+        runner = CrawlOrchestrator("steelite", SPIDERS)
     try:
-        import sys
-        from scrapy.cmdline import execute
-        
-        # Save original argv and cwd
-        original_argv = sys.argv
-        original_cwd = os.getcwd()
-        
-        try:
-            # Change to steelite directory
-            os.chdir("steelite")
-            
-            # Set up scrapy command
-            sys.argv = ["scrapy", "crawl", spider_name]
-            
-            # Execute scrapy
-            result = execute()
-            
-            os.chdir(original_cwd)
-            sys.argv = original_argv
-            
-            if result is None or result == 0:
-                print_success(f"Spider '{spider_name}' completed successfully")
-                return True
-            else:
-                print_error(f"Spider '{spider_name}' returned code {result}")
-                return False
-                
-        except SystemExit as e:
-            os.chdir(original_cwd)
-            sys.argv = original_argv
-            # SystemExit with 0 = success
-            if e.code == 0 or e.code is None:
-                print_success(f"Spider '{spider_name}' completed successfully")
-                return True
-            else:
-                print_error(f"Spider '{spider_name}' failed with code {e.code}")
-                return False
-        except Exception as e:
-            os.chdir(original_cwd)
-            sys.argv = original_argv
-            print_error(f"Error running spider: {str(e)}")
-            return False
-            
+        if workers > 1:
+            runner.crawl()
+        else:
+            runner.run()
     except ImportError:
         print_error("Could not import Scrapy - please ensure it's installed")
-        return False
+        return []
     except Exception as e:
-        print_error(f"Error: {str(e)}")
-        return False
+        print_error(f"Error running spiders: {str(e)}")
+    runner.report()
+
+    results = runner.spider_results() if workers > 1 else runner.results
+    for result in results:
+        if result["success"]:
+            print_success(f"Spider '{result['spider']}' completed successfully ({result['seconds']:.1f}s)")
+        else:
+            print_error(f"Spider '{result['spider']}' failed")
+    return results
 
 
 def populate_excel():
@@ -154,21 +131,13 @@ def main():
         sys.exit(1)
     
     # Statistics
-    successful = 0
-    failed = 0
     skipped = 0
     
     print_header("Running Spiders")
     
-    for i, spider in enumerate(SPIDERS, 1):
-        print(f"\n[{i}/{len(SPIDERS)}] {spider.upper()}")
-        print("-" * 60)
-        
-        if run_spider(spider):
-            successful += 1
-            time.sleep(2)  # Small delay between spiders
-        else:
-            failed += 1
+    results = run_spiders()
+    successful = sum(1 for r in results if r["success"])
+    failed = len(SPIDERS) - successful
     
     # Summary of spider runs
     print_header("Spider Execution Summary")
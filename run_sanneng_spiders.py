@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import json
 import subprocess
 import os
 import sys
@@ -10,6 +11,8 @@ PROJECT_ROOT = Path(__file__).parent
 SANNENG_DIR = PROJECT_ROOT / "sanneng"
 ARRANGER_SCRIPT = PROJECT_ROOT / "sanneng_arranger_xlsx.py"
 ADDON_SCRIPT = PROJECT_ROOT / "search_addon_enrichment.py"
+ORCHESTRATOR_SCRIPT = PROJECT_ROOT / "crawl_orchestrator.py"
+SHARDS_SCRIPT = PROJECT_ROOT / "crawl_shards.py"
 
 # Define spider names and their output files
 SPIDERS = [
@@ -82,16 +85,31 @@ def run_spiders():
     print("STARTING SPIDER EXECUTION")
     print("="*60)
     
-    results = {}
+    # One Scrapy process runs every spider: different sites crawl concurrently, each
+    # at its own per-domain limits, and they share one browser (crawl_orchestrator.py)
+    # CsvExportPipeline streams items to <spider>_products.csv, no feed export needed
+    report_path = PROJECT_ROOT / ".crawl_state" / "sanneng_crawl_report.json"
+    report_path.parent.mkdir(exist_ok=True)
+    if report_path.exists():
+        report_path.unlink()
+    # CRAWL_WORKERS=N spreads the spiders over N processes instead (crawl_shards.py)
+    workers = int(os.getenv("CRAWL_WORKERS", "1"))
+    script = SHARDS_SCRIPT if workers > 1 else ORCHESTRATOR_SCRIPT
+    cmd = [sys.executable, str(script), "sanneng", *[name for name, _ in SPIDERS], "--report", str(report_path)]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    run_command(cmd, cwd=PROJECT_ROOT)
+    
+    timings = {}
+    if report_path.exists():
+        with open(report_path, encoding="utf-8") as f:
+            timings = {r["spider"]: r for r in json.load(f)["spiders"]}
     
+    results = {}
     for spider_name, output_file in SPIDERS:
-        start_time = time.time()
-        
-        # Run the spider
-        cmd = [sys.executable, "-m", "scrapy", "crawl", spider_name, "-O", output_file]
-        success = run_command(cmd, cwd=SANNENG_DIR)
-        
-        elapsed = time.time() - start_time
+        timing = timings.get(spider_name, {})
+        success = timing.get("success", False)
+        elapsed = timing.get("seconds", 0.0)
         results[spider_name] = {
             "success": success,
             "output": output_file,
@@ -108,10 +126,6 @@ def run_spiders():
             print(f"Spider '{spider_name}' ran but no output file found")
         else:
             print(f"Spider '{spider_name}' failed")
-        
-        # Small delay between spiders
-        if spider_name != SPIDERS[-1][0]:
-            time.sleep(2)
     
     return results
 
@@ -160,7 +174,7 @@ def print_summary(spider_results, addon_success, arranger_success):
         print(f"  {spider_name:20} {status:12} ({result['time']:.1f}s)")
         total_time += result['time']
     
-    print(f"\nTotal spider time: {total_time:.1f}s")
+    print(f"\nTotal spider time: {total_time:.1f}s (spiders ran concurrently, see the wall time above)")
     
     print(f"\nExcel Arranger: {'SUCCESS' if arranger_success else 'FAILED'}")
     print(f"SKU Search Add-on: {'SUCCESS' if addon_success else 'FAILED'}")
@@ -0,0 +1,19 @@
+from scrapy.commands.crawl import Command as ScrapyCrawlCommand
+
+
+class Command(ScrapyCrawlCommand):
+    # scrapy crawl <spider> --resume <job>: checkpoint the run under <job> and,
+    # if an earlier run of that job was interrupted, continue where it stopped
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--resume",
+            metavar="JOB",
+            help="checkpoint the crawl as JOB and resume it if a previous run did not finish",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        if opts.resume:
+            self.settings.set("CHECKPOINT_JOB", opts.resume, priority="cmdline")
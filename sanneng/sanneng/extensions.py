@@ -0,0 +1,5 @@
+# Extensions of the sanneng project
+
+# Shared with the other Scrapy project: the implementation is in crawl_components.py
+# at the repository root, settings.py enables the classes from here
+from crawl_components import AdaptiveThrottleExtension, TelemetryExtension
@@ -7,12 +7,29 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+import sys
+from pathlib import Path
+
+# Shared helpers (http_cache.py, ...) live in the repository root
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
 BOT_NAME = "sanneng"
 
 SPIDER_MODULES = ["sanneng.spiders"]
 NEWSPIDER_MODULE = "sanneng.spiders"
+COMMANDS_MODULE = "sanneng.commands"
+
+ADDONS = {
+    "sanneng.replay.ReplayAddon": 100,
+}
 
-ADDONS = {}
+# Offline crawls (see replay_server.py): with REPLAY_SERVER (or the environment
+# variable of that name) set to a running replay server, every download is served
+# from its captured session instead of the live sites
+REPLAY_SERVER = os.getenv("REPLAY_SERVER")
 
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
@@ -51,27 +68,101 @@ DEFAULT_REQUEST_HEADERS = {
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "sanneng.middlewares.SannengSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    # Below HttpErrorMiddleware (50), so it sees every callback's final output
+    "sanneng.middlewares.CheckpointMiddleware": 45,
+    "sanneng.middlewares.TelemetrySpiderMiddleware": 950,
+}
+
+# Resumable crawls: `scrapy crawl <spider> --resume <job>` sets CHECKPOINT_JOB.
+# State lives in CHECKPOINT_DIR/<job>/checkpoint.sqlite (default .crawl_state/jobs)
+CHECKPOINT_JOB = None
+CHECKPOINT_DIR = None
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "sanneng.middlewares.SannengDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    # Below RetryMiddleware (550) and OffsiteMiddleware (50): ends checkpoint rows of failed downloads
+    "sanneng.middlewares.CheckpointDownloaderMiddleware": 40,
+    "sanneng.middlewares.RenderRoutingMiddleware": 500,
+    # After render routing, which decides whether a request is rendered (part of the cache key)
+    "sanneng.middlewares.ResponseCacheMiddleware": 510,
+    "sanneng.middlewares.PlaywrightPagePoolMiddleware": 900,
+    "sanneng.middlewares.FixtureRecorderMiddleware": 950,
+    "sanneng.middlewares.WarcArchiveMiddleware": 960,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "sanneng.extensions.AdaptiveThrottleExtension": 500,
+    "sanneng.extensions.TelemetryExtension": 510,
+}
+
+# Per-domain AIMD throttle (see adaptive_throttle.py). DOWNLOAD_DELAY and
+# CONCURRENT_REQUESTS_PER_DOMAIN are where a domain starts on its first crawl; the
+# rate is then raised while responses stay fast and cut on 429/503, Retry-After,
+# timeouts and rising latency, within the bounds below (CONCURRENT_REQUESTS still
+# caps the whole crawl). The rate reached is kept per domain in
+# ADAPTIVE_THROTTLE_STATE_PATH (default .crawl_state/throttle.json) for the next run.
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_MIN_DELAY = 0.25
+ADAPTIVE_THROTTLE_MAX_DELAY = 120
+ADAPTIVE_THROTTLE_MAX_CONCURRENCY = 4
+ADAPTIVE_THROTTLE_MAX_PAUSE = 600
+ADAPTIVE_THROTTLE_STATE_PATH = None
+ADAPTIVE_THROTTLE_DEBUG = False
+
+# Crawl telemetry (see crawl_telemetry.py): per-stage timing histograms (queue,
+# download, render_wait, callback, pipeline), bytes per domain and items/s, written
+# to TELEMETRY_DIR/<spider>.jsonl (one record per interval and a final one) or, with
+# TELEMETRY_FORMAT = "prometheus", to <spider>.prom; a summary table is logged on close
+TELEMETRY_ENABLED = True
+TELEMETRY_DIR = None
+TELEMETRY_FORMAT = "jsonl"
+TELEMETRY_INTERVAL = 60
+
+# Offline parser fixtures (see fixture_corpus.py): FIXTURE_RECORD = True saves the
+# first FIXTURE_RECORD_PER_CALLBACK responses of each callback to fixtures/
+FIXTURE_RECORD = False
+FIXTURE_RECORD_PER_CALLBACK = 2
+
+# Raw response archive (see warc_archive.py): WARC_ARCHIVE_ENABLED = True writes every
+# response to WARC_ARCHIVE_DIR/<spider>/*.warc.gz (default warc/), a new file every
+# WARC_ARCHIVE_MAX_BYTES; `warc_archive.py reextract <project> <spider>` reruns the
+# callbacks over them
+WARC_ARCHIVE_ENABLED = False
+WARC_ARCHIVE_DIR = None
+WARC_ARCHIVE_MAX_BYTES = 1024 ** 3
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "sanneng.pipelines.SannengPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "sanneng.pipelines.CsvExportPipeline": 300,
+    "sanneng.pipelines.ParquetExportPipeline": 310,
+    "sanneng.pipelines.ProductStorePipeline": 320,
+}
+
+# CsvExportPipeline: rows are written every CSV_EXPORT_BATCH_SIZE items or
+# CSV_EXPORT_FLUSH_INTERVAL seconds, whichever comes first, and fsync'd
+CSV_EXPORT_BATCH_SIZE = 50
+CSV_EXPORT_FLUSH_INTERVAL = 30
+CSV_EXPORT_FSYNC = True
+CSV_EXPORT_MISSING_VALUE = ""
+
+# ParquetExportPipeline: the same rows as a Parquet dataset partitioned by spider and
+# crawl date, read column by column by the arrangers (see product_dataset.py)
+PARQUET_EXPORT_ENABLED = True
+PARQUET_DATASET_DIR = str(PROJECT_ROOT / "sanneng" / "dataset")
+PARQUET_EXPORT_BATCH_SIZE = 1000
+
+# ProductStorePipeline: upserts every product into the shared SQLite store keyed on
+# (spider, SKU, product_url), with per-field provenance (see product_store.py).
+# The SKU is the first non-empty field of PRODUCT_STORE_SKU_FIELDS.
+PRODUCT_STORE_ENABLED = True
+PRODUCT_STORE_PATH = str(PROJECT_ROOT / ".crawl_state" / "products.sqlite")
+PRODUCT_STORE_BATCH_SIZE = 200
+PRODUCT_STORE_SKU_FIELDS = ["sku"]
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -94,6 +185,18 @@ DEFAULT_REQUEST_HEADERS = {
 #HTTPCACHE_IGNORE_HTTP_CODES = []
 #HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
 
+# On-disk response cache shared with the standalone scripts (see http_cache.py).
+# Fresh entries are served without a request; stale ones are revalidated with
+# If-None-Match / If-Modified-Since so unchanged pages come back as 304s.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_DIR = str(PROJECT_ROOT / ".http_cache")
+RESPONSE_CACHE_TTL = 24 * 3600
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+RESPONSE_CACHE_TTL_PER_SPIDER = {
+    "sannengvietnam": 7 * 24 * 3600,
+    "chakawal": 3 * 24 * 3600,
+}
+
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
 
@@ -117,3 +220,37 @@ PLAYWRIGHT_LAUNCH_ARGS = {
 
 # Wait for selector to load before scraping
 PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT = 30000
+
+# Skip images, fonts, media and analytics/tracking scripts on rendered pages
+# (see playwright_tuning.py)
+PLAYWRIGHT_ABORT_REQUEST = "playwright_tuning.should_abort_request"
+
+# Warm pages kept open between playwright requests; keep it below
+# CONCURRENT_REQUESTS (the per-context page limit). Run once with
+# -s PLAYWRIGHT_PAGE_POOL_SIZE=0 to record the unpooled pages/s baseline
+# that the end-of-crawl report compares against.
+PLAYWRIGHT_PAGE_POOL_SIZE = 4
+PLAYWRIGHT_RATES_PATH = None
+
+# Per-domain choice between plain HTTP and the browser (see render_routing.py).
+# "static" never renders, "browser" always does, "auto" fetches statically and
+# renders only when the callback's selector is missing from the raw HTML.
+# Probe decisions are kept in RENDER_ROUTES_PATH (default .crawl_state/render_routes.json)
+RENDER_ROUTING_ENABLED = True
+RENDER_ROUTES = {
+    # Server-rendered HTML, never needs the browser
+    "sannengvietnam.com": "static",
+    # Bot checks only pass in a real browser
+    "coupang.com": "browser",
+    # Probed: static first, rendered only where the selector is missing
+    "chakawal.com": {
+        "mode": "auto",
+        "selectors": {"parse": "a[href*='/product/']", "parse_product": "h1.product_title"},
+    },
+    "unopan.tw": {
+        "mode": "auto",
+        "selectors": {"parse": "a[href*='/product']", "parse_product": "h1"},
+    },
+}
+RENDER_PROBE_MISSES = 2
+RENDER_ROUTES_PATH = None
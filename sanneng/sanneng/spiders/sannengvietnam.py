@@ -1,22 +1,109 @@
 import scrapy
-import csv
 import re
 import json
 
+from catalog_api import CatalogApiError, load_json, shopify_products, shopify_products_url, shopify_records
+
 
 class SannengvietnamSpider(scrapy.Spider):
     name = "sannengvietnam"
     allowed_domains = ["sannengvietnam.com"]
+    csv_filename = "sannengvietnam_products.csv"
+    csv_fieldnames = [
+        'sku', 'name', 'image_link', 'overview', 'length', 'width', 'height',
+        'diameter', 'volume', 'material', 'color', 'pattern',
+        'ean_code', 'barcode', 'product_url', 'source'
+    ]
     
-    def __init__(self, *args, **kwargs):
+    base_url = "https://sannengvietnam.com"
+
+    def __init__(self, api="1", *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.product_data = []
         self.max_pages = 4
+        # The store is Shopify: products.json returns 250 products per request.
+        # -a api=0 crawls the collection and product pages instead
+        self.api = str(api).lower() not in ("0", "false", "no", "off")
     
     def start_requests(self):
+        if self.api:
+            yield scrapy.Request(shopify_products_url(self.base_url, 1), callback=self.parse_api,
+                                 errback=self.api_failed, cb_kwargs={'page': 1})
+            return
+        yield from self.html_requests()
+
+    def html_requests(self):
         for page in range(1, self.max_pages + 1):
-            url = f"https://sannengvietnam.com/collections/all?page={page}"
+            url = f"{self.base_url}/collections/all?page={page}"
             yield scrapy.Request(url, callback=self.parse, meta={'page': page})
+
+    def api_failed(self, failure):
+        self.logger.warning(f"products.json request failed ({failure.value}), falling back to the HTML collection pages")
+        yield from self.html_requests()
+
+    def parse_api(self, response, page):
+        try:
+            products = shopify_products(load_json(response.body)) if response.status == 200 else None
+        except CatalogApiError as e:
+            self.logger.warning(f"products.json unusable ({e})")
+            products = None
+        if products is None:
+            if page == 1:
+                self.logger.warning("Falling back to the HTML collection pages")
+                yield from self.html_requests()
+            return
+
+        self.logger.info(f"products.json page {page}: {len(products)} products")
+        for product in products:
+            for record in shopify_records(product, self.base_url):
+                yield self.product_from_record(record)
+
+        if len(products) >= 250:
+            yield scrapy.Request(shopify_products_url(self.base_url, page + 1), callback=self.parse_api, cb_kwargs={'page': page + 1})
+
+    def product_from_record(self, record):
+        # Same columns and fallbacks as parse_product
+        description = record['overview']
+        product = {
+            'sku': record['sku'] or self.sku_from(description, record['product_url']),
+            'name': record['name'] or 'N/A',
+            'image_link': record['image_link'] or 'N/A',
+            'overview': description or 'N/A',
+        }
+        product.update(self.description_fields(description))
+        product['diameter'] = 'N/A'
+        product['volume'] = 'N/A'
+        product['color'] = record['color'] or 'N/A'
+        product['pattern'] = record['pattern'] or 'N/A'
+        product['ean_code'] = record['ean'] or 'N/A'
+        product['barcode'] = record['barcode'] or 'N/A'
+        product['product_url'] = record['product_url']
+        product['source'] = 'sannengvietnam.com'
+        return product
+
+    def sku_from(self, description, url):
+        if description and 'Mã sản phẩm:' in description:
+            sku_match = re.search(r'Mã sản phẩm:\s*(SN\w+)', description)
+            if sku_match:
+                return sku_match.group(1)
+        # Try from URL - match SN, UN, or other 2-letter + number patterns
+        url_sku = re.search(r'([a-z]{2}\d+\w*)', url, re.I)
+        return url_sku.group(1).upper() if url_sku else 'N/A'
+
+    def description_fields(self, description):
+        fields = {'length': 'N/A', 'width': 'N/A', 'height': 'N/A', 'material': 'N/A'}
+        if not description:
+            return fields
+        # Size extraction: 60x40x20cm
+        size_match = re.search(r'Kích thước:\s*(\d+)x(\d+)x(\d+)\s*cm', description)
+        if size_match:
+            fields['length'] = f"{size_match.group(1)}cm"
+            fields['width'] = f"{size_match.group(2)}cm"
+            fields['height'] = f"{size_match.group(3)}cm"
+        # Material extraction
+        material_match = re.search(r'Chất liệu:\s*([^-]+)', description)
+        if material_match:
+            fields['material'] = material_match.group(1).strip()
+        return fields
     
     def parse(self, response):
         page = response.meta['page']
@@ -37,20 +124,8 @@ class SannengvietnamSpider(scrapy.Spider):
     def parse_product(self, response):
         product = {}
         
-        # SKU from meta description or title
         meta_desc = response.css('meta[name="description"]::attr(content)').get()
-        if meta_desc and 'Mã sản phẩm:' in meta_desc:
-            sku_match = re.search(r'Mã sản phẩm:\s*(SN\w+)', meta_desc)
-            if sku_match:
-                product['sku'] = sku_match.group(1)
-        
-        if 'sku' not in product or not product.get('sku'):
-            # Try from URL - match SN, UN, or other 2-letter + number patterns
-            url_sku = re.search(r'([a-z]{2}\d+\w*)', response.url, re.I)
-            if url_sku:
-                product['sku'] = url_sku.group(1).upper()
-            else:
-                product['sku'] = 'N/A'
+        product['sku'] = self.sku_from(meta_desc, response.url)
         
         # Product name
         name = response.css('h1.title::text').get() or \
@@ -79,29 +154,7 @@ class SannengvietnamSpider(scrapy.Spider):
         product['overview'] = meta_desc if meta_desc else 'N/A'
         
         # Extract dimensions and material from description
-        if meta_desc:
-            # Size extraction: 60x40x20cm
-            size_match = re.search(r'Kích thước:\s*(\d+)x(\d+)x(\d+)\s*cm', meta_desc)
-            if size_match:
-                product['length'] = f"{size_match.group(1)}cm"
-                product['width'] = f"{size_match.group(2)}cm"
-                product['height'] = f"{size_match.group(3)}cm"
-            else:
-                product['length'] = 'N/A'
-                product['width'] = 'N/A'
-                product['height'] = 'N/A'
-            
-            # Material extraction
-            material_match = re.search(r'Chất liệu:\s*([^-]+)', meta_desc)
-            if material_match:
-                product['material'] = material_match.group(1).strip()
-            else:
-                product['material'] = 'N/A'
-        else:
-            product['length'] = 'N/A'
-            product['width'] = 'N/A'
-            product['height'] = 'N/A'
-            product['material'] = 'N/A'
+        product.update(self.description_fields(meta_desc))
         
         product['diameter'] = 'N/A'
         product['volume'] = 'N/A'
@@ -114,33 +167,6 @@ class SannengvietnamSpider(scrapy.Spider):
         product['product_url'] = response.url
         product['source'] = 'sannengvietnam.com'
         
-        self.product_data.append(product)
         self.logger.info(f"Scraped: {product['name']} - SKU: {product['sku']}")
         
         yield product
-    
-    def closed(self, reason):
-        if self.product_data:
-            self.save_to_csv()
-        self.logger.info(f"Spider closed. Total products scraped: {len(self.product_data)}")
-    
-    def save_to_csv(self):
-        if not self.product_data:
-            return
-        
-        fieldnames = [
-            'sku', 'name', 'image_link', 'overview', 'length', 'width', 'height',
-            'diameter', 'volume', 'material', 'color', 'pattern',
-            'ean_code', 'barcode', 'product_url', 'source'
-        ]
-        
-        filename = 'sannengvietnam_products.csv'
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for product in self.product_data:
-                    writer.writerow(product)
-            self.logger.info(f"Data saved to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
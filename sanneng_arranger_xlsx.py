@@ -4,29 +4,96 @@ import os
 from pathlib import Path
 import re
 
+from product_dataset import read_source
+from product_schema import normalize_image_series, normalize_sku_series
+from product_store import store_from_env
+from sku_resolution import RULE_RANK, SkuIndex, accepted_rules, load_aliases
+import xlsx_patch
+import xlsx_stream
+
+ALIASES_PATH = 'sources/sku_aliases.csv'  # Optional alias,code table
+UPDATE_MODE = os.getenv('XLSX_UPDATE_MODE', 'patch')  # or 'rewrite'
+
+
+COLUMN_MAPPING = {
+    'image_link': 'E',  # Column E: Image Link
+    'overview': 'F',     # Column F: Overview
+    'length': 'G',       # Column G: Length
+    'width': 'H',        # Column H: Width
+    'height': 'I',       # Column I: Height
+    'volume': 'J',       # Column J: Volume
+    'diameter': 'K',     # Column K: Diameter
+    'color': 'L',        # Column L: Color
+    'material': 'M',     # Column M: Material
+    'ean_code': 'N',     # Column N: EAN Code
+    'pattern': 'O',      # Column O: Pattern
+    'barcode': 'P',      # Column P: Barcode
+    'product_url': 'Q',  # Column Q: Product URL (optional)
+    'source': 'R',       # Column R: Source (optional)
+}
+
+COL_NAMES = {
+    'E': 'Image Link',
+    'F': 'Overview',
+    'G': 'Length',
+    'H': 'Width',
+    'I': 'Height',
+    'J': 'Volume',
+    'K': 'Diameter',
+    'L': 'Color',
+    'M': 'Material',
+    'N': 'EAN Code',
+    'O': 'Pattern',
+    'P': 'Barcode',
+    'Q': 'Product URL',
+    'R': 'Source',
+}
+
+
+# Spider name -> its CSV, in the order rows are preferred when SKUs repeat
+SPIDER_CSVS = {
+    'chakawal': 'sanneng/chakawal_products.csv',
+    'sannengvietnam': 'sanneng/sannengvietnam_products.csv',
+    'tokopedia': 'sanneng/tokopedia_products.csv',
+    'unopan': 'sanneng/unopan_products.csv',
+    'coupang': 'sanneng/coupang_products.csv',
+}
+ADDON_CSV = 'sanneng/addon_search_products.csv'
+DATASET_DIR = 'sanneng/dataset'  # Written by ParquetExportPipeline
+
 
 def load_all_scraped_data():
-    csv_files = [
-        'sanneng/chakawal_products.csv',
-        'sanneng/sannengvietnam_products.csv',
-        'sanneng/tokopedia_products.csv',
-        'sanneng/unopan_products.csv',
-        'sanneng/coupang_products.csv',
-        'sanneng/addon_search_products.csv'
-    ]
-    
+    columns = ['sku'] + list(COLUMN_MAPPING)
     all_data = []
+    store = store_from_env()
+    stored = store.sources('sanneng') if store else []
     
-    for csv_file in csv_files:
-        if os.path.exists(csv_file):
-            try:
-                df = pd.read_csv(csv_file, encoding='utf-8')
-                print(f"Loaded {len(df)} products from {csv_file}")
-                all_data.append(df)
-            except Exception as e:
-                print(f"Error loading {csv_file}: {e}")
+    for source, csv_file in SPIDER_CSVS.items():
+        try:
+            # Product store when the spider has written to it, else the Parquet dataset, else its CSV
+            if source in stored:
+                df = store.frame('sanneng', [source], columns).drop(columns='_source')
+            else:
+                df = read_source(DATASET_DIR, source, columns=columns, csv_path=csv_file, csv_dtype=None)
+        except Exception as e:
+            print(f"Error loading {source}: {e}")
+            continue
+        if len(df):
+            print(f"Loaded {len(df)} products from {source}")
+            all_data.append(df)
         else:
-            print(f"File not found: {csv_file}")
+            print(f"No data for {source}")
+
+    # The search add-on is a script, not a spider: CSV only
+    if os.path.exists(ADDON_CSV):
+        try:
+            df = pd.read_csv(ADDON_CSV, encoding='utf-8', usecols=lambda c: c in columns)
+            print(f"Loaded {len(df)} products from {ADDON_CSV}")
+            all_data.append(df)
+        except Exception as e:
+            print(f"Error loading {ADDON_CSV}: {e}")
+    else:
+        print(f"File not found: {ADDON_CSV}")
     
     if not all_data:
         print("No scraped data files found!")
@@ -39,168 +106,185 @@ def load_all_scraped_data():
     return combined_df
 
 
-def normalize_sku(sku):
-    if pd.isna(sku):
-        return None
-    value = str(sku).strip().upper()
-    if not value or value in {"N/A", "NAN", "NONE"}:
-        return None
+def find_mfr_column(df_excel):
+    for col in df_excel.columns:
+        if any(keyword in str(col).upper() for keyword in ['MFR', 'SKU', 'MODEL', 'CODE', '型號']):
+            return col
+    return None
 
-    value = value.replace(" ", "")
-    extracted = re.search(r"SN\d+[A-Z0-9-]*", value)
-    if extracted:
-        return extracted.group(0)
 
-    return value
+def build_sku_index(scraped_data, resolver=None):
+    # One row per SKU: the first row with a usable image link, otherwise the first
+    # row. Rows without a SKU share one (missing) key, as they did when this was a
+    # dict built row by row. With a resolver, SKUs are first resolved to the sheet's
+    # codes and rows matched by a stricter rule win over looser ones.
+    keyed = scraped_data.copy()
+    keyed['_normalized_sku'] = normalize_sku_series(keyed['sku'])
+    keyed['_rule'] = None
+    if resolver is not None:
+        keyed['_normalized_sku'], keyed['_rule'], _ = resolver.join_keys(keyed['_normalized_sku'], accept=accepted_rules())
+    if 'image_link' in keyed.columns:
+        keyed['image_link'] = normalize_image_series(keyed['image_link'])
+        no_image = keyed['image_link'].eq('N/A')
+    else:
+        no_image = pd.Series(True, index=keyed.index)
 
+    keyed['_no_image'] = no_image
+    keyed['_rank'] = keyed['_rule'].map(RULE_RANK).fillna(len(RULE_RANK))
+    keyed = keyed.sort_values(['_rank', '_no_image'], kind='stable')
+    keyed = keyed.drop_duplicates(subset=['_normalized_sku'], keep='first')
+    keyed = keyed.sort_index()
+    columns = ['_normalized_sku', '_rule'] + [col for col in COLUMN_MAPPING if col in keyed.columns]
+    return keyed[columns].reset_index(drop=True)
 
-def normalize_image_link(link):
-    if pd.isna(link):
-        return 'N/A'
-    value = str(link).strip()
-    if not value or value.upper() in {"N/A", "NONE", "NAN"}:
-        return 'N/A'
-    if value.startswith('//'):
-        return f"https:{value}"
-    return value
 
+def merge_scraped_data(df_excel, scraped_data, mfr_column, resolver=None, sku_index=None):
+    # Left-joins the SKU index onto the Excel rows and fills only the cells that are
+    # still empty, one column at a time. Returns the updated frame and match stats.
+    # A streamed sheet passes the resolver and index built once for the whole sheet.
+    df_excel = df_excel.copy()
+    for col_name in COL_NAMES.values():
+        if col_name not in df_excel.columns:
+            df_excel[col_name] = None
+
+    normalized = normalize_sku_series(df_excel[mfr_column])
+    if resolver is None:
+        resolver = SkuIndex(normalized, aliases=load_aliases(ALIASES_PATH))
+    if sku_index is None:
+        sku_index = build_sku_index(scraped_data, resolver)
+    keys = normalized.map(resolver.master_key)
+    joined = pd.merge(
+        keys.rename('_normalized_sku').to_frame(),
+        sku_index,
+        on='_normalized_sku',
+        how='left',
+        indicator=True,
+    )
+    joined.index = df_excel.index
+    matched = joined['_merge'].eq('both')
 
-def row_has_valid_image(row):
-    return normalize_image_link(row.get('image_link', 'N/A')) != 'N/A'
+    stats = {
+        'rows': len(df_excel),
+        'unique_skus': len(sku_index),
+        'matched': int(matched.sum()),
+        'no_match': int((~matched).sum()),
+        'no_sku': int(normalized.isna().sum()),
+        'by_rule': joined.loc[matched, '_rule'].fillna('blank').value_counts().to_dict(),
+        'report': pd.DataFrame({
+            mfr_column: df_excel[mfr_column],
+            'sku': normalized,
+            'rule': joined['_rule'].where(matched, 'unmatched').fillna('blank'),
+        }),
+        'by_source': {},
+        'filled': {},
+    }
+    if 'source' in joined.columns:
+        stats['by_source'] = joined.loc[matched, 'source'].fillna('unknown').value_counts().to_dict()
 
+    for scraped_col, excel_col_letter in COLUMN_MAPPING.items():
+        excel_col_name = COL_NAMES[excel_col_letter]
+        current = df_excel[excel_col_name]
+        fill = matched & (current.isna() | current.eq(''))
+        stats['filled'][excel_col_name] = int(fill.sum())
+        if not fill.any():
+            continue
+        if scraped_col in joined.columns:
+            values = joined[scraped_col]
+        else:
+            values = pd.Series('N/A', index=df_excel.index)
+        df_excel[excel_col_name] = current.astype(object).mask(fill, values)
 
-def populate_excel(excel_path, scraped_data):
+    return df_excel, stats
+
+
+def add_stats(total, stats):
+    for key in ('rows', 'matched', 'no_match', 'no_sku'):
+        total[key] = total.get(key, 0) + stats[key]
+    total['unique_skus'] = stats['unique_skus']
+    for key in ('by_rule', 'by_source', 'filled'):
+        counts = total.setdefault(key, {})
+        for name, count in stats[key].items():
+            counts[name] = counts.get(name, 0) + count
+    return total
+
+
+def populate_excel(excel_path, scraped_data, chunk_rows=xlsx_stream.DEFAULT_CHUNK_ROWS):
+    # The sheet is streamed: one read of the MFR column to build the SKU resolver,
+    # then a single pass that merges and writes chunk_rows rows at a time
+    output_path = excel_path.replace('.xlsx', '_updated.xlsx')
+    if UPDATE_MODE != 'rewrite':
+        inputs = xlsx_patch.inputs_digest(excel_path, scraped_data, ALIASES_PATH, accepted_rules())
+        if xlsx_patch.published_for(output_path, inputs):
+            print(f"\nNo changes: {output_path} was already published from this workbook and scraped data")
+            return
     try:
-        # Read the Excel file
-        df_excel = pd.read_excel(excel_path, engine='openpyxl')
+        sheet = xlsx_stream.SheetReader(excel_path)
+        header = sheet.header
         print(f"\nLoaded Excel file: {excel_path}")
-        print(f"Excel has {len(df_excel)} rows")
-        print(f"Excel columns: {list(df_excel.columns)}")
+        print(f"Excel columns: {header}")
     except Exception as e:
         print(f"Error loading Excel file: {e}")
         return
     
-    mfr_column = None
-    for col in df_excel.columns:
-        if any(keyword in str(col).upper() for keyword in ['MFR', 'SKU', 'MODEL', 'CODE', '型號']):
-            mfr_column = col
-            break
-    
+    mfr_column = find_mfr_column(pd.DataFrame(columns=header))
     if mfr_column is None:
         print("Could not find MFR/SKU column in Excel. Using first column as MFR.")
-        mfr_column = df_excel.columns[0]
+        mfr_column = header[0]
     
     print(f"Using '{mfr_column}' as MFR/SKU column")
     
-    # Normalize SKUs in both datasets
-    df_excel['_normalized_sku'] = df_excel[mfr_column].apply(normalize_sku)
-    scraped_data['_normalized_sku'] = scraped_data['sku'].apply(normalize_sku)
-    
-    # Normalize image links early
-    if 'image_link' in scraped_data.columns:
-        scraped_data['image_link'] = scraped_data['image_link'].apply(normalize_image_link)
-
-    # Create a mapping from SKU to scraped data, preferring rows with valid image links
-    sku_to_data = {}
-    for _, row in scraped_data.iterrows():
-        sku = row['_normalized_sku']
-        if not sku:
-            continue
-
-        if sku not in sku_to_data:
-            sku_to_data[sku] = row
-            continue
-
-        existing = sku_to_data[sku]
-        if row_has_valid_image(row) and not row_has_valid_image(existing):
-            sku_to_data[sku] = row
-    
-    print(f"\nUnique SKUs in scraped data: {len(sku_to_data)}")
-    
-    column_mapping = {
-        'image_link': 'E',  # Column E: Image Link
-        'overview': 'F',     # Column F: Overview
-        'length': 'G',       # Column G: Length
-        'width': 'H',        # Column H: Width
-        'height': 'I',       # Column I: Height
-        'volume': 'J',       # Column J: Volume
-        'diameter': 'K',     # Column K: Diameter
-        'color': 'L',        # Column L: Color
-        'material': 'M',     # Column M: Material
-        'ean_code': 'N',     # Column N: EAN Code
-        'pattern': 'O',      # Column O: Pattern
-        'barcode': 'P',      # Column P: Barcode
-        'product_url': 'Q',  # Column Q: Product URL (optional)
-        'source': 'R',       # Column R: Source (optional)
-    }
-    
-    # Ensure columns exist in Excel (add if missing)
-    col_names = {
-        'E': 'Image Link',
-        'F': 'Overview',
-        'G': 'Length',
-        'H': 'Width',
-        'I': 'Height',
-        'J': 'Volume',
-        'K': 'Diameter',
-        'L': 'Color',
-        'M': 'Material',
-        'N': 'EAN Code',
-        'O': 'Pattern',
-        'P': 'Barcode',
-        'Q': 'Product URL',
-        'R': 'Source',
-    }
-    
-    # Add columns if they don't exist
-    for col_letter, col_name in col_names.items():
-        if col_name not in df_excel.columns:
-            df_excel[col_name] = None
-    
-    # Populate the data
-    matches = 0
-    no_matches = 0
-    
-    for idx, row in df_excel.iterrows():
-        excel_sku = row['_normalized_sku']
-        
-        if excel_sku and excel_sku in sku_to_data:
-            scraped_row = sku_to_data[excel_sku]
-            matches += 1
-            
-            # Populate each mapped column
-            for scraped_col, excel_col_letter in column_mapping.items():
-                excel_col_name = col_names[excel_col_letter]
-                value = scraped_row.get(scraped_col, 'N/A')
-
-                if scraped_col == 'image_link':
-                    value = normalize_image_link(value)
-                
-                # Only populate if current value is empty/None
-                if pd.isna(df_excel.at[idx, excel_col_name]) or df_excel.at[idx, excel_col_name] == '':
-                    df_excel.at[idx, excel_col_name] = value
-            
-            print(f"Matched SKU: {excel_sku} from {scraped_row.get('source', 'unknown')}")
-        else:
-            no_matches += 1
-            if excel_sku:
-                print(f"No match for SKU: {excel_sku}")
-    
-    # Remove temporary column
-    df_excel = df_excel.drop(columns=['_normalized_sku'])
+    codes = normalize_sku_series(pd.Series(sheet.column(mfr_column), dtype=object))
+    print(f"Excel has {len(codes)} rows")
+    resolver = SkuIndex(codes, aliases=load_aliases(ALIASES_PATH))
+    sku_index = build_sku_index(scraped_data, resolver)
+    print(f"\nUnique SKUs in scraped data: {len(sku_index)}")
     
     # Save the updated Excel file
-    output_path = excel_path.replace('.xlsx', '_updated.xlsx')
+    report_path = output_path.replace('.xlsx', '_sku_matches.csv')
     try:
-        df_excel.to_excel(output_path, index=False, engine='openpyxl')
+        columns = header + [name for name in COL_NAMES.values() if name not in header]
+        # patch (default): only the changed cells are written into a copy of the sheet;
+        # rewrite: the whole sheet is written out again
+        if UPDATE_MODE == 'rewrite':
+            writer = xlsx_stream.SheetWriter(output_path, columns)
+        else:
+            changeset = xlsx_patch.Changeset(excel_path, sheet.sheet.title, inputs=inputs)
+            changeset.add_header(header, columns)
+        stats = {}
+        for number, chunk in enumerate(sheet.frames(chunk_rows)):
+            merged, chunk_stats = merge_scraped_data(chunk, scraped_data, mfr_column, resolver, sku_index)
+            if UPDATE_MODE == 'rewrite':
+                writer.write_frame(merged)
+            else:
+                changeset.add_frame(chunk, merged, columns, key_column=mfr_column)
+            chunk_stats['report'].to_csv(report_path, mode='w' if number == 0 else 'a', header=number == 0, index=False, encoding='utf-8')
+            add_stats(stats, chunk_stats)
+        if UPDATE_MODE == 'rewrite':
+            writer.close()
+            print(f"\nUpdated Excel saved to: {output_path}")
+        else:
+            status = xlsx_patch.publish(changeset, output_path)
+            xlsx_patch.print_publish(status, changeset, output_path)
         print(f"\n{'='*60}")
-        print(f"Updated Excel saved to: {output_path}")
-        print(f"  Total rows: {len(df_excel)}")
-        print(f"  Matched SKUs: {matches}")
-        print(f"  No matches: {no_matches}")
+        print(f"Updated Excel: {output_path}")
+        print(f"  Total rows: {stats.get('rows', 0)}")
+        print(f"  Matched SKUs: {stats.get('matched', 0)}")
+        print(f"  No matches: {stats.get('no_match', 0)}")
+        print(f"  Rows without a SKU: {stats.get('no_sku', 0)}")
+        for source, count in stats.get('by_source', {}).items():
+            print(f"    from {source}: {count}")
+        print("  Matched by rule:")
+        for rule, count in stats.get('by_rule', {}).items():
+            print(f"    {rule}: {count}")
+        print(f"  Per-row SKU matches: {report_path}")
+        print("  Cells filled:")
+        for col_name, count in stats.get('filled', {}).items():
+            print(f"    {col_name}: {count}")
         print(f"{'='*60}")
     except Exception as e:
         print(f"Error saving Excel file: {e}")
+    finally:
+        sheet.close()
 
 
 def main():
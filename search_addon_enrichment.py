@@ -1,15 +1,24 @@
 #!/usr/bin/env python
-import csv
 import os
 import re
-import ssl
 from pathlib import Path
 from urllib.parse import quote_plus
-from urllib.request import Request, urlopen
 
 import pandas as pd
 from scrapy import Selector
 
+from http_client import HttpClient
+from search_fanout import FanoutSearch, SearchSource
+from sku_lookup_cache import lookup_cache_from_env
+from product_store import store_from_env
+from product_schema import (
+    SANNENG_SCHEMA,
+    normalize_frame,
+    normalize_image_link,
+    normalize_sku,
+    normalize_sku_series,
+)
+
 
 PROJECT_ROOT = Path(__file__).parent
 SANNENG_DIR = PROJECT_ROOT / "sanneng"
@@ -26,25 +35,7 @@ CSV_INPUTS = [
 ]
 
 
-OUTPUT_FIELDS = [
-    "sku",
-    "name",
-    "image_link",
-    "overview",
-    "length",
-    "width",
-    "height",
-    "diameter",
-    "volume",
-    "material",
-    "color",
-    "pattern",
-    "ean_code",
-    "barcode",
-    "upc",
-    "product_url",
-    "source",
-]
+OUTPUT_FIELDS = SANNENG_SCHEMA.names
 
 
 COMMON_HEADERS = {
@@ -57,40 +48,14 @@ COMMON_HEADERS = {
     "Accept-Language": "en-US,en;q=0.9,zh-TW;q=0.8",
 }
 
-
-def normalize_sku(value):
-    if pd.isna(value):
-        return None
-    text = str(value).strip().upper()
-    if not text or text in {"N/A", "NAN", "NONE"}:
-        return None
-    text = text.replace(" ", "")
-    match = re.search(r"SN\d+[A-Z0-9-]*", text)
-    if match:
-        return match.group(0)
-    return text
-
-
-def normalize_image_link(link):
-    if not link:
-        return "N/A"
-    text = str(link).strip()
-    if not text or text.upper() in {"N/A", "NAN", "NONE"}:
-        return "N/A"
-    if text.startswith("//"):
-        return f"https:{text}"
-    return text
+# Shared across every SKU search so connections to each host stay open
+client = HttpClient(headers=COMMON_HEADERS, timeout=20)
 
 
 def fetch_html(url, headers=None, timeout=20):
-    merged_headers = dict(COMMON_HEADERS)
-    if headers:
-        merged_headers.update(headers)
-
-    req = Request(url=url, headers=merged_headers)
-    ctx = ssl.create_default_context()
-    with urlopen(req, timeout=timeout, context=ctx) as response:
-        return response.read().decode("utf-8", errors="ignore")
+    response = client.get(url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.content.decode("utf-8", errors="ignore")
 
 
 def build_default_item(sku, source):
@@ -117,10 +82,8 @@ def build_default_item(sku, source):
 
 def search_unopan_by_sku(sku):
     search_url = f"https://www.unopan.tw/search?q={quote_plus(sku)}"
-    try:
-        html = fetch_html(search_url, headers={"Referer": "https://www.unopan.tw/"})
-    except Exception:
-        return None
+    # Fetch errors propagate so a failed search is not remembered as "not found"
+    html = fetch_html(search_url, headers={"Referer": "https://www.unopan.tw/"})
 
     sel = Selector(text=html)
     cards = sel.css("div.item")
@@ -164,10 +127,7 @@ def search_coupang_by_sku(sku):
     search_url = f"https://www.tw.coupang.com/search?component=&q={quote_plus(query)}"
     headers = {"Referer": "https://www.tw.coupang.com/"}
 
-    try:
-        html = fetch_html(search_url, headers=headers)
-    except Exception:
-        return None
+    html = fetch_html(search_url, headers=headers)
 
     sel = Selector(text=html)
     cards = sel.css("li.ProductUnit_productUnit__Qd6sv")
@@ -202,10 +162,32 @@ def search_coupang_by_sku(sku):
     return item
 
 
+def has_image(item):
+    return bool(item) and item.get("image_link") != "N/A"
+
+
+# Priority order: a hit with an image on an earlier source cancels the later ones.
+# concurrency = searches in flight per source, interval = seconds between starts.
+SEARCH_SOURCES = [
+    SearchSource("unopan", search_unopan_by_sku,
+                 concurrency=int(os.getenv("ADDON_UNOPAN_CONCURRENCY", "4")),
+                 interval=float(os.getenv("ADDON_UNOPAN_INTERVAL", "0.5"))),
+    SearchSource("coupang", search_coupang_by_sku,
+                 concurrency=int(os.getenv("ADDON_COUPANG_CONCURRENCY", "2")),
+                 interval=float(os.getenv("ADDON_COUPANG_INTERVAL", "1.0"))),
+]
+
+
 def get_existing_skus():
     found = set()
+    # Spiders that write to the product store are answered from its SKU index;
+    # the rest still have their CSV scanned
+    store = store_from_env()
+    stored = store.sources("sanneng") if store else []
+    if stored:
+        found.update(store.existing_skus("sanneng"))
     for path in CSV_INPUTS:
-        if not path.exists():
+        if path.name[: -len("_products.csv")] in stored or not path.exists():
             continue
         try:
             df = pd.read_csv(path, encoding="utf-8")
@@ -213,10 +195,7 @@ def get_existing_skus():
             continue
         if "sku" not in df.columns:
             continue
-        for raw_sku in df["sku"].tolist():
-            normalized = normalize_sku(raw_sku)
-            if normalized:
-                found.add(normalized)
+        found.update(normalize_sku_series(df["sku"]).dropna())
     return found
 
 
@@ -238,21 +217,13 @@ def get_excel_target_skus():
     if mfr_col is None:
         mfr_col = df.columns[0]
 
-    skus = []
-    for value in df[mfr_col].tolist():
-        normalized = normalize_sku(value)
-        if normalized:
-            skus.append(normalized)
-    return sorted(set(skus))
+    return sorted(set(normalize_sku_series(df[mfr_col]).dropna()))
 
 
 def save_addon_rows(rows):
     OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({field: row.get(field, "N/A") for field in OUTPUT_FIELDS})
+    df = normalize_frame(pd.DataFrame.from_records(rows, columns=OUTPUT_FIELDS), SANNENG_SCHEMA)
+    df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
 
 
 def main():
@@ -273,28 +244,31 @@ def main():
         print(f"No missing SKUs. Wrote empty addon file: {OUTPUT_CSV}")
         return
 
-    # Keep run time manageable
-    max_search = int(os.getenv("ADDON_MAX_SEARCH", "120"))
-    search_pool = missing[:max_search]
-    print(f"Searching first {len(search_pool)} missing SKUs (ADDON_MAX_SEARCH={max_search})")
-
-    enriched_rows = []
-    for idx, sku in enumerate(search_pool, start=1):
-        print(f"[{idx:03}/{len(search_pool):03}] Searching {sku}")
-
-        unopan_item = search_unopan_by_sku(sku)
-        if unopan_item and unopan_item.get("image_link") != "N/A":
-            enriched_rows.append(unopan_item)
-            print("  -> Found on unopan")
-            continue
-
-        coupang_item = search_coupang_by_sku(sku)
-        if coupang_item and coupang_item.get("image_link") != "N/A":
-            enriched_rows.append(coupang_item)
-            print("  -> Found on coupang")
-            continue
-
-        print("  -> Not found")
+    # Optional cap for quick runs; by default every missing SKU is searched
+    max_search = int(os.getenv("ADDON_MAX_SEARCH", "0"))
+    search_pool = missing[:max_search] if max_search > 0 else missing
+    print(f"Searching {len(search_pool)} missing SKUs on {', '.join(s.name for s in SEARCH_SOURCES)}")
+
+    def progress(done, result):
+        sku, source, _ = result
+        outcome = f"found on {source}" if source else "not found"
+        print(f"[{done:04}/{len(search_pool):04}] {sku} -> {outcome}")
+
+    cache = lookup_cache_from_env()
+    if cache is not None:
+        for source in SEARCH_SOURCES:
+            due = cache.due(source.name, search_pool)
+            print(f"  {source.name}: {len(search_pool) - len(due)} answered from the lookup cache, {len(due)} due")
+
+    search = FanoutSearch(SEARCH_SOURCES, accept=has_image, cache=cache)
+    results = search.search_all(search_pool, on_result=progress)
+    search.report()
+    if cache is not None:
+        cache.close()
+    # Back to target order so the add-on CSV does not depend on response timing
+    position = {sku: i for i, sku in enumerate(search_pool)}
+    results.sort(key=lambda result: position[result[0]])
+    enriched_rows = [item for _, source, item in results if source]
 
     # Deduplicate by SKU, prioritize unopan over coupang
     dedup = {}
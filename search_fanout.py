@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Searches many SKUs on several sources at once. Each source has its own
+# concurrency cap and minimum spacing between requests; the search functions are
+# the existing blocking ones (HttpClient keeps its pooling, retries and cache) and
+# run on a thread pool sized to the sum of the caps.
+#
+# Sources are listed in priority order. Every SKU is searched on the first source,
+# and only goes on to the next one when that search misses, so an accepted item
+# costs no request on the lower-priority sites; the SKUs still run side by side,
+# each source working through its own queue at its own pace.
+# With a LookupCache (sku_lookup_cache.py) unexpired answers are reused without
+# touching the network or the source's limiter.
+
+SearchSource = namedtuple("SearchSource", ["name", "search", "concurrency", "interval"])
+
+
+class SourceLimiter:
+    def __init__(self, concurrency, interval):
+        self.semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+        self.interval = max(0.0, float(interval))
+        self._next_slot = 0.0
+
+    async def acquire(self):
+        await self.semaphore.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, self._next_slot)
+            self._next_slot = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+        except asyncio.CancelledError:
+            self.semaphore.release()
+            raise
+
+    def release(self):
+        self.semaphore.release()
+
+
+class FanoutSearch:
+    def __init__(self, sources, accept=None, cache=None):
+        self.sources = list(sources)
+        # accept(item) decides whether an item settles the SKU; default: any item
+        self.accept = accept or (lambda item: item is not None)
+        self.cache = cache
+        self.stats = {
+            s.name: {"requests": 0, "cached": 0, "accepted": 0, "skipped": 0, "errors": 0, "seconds": 0.0}
+            for s in self.sources
+        }
+        self._lock = threading.Lock()
+
+    def _timed(self, source, sku):
+        # Runs on a worker thread; a search cancelled before it got a thread never counts
+        started = time.perf_counter()
+        try:
+            return source.search(sku)
+        finally:
+            with self._lock:
+                self.stats[source.name]["requests"] += 1
+                self.stats[source.name]["seconds"] += time.perf_counter() - started
+
+    async def _call(self, source, limiter, executor, sku):
+        if self.cache is not None:
+            entry = self.cache.get(source.name, sku)
+            if entry is not None:
+                self.stats[source.name]["cached"] += 1
+                return entry.item
+
+        await limiter.acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, self._timed, source, sku)
+        # The slot is held until the thread is done, even if the task was cancelled
+        future.add_done_callback(lambda _: limiter.release())
+        try:
+            item = await future
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Failed searches are neither answers nor misses; they are retried next run
+            self.stats[source.name]["errors"] += 1
+            return None
+        if self.cache is not None:
+            self.cache.put(source.name, sku, item, self.accept(item))
+        return item
+
+    async def _search_one(self, sku, limiters, executor):
+        for position, source in enumerate(self.sources):
+            item = await self._call(source, limiters[source.name], executor, sku)
+            if self.accept(item):
+                self.stats[source.name]["accepted"] += 1
+                for later in self.sources[position + 1:]:
+                    self.stats[later.name]["skipped"] += 1
+                return sku, source.name, item
+        return sku, None, None
+
+    async def run(self, skus):
+        # Async generator of (sku, source name or None, item or None) in completion order
+        limiters = {s.name: SourceLimiter(s.concurrency, s.interval) for s in self.sources}
+        workers = sum(max(1, int(s.concurrency)) for s in self.sources)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = [asyncio.ensure_future(self._search_one(sku, limiters, executor)) for sku in skus]
+            try:
+                for finished in asyncio.as_completed(pending):
+                    yield await finished
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    def search_all(self, skus, on_result=None):
+        # Blocking entry point for scripts; returns results in completion order
+        async def collect():
+            results = []
+            async for result in self.run(skus):
+                results.append(result)
+                if on_result:
+                    on_result(len(results), result)
+            return results
+
+        return asyncio.run(collect())
+
+    def report(self):
+        print("-" * 60)
+        for name, s in self.stats.items():
+            print(
+                f"{name}: {s['requests']} requests, {s['cached']} cached, {s['accepted']} accepted, "
+                f"{s['skipped']} skipped, {s['errors']} errors, {s['seconds']:.1f}s busy"
+            )
+        print("-" * 60)
@@ -1,4 +1,3 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import random
@@ -6,16 +5,43 @@ import os
 import re
 import json
 
+import requests
+
+from catalog_api import (
+    CatalogApiError,
+    load_json,
+    magento_graphql_url,
+    magento_products,
+    magento_record,
+    magento_store_headers,
+    magento_url_key,
+)
+from fetch_engine import FetchEngine
+from product_schema import CATALOGUE_SCHEMA, normalize_frame
+
 BASE_URL = "https://www.silikomart.com/en/"
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Accept-Language": "en-US,en;q=0.9",
 }
 
+# SILIKOMART_DETERMINISTIC=1 fetches one page at a time in a fixed order (for tests)
+engine = FetchEngine(
+    max_workers=int(os.getenv("SILIKOMART_WORKERS", "8")),
+    per_host=int(os.getenv("SILIKOMART_PER_HOST", "4")),
+    headers=HEADERS,
+    deterministic=os.getenv("SILIKOMART_DETERMINISTIC", "0") == "1",
+)
+
+# SILIKOMART_API=1 (default) reads product details from Magento GraphQL, 100 products
+# per request; pages it does not return are still scraped one by one
+USE_API = os.getenv("SILIKOMART_API", "1") == "1"
+API_BATCH = 100
+
 def get_category_links():
     print(f"Fetching categories from: {BASE_URL} ...")
     try:
-        r = requests.get(BASE_URL, headers=HEADERS)
+        r = engine.get(BASE_URL)
         if r.status_code != 200:
             print(f"Failed to load home page: {r.status_code}")
             return []
@@ -48,7 +74,7 @@ def get_product_links_from_category(category_url):
     
     while current_url:
         try:
-            r = requests.get(current_url, headers=HEADERS)
+            r = engine.get(current_url)
             if r.status_code != 200:
                 print(f"  Failed to load page: {r.status_code}")
                 break
@@ -84,7 +110,7 @@ def get_product_links_from_category(category_url):
 
 def scrape_single_product(product_url):
     try:
-        r = requests.get(product_url, headers=HEADERS)
+        r = engine.get(product_url)
         if r.status_code != 200:
             return None
             
@@ -221,53 +247,90 @@ def scrape_single_product(product_url):
         print(f"Error scraping product {product_url}: {e}")
         return None
 
+def row_from_record(record):
+    data = {
+        "Item No.": record["sku"] or "N/A",
+        "Mfr Catalog No.": record["sku"] or "N/A",
+        "Group Name": "Silikomart",
+        "Ecom Picture Name": record["image_link"] or "N/A",
+        "SAP Picture": "N/A",
+        "Inactive": "No",
+        "Indent Item": "N/A",
+        "# In Stock": "N/A",
+        "Production Date": "N/A",
+        "Item Description": record["name"] or "N/A",
+        "Stock Description": "N/A",
+        "Warranty": "N/A",
+        "Serial Managed": "No",
+        "# List Price": record["price"] if record["price"] != "" else "N/A",
+        "Main Category": "N/A",
+        "Sub1 Category": "N/A",
+        "Sub2 Category": "N/A",
+        "Short Description": record["meta_description"] or "N/A",
+    }
+    if record["in_stock"] is True:
+        data["Stock Description"] = "In Stock"
+        data["# In Stock"] = "In Stock"
+    elif record["in_stock"] is False:
+        data["Stock Description"] = "Out of Stock"
+        data["# In Stock"] = "0"
+        data["Inactive"] = "Yes"
+    for column, name in zip(("Main Category", "Sub1 Category", "Sub2 Category"), record["categories"]):
+        data[column] = name
+    if data["Ecom Picture Name"] != "N/A":
+        data["SAP Picture"] = data["Ecom Picture Name"].split("/")[-1]
+    return data
+
+def fetch_products_by_url_key(keys):
+    # One GraphQL request for a whole batch of product pages
+    url = magento_graphql_url(BASE_URL, filters={"url_key": {"in": list(keys)}}, page_size=len(keys))
+    try:
+        r = engine.get(url, headers={**HEADERS, **magento_store_headers(BASE_URL), "Accept": "application/json"})
+        items, _ = magento_products(load_json(r.content))
+    except (CatalogApiError, requests.RequestException) as e:
+        print(f"  GraphQL batch failed: {e}")
+        return {}
+    return {item.get("url_key"): row_from_record(magento_record(item, BASE_URL)) for item in items}
+
 if __name__ == "__main__":
     
     categories = get_category_links()
     
     all_product_links = set()
 
-    # I removed the 'break' here so it scrapes ALL categories, not just the first one.
-    for cat in categories:
-        links = get_product_links_from_category(cat)
+    # Categories are walked concurrently; pagination inside a category stays sequential
+    for cat, links in engine.map(get_product_links_from_category, categories):
         all_product_links.update(links)
         
     print(f"Total Unique Products Found: {len(all_product_links)}")
     
     all_data = []
-    link_list = list(all_product_links)
+    link_list = sorted(all_product_links)
  
-    for i, link in enumerate(link_list):
-        print(f"[{i+1}/{len(link_list)}] Scraping: {link}")
-        data = scrape_single_product(link)
+    if USE_API:
+        keys = {magento_url_key(link): link for link in link_list}
+        batches = [sorted(keys)[i:i + API_BATCH] for i in range(0, len(keys), API_BATCH)]
+        for batch, rows in engine.map(fetch_products_by_url_key, batches):
+            print(f"GraphQL: {len(rows)}/{len(batch)} products")
+            for key, data in rows.items():
+                if key in keys:
+                    all_data.append(data)
+                    del keys[key]
+        link_list = sorted(keys.values())
+        print(f"{len(link_list)} products left for page scraping")
+
+    # Rows are collected as each product page completes, not in submission order
+    for i, (link, data) in enumerate(engine.map(scrape_single_product, link_list), start=1):
+        print(f"[{i}/{len(link_list)}] Scraped: {link}")
         if data:
             all_data.append(data)
+
+    engine.report()
             
     if all_data:
         df = pd.DataFrame(all_data)
         
-        cols = [
-            "Item No.",
-            "Mfr Catalog No.",
-            "Group Name",
-            "Ecom Picture Name", 
-            "SAP Picture",
-            "Inactive",
-            "Indent Item",
-            "# In Stock", 
-            "Production Date",
-            "Item Description",
-            "Stock Description", 
-            "Warranty",
-            "Serial Managed",
-            "# List Price",
-            "Main Category", 
-            "Sub1 Category",
-            "Sub2 Category",
-            "Short Description"
-        ]
-        
-        df = df.reindex(columns=cols, fill_value="N/A")
+        df = normalize_frame(df.reindex(columns=CATALOGUE_SCHEMA.names, fill_value="N/A"), CATALOGUE_SCHEMA)
         
         folder_name = "results"
         file_name = "Silikomart_Final_Full.xlsx"
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from product_schema import normalize_sku
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_CACHE_PATH = PROJECT_ROOT / ".crawl_state" / "sku_lookups.sqlite"
+DEFAULT_HIT_TTL = 30 * 24 * 3600
+DEFAULT_MISS_TTL = 3 * 24 * 3600
+
+LookupEntry = namedtuple("LookupEntry", ["found", "item", "checked_at", "expires_at", "misses"])
+
+
+class LookupCache:
+    # Remembers what a SKU search on each source returned, keyed by (source, normalized SKU).
+    # A hit keeps the extracted item for hit_ttl seconds. A miss is retried after miss_ttl,
+    # doubling with every consecutive miss up to hit_ttl, so SKUs a shop never lists stop
+    # costing a request per run. Searches that failed (network errors) are not stored.
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, hit_ttl=DEFAULT_HIT_TTL, miss_ttl=DEFAULT_MISS_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS lookups (
+                source TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                found INTEGER NOT NULL,
+                item TEXT,
+                checked_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                misses INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (source, sku)
+            );
+            """
+        )
+        self.db.commit()
+
+    @staticmethod
+    def _key(sku):
+        return normalize_sku(sku) or str(sku).strip().upper()
+
+    def get(self, source, sku, now=None):
+        # The entry if it has not expired yet, otherwise None (the SKU is due again)
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self.db.execute(
+                "SELECT found, item, checked_at, expires_at, misses FROM lookups WHERE source = ? AND sku = ?",
+                (source, self._key(sku)),
+            ).fetchone()
+        if row is None or row[3] <= now:
+            return None
+        return LookupEntry(bool(row[0]), json.loads(row[1]) if row[1] else None, row[2], row[3], row[4])
+
+    def put(self, source, sku, item, found):
+        key = self._key(sku)
+        now = time.time()
+        with self._lock:
+            if found:
+                misses = 0
+                expires_at = now + self.hit_ttl
+                payload = json.dumps(item, ensure_ascii=False, default=str)
+            else:
+                row = self.db.execute(
+                    "SELECT misses FROM lookups WHERE source = ? AND sku = ?", (source, key)
+                ).fetchone()
+                misses = (row[0] if row else 0) + 1
+                expires_at = now + min(self.miss_ttl * 2 ** (misses - 1), max(self.hit_ttl, self.miss_ttl))
+                payload = None
+            self.db.execute(
+                "INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, key, int(bool(found)), payload, now, expires_at, misses),
+            )
+            self.db.commit()
+
+    def due(self, source, skus, now=None):
+        # SKUs with no unexpired entry for this source
+        now = time.time() if now is None else now
+        with self._lock:
+            fresh = {
+                row[0]
+                for row in self.db.execute(
+                    "SELECT sku FROM lookups WHERE source = ? AND expires_at > ?", (source, now)
+                )
+            }
+        return [sku for sku in skus if self._key(sku) not in fresh]
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def lookup_cache_from_env():
+    # SKU_LOOKUP_CACHE_ENABLED=0 searches everything again
+    if os.getenv("SKU_LOOKUP_CACHE_ENABLED", "1") != "1":
+        return None
+    return LookupCache(
+        path=os.getenv("SKU_LOOKUP_CACHE", str(DEFAULT_CACHE_PATH)),
+        hit_ttl=int(os.getenv("SKU_LOOKUP_HIT_TTL", str(DEFAULT_HIT_TTL))),
+        miss_ttl=int(os.getenv("SKU_LOOKUP_MISS_TTL", str(DEFAULT_MISS_TTL))),
+    )
@@ -0,0 +1,216 @@
+import csv
+import os
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+from product_schema import CODE_NA_TOKENS
+
+# Resolves scraped manufacturer codes against the codes in a master sheet.
+# Every master code is indexed once under its canonical form, its aliases and a
+# character trie; a lookup then tries the rules below in order and stops at the
+# first that matches:
+#
+#   exact        same code after trimming and upper-casing
+#   canonical    same letters and digits once punctuation is dropped (SN-2067 = SN2067)
+#   alias        listed in the alias table (alias,code CSV)
+#   split        one of several codes in a master cell ("61105ST0502 (USA)/ 61115ST0502 (UK/TH)")
+#   family       same code with or without a family prefix (2067 = SN2067)
+#   pack_suffix  the code followed by a pack/case suffix (6366MP338-12, 6366MP338 24/CS)
+#   fuzzy        one edit away (typo or swapped letters), same digits, only one candidate
+#
+# Fuzzy matches are candidates: the arrangers leave them out unless asked to.
+
+RULES = ("exact", "canonical", "alias", "split", "family", "pack_suffix", "fuzzy")
+RULE_RANK = {rule: rank for rank, rule in enumerate(RULES)}
+FAMILY_PREFIXES = ("SN",)
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]")
+_NON_DIGIT = re.compile(r"\D")
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+_SPLIT = re.compile(r"\s*[/,;]\s*")
+_PACK_WORDS = r"(?:CS|CASE|PK|PACK|PCS|PC|BOX|SET|DZ|DOZ|DOZEN|EA|X)"
+_PACK_REMAINDER = re.compile(
+    rf"^(?:[\s\-/_.,(]+{_PACK_WORDS}?\s*\d{{1,3}}|\s*{_PACK_WORDS}\s*\d{{1,3}}|[\s\-/_.,(]+{_PACK_WORDS})"
+    rf"\s*(?:/?\s*{_PACK_WORDS})?\s*\)?$"
+)
+
+Resolution = namedtuple("Resolution", ["key", "rule", "distance"])
+UNMATCHED = Resolution(None, None, None)
+
+
+def clean_code(code):
+    if code is None or (not isinstance(code, str) and pd.isna(code)):
+        return ""
+    text = str(code).strip().upper()
+    return "" if text in CODE_NA_TOKENS else text
+
+
+def canonical_code(code):
+    return _NON_ALNUM.sub("", clean_code(code))
+
+
+def load_aliases(path):
+    # alias,code rows; a missing file is an empty table
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["alias"]: row["code"] for row in csv.DictReader(f) if row.get("alias") and row.get("code")}
+
+
+def osa_distance(a, b, limit):
+    # Levenshtein plus adjacent transpositions, giving up once it exceeds limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SkuIndex:
+    def __init__(self, master_codes, aliases=None, max_distance=1, family_prefixes=FAMILY_PREFIXES):
+        self.max_distance = max_distance
+        self.family_prefixes = tuple(family_prefixes)
+        self.exact = {}
+        self.keys = {}      # canonical, alias, split and family keys -> (master key, rule)
+        self.trie = {}
+        self.shapes = {}    # (length, digits) -> master keys, the only possible fuzzy candidates
+        self._cache = {}
+
+        masters = {clean_code(c) for c in master_codes}
+        masters.discard("")
+        for code in masters:
+            key = _NON_ALNUM.sub("", code)
+            if key:
+                self.exact[code] = key
+                self.keys[key] = (key, "canonical")
+        self.master_keys = set(self.keys)
+
+        derived = {}
+        for code in masters:
+            key = _NON_ALNUM.sub("", code)
+            if "/" in code or "," in code or ";" in code:
+                parts = [_NON_ALNUM.sub("", p) for p in _SPLIT.split(_PARENTHETICAL.sub(" ", code))]
+                parts = [p for p in parts if len(p) >= 4 and _NON_DIGIT.sub("", p)]
+                if len(parts) > 1:
+                    for part in parts:
+                        derived.setdefault(part, set()).add((key, "split"))
+            for prefix in self.family_prefixes:
+                if key.startswith(prefix) and key[len(prefix):][:1].isdigit():
+                    derived.setdefault(key[len(prefix):], set()).add((key, "family"))
+        for alias_key, targets in derived.items():
+            # An alias that points at two different master codes resolves nothing
+            if alias_key not in self.keys and len({t[0] for t in targets}) == 1:
+                self.keys[alias_key] = targets.pop()
+
+        for alias, code in (aliases or {}).items():
+            target = canonical_code(code)
+            alias_key = canonical_code(alias)
+            if target in self.master_keys and alias_key and alias_key not in self.master_keys:
+                self.keys[alias_key] = (target, "alias")
+
+        for key, (master_key, _) in self.keys.items():
+            node = self.trie
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node["$"] = master_key
+        for key in self.master_keys:
+            self.shapes.setdefault((len(key), _NON_DIGIT.sub("", key)), []).append(key)
+
+    def __len__(self):
+        return len(self.master_keys)
+
+    def master_key(self, code):
+        # The key master rows are joined on; blank codes keep their raw value
+        return canonical_code(code) or clean_code(code)
+
+    def resolve(self, code):
+        text = clean_code(code)
+        if not text:
+            return UNMATCHED
+        if text in self._cache:
+            return self._cache[text]
+        result = self._resolve(text)
+        self._cache[text] = result
+        return result
+
+    def _resolve(self, text):
+        if text in self.exact:
+            return Resolution(self.exact[text], "exact", 0)
+        key = _NON_ALNUM.sub("", text)
+        if key in self.keys:
+            master_key, rule = self.keys[key]
+            return Resolution(master_key, rule, 0)
+        for prefix in self.family_prefixes:
+            if key.startswith(prefix) and key[len(prefix):] in self.master_keys:
+                return Resolution(key[len(prefix):], "family", 0)
+
+        master_key = self._pack_prefix(text)
+        if master_key:
+            return Resolution(master_key, "pack_suffix", 0)
+        if self.max_distance > 0 and key:
+            return self._fuzzy(key)
+        return UNMATCHED
+
+    def _pack_prefix(self, text):
+        # Longest indexed code the text starts with, if what follows is a pack suffix
+        node = self.trie
+        best = None
+        for i, ch in enumerate(text):
+            if not ("0" <= ch <= "9" or "A" <= ch <= "Z"):
+                continue
+            node = node.get(ch)
+            if node is None:
+                break
+            if "$" in node and _PACK_REMAINDER.match(text[i + 1:]):
+                best = node["$"]
+        return best
+
+    def _fuzzy(self, key):
+        # Codes that differ in a digit are different articles, not typos, so only
+        # codes of the same length with the same digits are compared
+        scored = {}
+        for candidate in self.shapes.get((len(key), _NON_DIGIT.sub("", key)), ()):
+            distance = osa_distance(key, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                scored.setdefault(distance, []).append(candidate)
+        if not scored:
+            return UNMATCHED
+        best = min(scored)
+        if len(scored[best]) != 1:
+            return UNMATCHED
+        return Resolution(scored[best][0], "fuzzy", best)
+
+    def resolve_series(self, series):
+        # DataFrame aligned with series: key (master key or None), rule, distance
+        resolved = [self.resolve(code) for code in series]
+        return pd.DataFrame(resolved, columns=Resolution._fields, index=series.index)
+
+    def join_keys(self, series, accept=None):
+        # Keys to join scraped rows on: the resolved master key where a rule in accept
+        # matched, otherwise the row's own code (so unmatched rows behave as before)
+        resolved = self.resolve_series(series)
+        accepted = resolved["key"].notna()
+        if accept is not None:
+            accepted &= resolved["rule"].isin(accept)
+        own = series.map(clean_code)
+        keys = resolved["key"].where(accepted, own)
+        rules = resolved["rule"].where(accepted, None)
+        return keys, rules, resolved
+
+
+def accepted_rules(accept_fuzzy=None):
+    if accept_fuzzy is None:
+        accept_fuzzy = os.getenv("SKU_ACCEPT_FUZZY", "0") == "1"
+    return set(RULES) if accept_fuzzy else set(RULES) - {"fuzzy"}
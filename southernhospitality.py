@@ -1,12 +1,13 @@
-import cloudscraper
 from bs4 import BeautifulSoup
 import pandas as pd
-import time
-import random
 import re
 import os
 
-scraper = cloudscraper.create_scraper()
+from http_client import HttpClient
+from product_schema import CATALOGUE_SCHEMA, normalize_frame
+
+# Requests to this host are spaced out by HOST_RATE_LIMITS in http_client
+scraper = HttpClient(use_cloudscraper=True)
 
 BASE_URL = "https://www.southernhospitality.co.nz"
 START_URL = "https://www.southernhospitality.co.nz/brands/silikomart.html"
@@ -39,7 +40,6 @@ def get_product_links(start_url):
 
 def scrape_single_product(product_url):
     try:
-        time.sleep(random.uniform(1, 3)) 
         r = scraper.get(product_url)
         if r.status_code != 200:
             return None
@@ -171,15 +171,7 @@ if __name__ == "__main__":
         print("Processing data...")
         df = pd.DataFrame(all_data)
         
-        cols = [
-            "Item No.", "Mfr Catalog No.", "Group Name", "Ecom Picture Name", 
-            "SAP Picture", "Inactive", "Indent Item", "# In Stock", 
-            "Production Date", "Item Description", "Stock Description", 
-            "Warranty", "Serial Managed", "# List Price", "Main Category", 
-            "Sub1 Category", "Sub2 Category", "Short Description"
-        ]
-        
-        df = df.reindex(columns=cols, fill_value="N/A")
+        df = normalize_frame(df.reindex(columns=CATALOGUE_SCHEMA.names, fill_value="N/A"), CATALOGUE_SCHEMA)
         
         folder_name = "results"
         file_name = "SouthernHospitality_Full.xlsx"
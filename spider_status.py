@@ -1,5 +1,7 @@
 import os
 
+from product_store import store_from_env
+
 print("\n========== SPIDER STATUS SUMMARY ==========\n")
 
 spiders = [
@@ -14,11 +16,24 @@ spiders = [
     ('williamsfoodequipment.com', 'steelite/williamsfoodequipment_products.csv'),
 ]
 
+# Spiders that write to the product store are counted there, the rest from their CSV
+store = store_from_env()
+store_counts = store.counts('steelite') if store else {}
+
 total = 0
 working = 0
 
 for name, path in spiders:
-    if os.path.exists(path):
+    source = os.path.basename(path)[:-len('_products.csv')]
+    if source in store_counts:
+        count = store_counts[source][0]
+        if count > 0:
+            print(f"✓ {name:30} {count:4} products")
+            total += count
+            working += 1
+        else:
+            print(f"✗ {name:30}    0 products (empty)")
+    elif os.path.exists(path):
         with open(path) as f:
             count = len(f.readlines()) - 1
         if count > 0:
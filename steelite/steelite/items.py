@@ -6,6 +6,43 @@
 import scrapy
 
 
+from product_schema import STEELITE_SCHEMA
+
+# Column order of the *_products.csv files written by CsvExportPipeline
+PRODUCT_FIELDS = STEELITE_SCHEMA.names
+
+
+def product_from_record(record, overview_limit=500):
+    # Maps a catalog_api record (Shopify/Magento JSON) onto PRODUCT_FIELDS
+    overview = record.get("overview") or ""
+    if overview_limit and len(overview) > overview_limit:
+        overview = overview[:overview_limit] + "..."
+    sku = record.get("sku") or "N/A"
+    return {
+        "name": record.get("name") or "N/A",
+        "item_sku": sku,
+        "model_number": record.get("model_number") or "N/A",
+        "manufacturer": sku,
+        "image_link": record.get("image_link") or "N/A",
+        "overview": overview or "N/A",
+        "material": record.get("material") or "N/A",
+        "color": record.get("color") or "N/A",
+        "pattern": record.get("pattern") or "N/A",
+        "length": record.get("length") or "N/A",
+        "width": record.get("width") or "N/A",
+        "height": record.get("height") or "N/A",
+        "volume_capacity": record.get("volume") or "N/A",
+        "diameter": record.get("diameter") or "N/A",
+        "country_of_origin": record.get("country_of_origin") or "N/A",
+        "upc_barcode": record.get("barcode") or "N/A",
+        "ean_code": record.get("ean") or "N/A",
+        "hazmat": "N/A",
+        "oversize": "N/A",
+        "marketplace_uom": "N/A",
+        "product_url": record.get("product_url") or "N/A",
+    }
+
+
 class SteeliteItem(scrapy.Item):
     # define the fields for your item here like:
     # name = scrapy.Field()
@@ -9,6 +9,20 @@ from scrapy import signals
 from itemadapter import ItemAdapter
 
 
+# Shared with the other Scrapy project: the implementation is in crawl_components.py
+# at the repository root, settings.py enables the classes from here
+from crawl_components import (
+    ResponseCacheMiddleware,
+    CheckpointMiddleware,
+    CheckpointDownloaderMiddleware,
+    PlaywrightPagePoolMiddleware,
+    RenderRoutingMiddleware,
+    TelemetrySpiderMiddleware,
+    FixtureRecorderMiddleware,
+    WarcArchiveMiddleware,
+)
+
+
 class SteeliteSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the spider middleware does not modify the
@@ -8,6 +8,11 @@
 from itemadapter import ItemAdapter
 
 
+# Shared with the other Scrapy project: the implementation is in crawl_components.py
+# at the repository root, settings.py enables the classes from here
+from crawl_components import CsvExportPipeline, ParquetExportPipeline, ProductStorePipeline
+
+
 class SteelitePipeline:
     def process_item(self, item, spider):
         return item
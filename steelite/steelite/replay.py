@@ -0,0 +1,5 @@
+# Offline crawls against replay_server.py (see REPLAY_SERVER in settings.py)
+
+# Shared with the other Scrapy project: the implementation is in crawl_components.py
+# at the repository root, settings.py enables the classes from here
+from crawl_components import ReplayAddon
@@ -1,13 +1,16 @@
 import re
 import scrapy
-import csv
 from scrapy_playwright.page import PageMethod
 
+from catalog_api import CatalogApiError, load_json, shopify_products, shopify_products_url, shopify_records
+from steelite.items import PRODUCT_FIELDS, product_from_record
+
 
 class KitchenrestockSpider(scrapy.Spider):
     name = "kitchenrestock"
     allowed_domains = ["kitchenrestock.com"]
     csv_filename = "kitchenrestock_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
 
     custom_settings = {
         "ROBOTSTXT_OBEY": False,
@@ -15,26 +18,79 @@ class KitchenrestockSpider(scrapy.Spider):
         "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
         "DOWNLOAD_DELAY": 25,
         "RANDOMIZE_DOWNLOAD_DELAY": True,
-        "AUTOTHROTTLE_ENABLED": True,
-        "AUTOTHROTTLE_START_DELAY": 15,
-        "AUTOTHROTTLE_MAX_DELAY": 180,
-        "AUTOTHROTTLE_TARGET_CONCURRENCY": 0.1,
+        # The site rate-limits hard: never faster than the old AutoThrottle setup
+        # (25 s delay, target concurrency 0.1), whatever the throttle learns
+        "ADAPTIVE_THROTTLE_MIN_DELAY": 25,
+        "ADAPTIVE_THROTTLE_MAX_DELAY": 180,
+        "ADAPTIVE_THROTTLE_MAX_CONCURRENCY": 1,
+        # 429s are retried by RetryMiddleware; the throttle honours their Retry-After
         "RETRY_TIMES": 8,
         "RETRY_HTTP_CODES": [429, 500, 502, 503, 504, 522, 524, 408],
-        "HTTPERROR_ALLOWED_CODES": [429],
-        "DOWNLOADER_MIDDLEWARES": {
-            "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler": 585,
-        },
     }
 
-    def __init__(self, start_page=1, end_page=861, *args, **kwargs):
+    base_url = "https://kitchenrestock.com"
+    query = "Steelite"
+
+    def __init__(self, start_page=1, end_page=861, api="1", *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.start_page = int(start_page)
         self.end_page = int(end_page)
+        # kitchenrestock is a Shopify store: products.json returns 250 products per
+        # request, against one search page plus one product page per product.
+        # -a api=0 keeps the search/product page crawl. start_page/end_page bound
+        # either crawl (products.json pages in API mode); crawl_shards.py shards only
+        # the search pages
+        self.api = str(api).lower() not in ("0", "false", "no", "off")
         self.seen = set()
-        self.product_data = []
 
     def start_requests(self):
+        if self.api:
+            yield self._api_request(self.start_page)
+            return
+        yield from self.search_requests()
+
+    def _api_request(self, page):
+        return scrapy.Request(
+            shopify_products_url(self.base_url, page),
+            callback=self.parse_api,
+            errback=self.api_failed if page == self.start_page else None,
+            cb_kwargs={"page": page},
+            dont_filter=True,
+        )
+
+    def api_failed(self, failure):
+        self.logger.warning("products.json request failed (%s), falling back to the search pages", failure.value)
+        yield from self.search_requests()
+
+    def _matches(self, product):
+        needle = self.query.lower()
+        return needle in (product.get("vendor") or "").lower() or needle in (product.get("title") or "").lower()
+
+    def parse_api(self, response, page: int):
+        try:
+            products = shopify_products(load_json(response.body)) if response.status == 200 else None
+        except CatalogApiError as e:
+            self.logger.warning("products.json unusable (%s)", e)
+            products = None
+        if products is None:
+            if page == self.start_page:
+                self.logger.warning("Falling back to the search pages")
+                yield from self.search_requests()
+            return
+
+        matching = [p for p in products if self._matches(p)]
+        self.logger.info(f"products.json page {page}: {len(matching)}/{len(products)} {self.query} products")
+        for product in matching:
+            for record in shopify_records(product, self.base_url):
+                if record["product_url"] in self.seen:
+                    continue
+                self.seen.add(record["product_url"])
+                yield product_from_record(record)
+
+        if products and page < self.end_page:
+            yield self._api_request(page + 1)
+
+    def search_requests(self):
         yield scrapy.Request(
             self._search_url(self.start_page),
             callback=self.parse_search,
@@ -47,12 +103,6 @@ class KitchenrestockSpider(scrapy.Spider):
         return f"https://kitchenrestock.com/search?options%5Bprefix%5D=last&page={page}&q=Steelite+"
 
     def parse_search(self, response, page: int):
-        if response.status == 429:
-            retry_after = int(response.headers.get("Retry-After", b"60").decode("utf-8", "ignore") or 60)
-            self.logger.warning("429 on page=%s, retry-after=%ss", page, retry_after)
-            yield response.request.replace(dont_filter=True, priority=response.request.priority - 10)
-            return
-
         links = response.css("li.js-pagination-result a.js-prod-link::attr(href)").getall()
         if not links:
             links = response.css("product-card a.js-prod-link::attr(href)").getall()
@@ -157,32 +207,5 @@ class KitchenrestockSpider(scrapy.Spider):
             "product_url": response.url,
         }
 
-        self.product_data.append(product)
         self.logger.info(f"✓ Scraped: {product_name}")
         yield product
-
-    def closed(self, reason):
-        self.save_to_csv(self.csv_filename)
-        self.logger.info(f"Total products scraped: {len(self.product_data)}")
-
-    def save_to_csv(self, filename):
-        if not self.product_data:
-            self.logger.info("No product data to save")
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
@@ -1,12 +1,14 @@
 import scrapy
-import csv
 import json
 
+from steelite.items import PRODUCT_FIELDS
+
 
 class SteeliteComSpider(scrapy.Spider):
     name = "steelite_com"
     allowed_domains = ["steelite.com"]
     csv_filename = "steelite_com_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
     
     custom_settings = {
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -15,10 +17,6 @@ class SteeliteComSpider(scrapy.Spider):
         'DOWNLOAD_DELAY': 1,
     }
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.product_data = []
-    
     def start_requests(self):
         # Try multiple entry points
         urls = [
@@ -104,28 +102,5 @@ class SteeliteComSpider(scrapy.Spider):
             'product_url': response.url,
         }
         
-        self.product_data.append(product)
         self.logger.info(f"Scraped: {name[:50]}")
         yield product
-    
-    def closed(self, reason):
-        if not self.product_data:
-            self.logger.warning("No products scraped")
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(self.csv_filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {self.csv_filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving CSV: {e}")
@@ -1,24 +1,23 @@
 import re
 import scrapy
-import csv
 from scrapy_playwright.page import PageMethod
 
+from playwright_tuning import settle
+from steelite.items import PRODUCT_FIELDS
+
 
 class SteelitehomeSpider(scrapy.Spider):
     name = "steelitehome"
     allowed_domains = ["www.steelitehome.com"]
     start_urls = ["https://www.steelitehome.com"]
     csv_filename = "steelitehome_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
 
     custom_settings = {
         'CONCURRENT_REQUESTS': 1,
         'DOWNLOAD_DELAY': 2,
     }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.product_data = []
-
     def start_requests(self):
         for url in self.start_urls:
             yield scrapy.Request(
@@ -27,7 +26,7 @@ class SteelitehomeSpider(scrapy.Spider):
                     "playwright": True,
                     "playwright_page_methods": [
                         PageMethod("wait_for_selector", "a.slide", timeout=90000),
-                        PageMethod("wait_for_timeout", 1500),
+                        PageMethod(settle, 1500),
                     ],
                 },
                 callback=self.parse_categories,
@@ -45,7 +44,7 @@ class SteelitehomeSpider(scrapy.Spider):
                     "playwright": True,
                     "playwright_page_methods": [
                         PageMethod("wait_for_selector", ".rangeBox", timeout=90000),
-                        PageMethod("wait_for_timeout", 1500),
+                        PageMethod(settle, 1500),
                     ],
                 },
                 callback=self.parse_subcategories,
@@ -63,7 +62,7 @@ class SteelitehomeSpider(scrapy.Spider):
                     "playwright": True,
                     "playwright_page_methods": [
                         PageMethod("wait_for_selector", ".productBox", timeout=90000),
-                        PageMethod("wait_for_timeout", 1500),
+                        PageMethod(settle, 1500),
                     ],
                 },
                 callback=self.parse_product_list,
@@ -83,7 +82,7 @@ class SteelitehomeSpider(scrapy.Spider):
                         "playwright": True,
                         "playwright_page_methods": [
                             PageMethod("wait_for_selector", "#product", timeout=90000),
-                            PageMethod("wait_for_timeout", 1500),
+                            PageMethod(settle, 1500),
                         ],
                     },
                     callback=self.parse_product,
@@ -168,32 +167,5 @@ class SteelitehomeSpider(scrapy.Spider):
             "product_url": response.url,
         }
         
-        self.product_data.append(product)
         self.logger.info(f"✓ Scraped: {product['name']}")
         yield product
-
-    def closed(self, reason):
-        self.save_to_csv(self.csv_filename)
-        self.logger.info(f"Total products scraped: {len(self.product_data)}")
-
-    def save_to_csv(self, filename):
-        if not self.product_data:
-            self.logger.info("No product data to save")
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
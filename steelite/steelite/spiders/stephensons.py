@@ -1,28 +1,23 @@
 import scrapy
-import csv
 from scrapy_playwright.page import PageMethod
 
+from steelite.items import PRODUCT_FIELDS
+
 
 class StephensonsSpider(scrapy.Spider):
     name = "stephensons"
     allowed_domains = ["www.stephensons.com"]
     start_urls = ["https://www.stephensons.com/catering-crockery/steelite-crockery"]
     csv_filename = "stephensons_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
 
     custom_settings = {
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
         'ROBOTSTXT_OBEY': False,
         'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
         'DOWNLOAD_DELAY': 2,
-        'DOWNLOADER_MIDDLEWARES': {
-            'scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler': 585,
-        },
     }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.product_data = []
-
     def start_requests(self):
         for url in self.start_urls:
             yield scrapy.Request(
@@ -99,32 +94,5 @@ class StephensonsSpider(scrapy.Spider):
             'product_url': response.url,
         }
         
-        self.product_data.append(product)
         self.logger.info(f"✓ Scraped: {product_name}")
         yield product
-
-    def closed(self, reason):
-        self.save_to_csv(self.csv_filename)
-        self.logger.info(f"Total products scraped: {len(self.product_data)}")
-
-    def save_to_csv(self, filename):
-        if not self.product_data:
-            self.logger.info("No product data to save")
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
\ No newline at end of file
@@ -1,27 +1,80 @@
 import scrapy
-import csv
 import re
 from scrapy_playwright.page import PageMethod
 
+from catalog_api import CatalogApiError, load_json, magento_graphql_url, magento_products, magento_record
+from steelite.items import PRODUCT_FIELDS, product_from_record
+
 
 class UsSteeliteSpider(scrapy.Spider):
     name = "us_steelite"
     allowed_domains = ["us.steelite.com"]
     start_urls = ["https://us.steelite.com/"]
     csv_filename = "us_steelite_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
     
     custom_settings = {
         "ROBOTSTXT_OBEY": False,
         "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
         "DOWNLOAD_DELAY": 2,
-        "DOWNLOADER_MIDDLEWARES": {
-            "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler": 585,
-        },
     }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, api="1", *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.product_data = []
+        # Magento GraphQL returns the whole search result 200 products at a time.
+        # -a api=0 renders the search and product pages instead
+        self.api = str(api).lower() not in ("0", "false", "no", "off")
+
+    def start_requests(self):
+        if self.api:
+            yield self._api_request(1)
+            return
+        for url in self.start_urls:
+            yield scrapy.Request(url, callback=self.parse)
+
+    def _api_request(self, page):
+        return scrapy.Request(
+            magento_graphql_url(self.start_urls[0], search="steelite", page=page),
+            callback=self.parse_api,
+            errback=self.api_failed if page == 1 else None,
+            cb_kwargs={"page": page},
+            headers={"Accept": "application/json"},
+        )
+
+    def api_failed(self, failure):
+        self.logger.warning(f"GraphQL request failed ({failure.value}), falling back to the search pages")
+        for url in self.start_urls:
+            yield scrapy.Request(url, callback=self.parse, dont_filter=True)
+
+    def parse_api(self, response, page):
+        try:
+            items, total_pages = magento_products(load_json(response.body))
+        except CatalogApiError as e:
+            self.logger.warning(f"GraphQL catalogue unusable ({e})")
+            if page == 1:
+                self.logger.warning("Falling back to the search pages")
+                for url in self.start_urls:
+                    yield scrapy.Request(url, callback=self.parse, dont_filter=True)
+            return
+
+        self.logger.info(f"GraphQL page {page}/{total_pages}: {len(items)} products")
+        for item in items:
+            record = magento_record(item, self.start_urls[0])
+            product = product_from_record(record)
+            name = product["name"]
+            # Same fallbacks as parse_product, which reads these from the product title
+            if product["diameter"] == "N/A":
+                dim_match = re.search(r'(\d+(?:\.\d+)?)\s*cm', name, re.I)
+                if dim_match:
+                    product["diameter"] = f"{dim_match.group(1)} cm"
+            if product["volume_capacity"] == "N/A":
+                vol_match = re.search(r'(\d+(?:\.\d+)?(?:\s*\d+/\d+)?)\s*(cl|ml|oz|fl\s*oz)', name, re.I)
+                if vol_match:
+                    product["volume_capacity"] = f"{vol_match.group(1)} {vol_match.group(2)}"
+            yield product
+
+        if page < total_pages:
+            yield self._api_request(page + 1)
 
     def parse(self, response):
         # Search for Steelite products
@@ -160,32 +213,5 @@ class UsSteeliteSpider(scrapy.Spider):
             "product_url": response.url,
         }
 
-        self.product_data.append(product)
         self.logger.info(f"✓ Scraped: {product_name}")
         yield product
-
-    def closed(self, reason):
-        self.save_to_csv(self.csv_filename)
-        self.logger.info(f"Total products scraped: {len(self.product_data)}")
-
-    def save_to_csv(self, filename):
-        if not self.product_data:
-            self.logger.info("No product data to save")
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
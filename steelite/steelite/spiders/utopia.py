@@ -1,18 +1,17 @@
 import re
 import scrapy
-import csv
 from scrapy_playwright.page import PageMethod
 
+from playwright_tuning import settle
+from steelite.items import PRODUCT_FIELDS
+
 
 class SteelitePlaywrightSpider(scrapy.Spider):
     name = "steelite_playwright"
     allowed_domains = ["steelite-utopia.com"]
     start_urls = ["https://www.steelite-utopia.com/products"]
     csv_filename = "utopia_products.csv"
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.product_data = []
+    csv_fieldnames = PRODUCT_FIELDS
 
     def start_requests(self):
         for url in self.start_urls:
@@ -22,7 +21,7 @@ class SteelitePlaywrightSpider(scrapy.Spider):
                     "playwright": True,
                     "playwright_page_methods": [
                         PageMethod("wait_for_selector", "a.product-entry-grid", timeout=90000),
-                        PageMethod("wait_for_timeout", 1500),
+                        PageMethod(settle, 1500),
                     ],
                 },
                 callback=self.parse,
@@ -47,7 +46,7 @@ class SteelitePlaywrightSpider(scrapy.Spider):
                     "listing_image": c.css("img.product-entry-image-inner::attr(src)").get(),
                     "playwright_page_methods": [
                         PageMethod("wait_for_selector", ".popup[data-key='productCard'] .info-details .info-title", timeout=90000),
-                        PageMethod("wait_for_timeout", 1200),
+                        PageMethod(settle, 1200),
                     ],
                 },
                 callback=self.parse_product,
@@ -136,32 +135,5 @@ class SteelitePlaywrightSpider(scrapy.Spider):
             "product_url": response.url,
         }
 
-        self.product_data.append(product)
         self.logger.info(f"✓ Scraped: {product['name']}")
         yield product
-
-    def closed(self, reason):
-        self.save_to_csv(self.csv_filename)
-        self.logger.info(f"Total products scraped: {len(self.product_data)}")
-
-    def save_to_csv(self, filename):
-        if not self.product_data:
-            self.logger.info("No product data to save")
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
\ No newline at end of file
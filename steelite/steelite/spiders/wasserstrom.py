@@ -1,21 +1,29 @@
 import scrapy
 from scrapy.crawler import CrawlerProcess
-import csv
+
+from crawl_fingerprints import card_hash, content_hash, listing_card, open_store_for
+from steelite.items import PRODUCT_FIELDS
 
 
 class WasserstromSpider(scrapy.Spider):
     name = "wasserstrom"
     allowed_domains = ["www.wasserstrom.com"]
+    csv_filename = "wasserstrom_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, incremental=False, start_page=1, end_page=30, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # -a incremental=1 skips products whose listing card is unchanged since the last run
+        self.fingerprints = open_store_for(self, incremental)
+        self.counts = {'skipped': 0, 'refetched': 0, 'new': 0}
         self.base_url = "https://www.wasserstrom.com/restaurant-supplies-equipment/SearchDisplay"
         self.page_size = 100
-        self.max_pages = 30
-        self.product_data = []
+        # -a start_page=/end_page= crawl a slice of the search pages (crawl_shards.py)
+        self.start_page = int(start_page)
+        self.end_page = int(end_page)
     
     def start_requests(self):
-        for page in range(1, self.max_pages + 1):
+        for page in range(self.start_page, self.end_page + 1):
             begin_index = (page - 1) * self.page_size
             url = f"{self.base_url}?searchTerm=steelite&beginIndex={begin_index}&pageSize={self.page_size}&storeId=10051&catalogId=3074457345616677089&langId=-1"
             yield scrapy.Request(url, callback=self.parse_listing, meta={'page': page})
@@ -24,27 +32,37 @@ class WasserstromSpider(scrapy.Spider):
         page = response.meta['page']
         self.logger.info(f"Scraping page {page}")
         
-        product_links = response.css('div.product a[id*="catalogEntry"]::attr(href)').getall()
+        product_links = response.css('div.product a[id*="catalogEntry"]')
         
         # Fallback selector if primary doesn't work
         if not product_links:
-            product_links = response.css('li .product_name a::attr(href)').getall()
+            product_links = response.css('li .product_name a')
         
         # Another fallback
         if not product_links:
-            product_links = response.css('a[title*="Steelite"]::attr(href)').getall()
+            product_links = response.css('a[title*="Steelite"]')
         
         self.logger.info(f"Found {len(product_links)} products on page {page}")
         
         if not product_links:
             self.logger.warning(f"No products found on page {page}")
         
+        product_hrefs = set(product_links.xpath('@href').getall())
         for link in product_links:
-            if link and not link.startswith('javascript'):
+            href = link.attrib.get('href')
+            if href and not href.startswith('javascript'):
                 # Handle relative URLs
-                product_url = response.urljoin(link)
+                product_url = response.urljoin(href)
+                listing_hash = card_hash(listing_card(link, product_hrefs))
+                
+                if self.fingerprints and self.fingerprints.is_unchanged(self.name, product_url, listing_hash):
+                    self.fingerprints.touch(self.name, product_url)
+                    self.counts['skipped'] += 1
+                    continue
+                
                 yield scrapy.Request(product_url, callback=self.parse_product, 
-                                   errback=self.errback_parse_product)
+                                   errback=self.errback_parse_product,
+                                   meta={'listing_url': product_url, 'card_hash': listing_hash})
     
     def parse_product(self, response):
         product = {}
@@ -133,40 +151,28 @@ class WasserstromSpider(scrapy.Spider):
         # Product URL
         product['product_url'] = response.url
         
-        self.product_data.append(product)
+        if self.fingerprints:
+            # Stored by the CSV pipeline once the row is written
+            known = self.fingerprints.stage(
+                self.name, response.meta.get('listing_url', response.url), response.meta.get('card_hash'),
+                content_hash(product), product['item_sku'], product_url=product['product_url'],
+            )
+            self.counts['refetched' if known else 'new'] += 1
+        
         self.logger.info(f"Scraped product: {product['name']}")
         
         yield product
     
     def closed(self, reason):
-        if self.product_data:
-            self.save_to_csv()
-        self.logger.info(f"Spider closed. Total products scraped: {len(self.product_data)}")
+        if self.fingerprints:
+            self.logger.info(
+                f"Incremental run: {self.counts['skipped']} skipped, "
+                f"{self.counts['refetched']} refetched, {self.counts['new']} new"
+            )
+            for key, value in self.counts.items():
+                self.crawler.stats.set_value(f'incremental/{key}', value)
+            self.fingerprints.close()
     
     def errback_parse_product(self, failure):
         self.logger.error(f"Error fetching product: {failure.request.url}")
         self.logger.error(f"Error: {failure.value}")
-    
-    def save_to_csv(self):
-        if not self.product_data:
-            return
-        
-        # Define CSV header
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer', 'image_link', 'overview',
-            'material', 'color', 'pattern', 'length', 'width', 'height',
-            'volume_capacity', 'diameter', 'country_of_origin',
-            'upc_barcode', 'ean_code', 'hazmat', 'oversize',
-            'marketplace_uom', 'product_url'
-        ]
-        
-        filename = 'wasserstrom_products.csv'
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for product in self.product_data:
-                    writer.writerow(product)
-            self.logger.info(f"Data saved to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
@@ -1,11 +1,14 @@
 import scrapy
-import csv
+
+from crawl_fingerprints import card_hash, content_hash, listing_card, open_store_for
+from steelite.items import PRODUCT_FIELDS
 
 
 class WebstaurantStoreBigSpider(scrapy.Spider):
     name = "webstaurantstore_big"
     allowed_domains = ["www.webstaurantstore.com"]
     csv_filename = "webstaurantstore_big_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
     
     custom_settings = {
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -14,10 +17,12 @@ class WebstaurantStoreBigSpider(scrapy.Spider):
         'DOWNLOAD_DELAY': 2,
     }
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, incremental=False, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.product_data = []
         self.seen_urls = set()
+        # -a incremental=1 skips products whose listing card is unchanged since the last run
+        self.fingerprints = open_store_for(self, incremental)
+        self.counts = {'skipped': 0, 'refetched': 0, 'new': 0}
     
     def start_requests(self):
         # Multiple search variations
@@ -31,20 +36,28 @@ class WebstaurantStoreBigSpider(scrapy.Spider):
     
     def parse_listing(self, response):
         # Extract product links - WebstaurantStore uses data-testid="itemLink"
-        product_links = response.css('a[data-testid="itemLink"]::attr(href)').getall()
+        product_links = response.css('a[data-testid="itemLink"]')
         
         if not product_links:
             # Fallback selectors
-            product_links = response.css('a[href*="/item/"]::attr(href)').getall()
-            product_links = [l for l in product_links if '/item/' in l]
+            product_links = response.css('a[href*="/item/"]')
         
         self.logger.info(f"Page {response.meta.get('page')}: Found {len(product_links)} products")
         
+        product_hrefs = set(product_links.xpath('@href').getall())
         for link in product_links[:50]:  # Limit per page
-            url = response.urljoin(link)
+            url = response.urljoin(link.attrib.get('href', ''))
             if url not in self.seen_urls and '/item/' in url:
                 self.seen_urls.add(url)
-                yield scrapy.Request(url, callback=self.parse_product)
+                listing_hash = card_hash(listing_card(link, product_hrefs))
+                
+                if self.fingerprints and self.fingerprints.is_unchanged(self.name, url, listing_hash):
+                    self.fingerprints.touch(self.name, url)
+                    self.counts['skipped'] += 1
+                    continue
+                
+                yield scrapy.Request(url, callback=self.parse_product,
+                                     meta={'listing_url': url, 'card_hash': listing_hash})
     
     def parse_product(self, response):
         # Extract product name
@@ -97,27 +110,23 @@ class WebstaurantStoreBigSpider(scrapy.Spider):
             'product_url': response.url,
         }
         
-        self.product_data.append(product)
+        if self.fingerprints:
+            # Stored by the CSV pipeline once the row is written
+            known = self.fingerprints.stage(
+                self.name, response.meta.get('listing_url', response.url), response.meta.get('card_hash'),
+                content_hash(product), item_num, product_url=product['product_url'],
+            )
+            self.counts['refetched' if known else 'new'] += 1
+        
         self.logger.info(f"✓ {name[:50]}")
         yield product
     
     def closed(self, reason):
-        if not self.product_data:
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(self.csv_filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"Saved {len(self.product_data)} products to {self.csv_filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving CSV: {e}")
+        if self.fingerprints:
+            self.logger.info(
+                f"Incremental run: {self.counts['skipped']} skipped, "
+                f"{self.counts['refetched']} refetched, {self.counts['new']} new"
+            )
+            for key, value in self.counts.items():
+                self.crawler.stats.set_value(f'incremental/{key}', value)
+            self.fingerprints.close()
@@ -1,5 +1,4 @@
 import scrapy
-import csv
 import json
 
 
@@ -8,6 +7,12 @@ class WebstaurantStoreVendorSpider(scrapy.Spider):
     allowed_domains = ["www.webstaurantstore.com"]
     start_urls = ["https://www.webstaurantstore.com/vendor/steelite-international.html"]
     csv_filename = "webstaurantstore_vendor_products.csv"
+    csv_fieldnames = [
+        'name', 'category_name', 'manufacturer', 'image_link', 'overview',
+        'length', 'width', 'height', 'diameter', 'volume_capacity',
+        'material', 'color', 'shape', 'pattern', 'features', 'edge_style',
+        'country_of_origin', 'product_url'
+    ]
 
     custom_settings = {
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -18,7 +23,6 @@ class WebstaurantStoreVendorSpider(scrapy.Spider):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.product_data = []
         self.seen_urls = set()
 
     def parse(self, response):
@@ -126,31 +130,5 @@ class WebstaurantStoreVendorSpider(scrapy.Spider):
             'country_of_origin': get_spec('Country of Origin'),
         }
         
-        self.product_data.append(product)
         self.logger.info(f"✓ {product_name[:50]}")
         yield product
-
-    def closed(self, reason):
-        self.save_to_csv(self.csv_filename)
-        self.logger.info(f"Total products scraped: {len(self.product_data)}")
-
-    def save_to_csv(self, filename):
-        if not self.product_data:
-            self.logger.info("No product data to save")
-            return
-        
-        fieldnames = [
-            'name', 'category_name', 'manufacturer', 'image_link', 'overview',
-            'length', 'width', 'height', 'diameter', 'volume_capacity',
-            'material', 'color', 'shape', 'pattern', 'features', 'edge_style',
-            'country_of_origin', 'product_url'
-        ]
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
@@ -1,15 +1,17 @@
 import scrapy
-import csv
 import re
 import json
 from scrapy import Request
 
+from steelite.items import PRODUCT_FIELDS
+
 
 class WilliamsfoodequipmentSpider(scrapy.Spider):
     name = "williamsfoodequipment"
     allowed_domains = ["williamsfoodequipment.com"]
     start_urls = ["https://williamsfoodequipment.com/search.php?search_query=Steelite+"]
     csv_filename = "williamsfoodequipment_products.csv"
+    csv_fieldnames = PRODUCT_FIELDS
     
     custom_settings = {
         'DOWNLOAD_HANDLERS': {
@@ -21,10 +23,6 @@ class WilliamsfoodequipmentSpider(scrapy.Spider):
         'DOWNLOAD_DELAY': 2,
     }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.product_data = []
-
     def start_requests(self):
         for url in self.start_urls:
             yield Request(
@@ -148,32 +146,5 @@ class WilliamsfoodequipmentSpider(scrapy.Spider):
             'product_url': response.url,
         }
 
-        self.product_data.append(product)
         self.logger.info(f"✓ Scraped: {product_name}")
         yield product
-
-    def closed(self, reason):
-        self.save_to_csv(self.csv_filename)
-        self.logger.info(f"Total products scraped: {len(self.product_data)}")
-
-    def save_to_csv(self, filename):
-        if not self.product_data:
-            self.logger.info("No product data to save")
-            return
-        
-        fieldnames = [
-            'name', 'item_sku', 'model_number', 'manufacturer',
-            'image_link', 'overview', 'material', 'color', 'pattern',
-            'length', 'width', 'height', 'volume_capacity', 'diameter',
-            'country_of_origin', 'upc_barcode', 'ean_code',
-            'hazmat', 'oversize', 'marketplace_uom', 'product_url'
-        ]
-        
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.product_data)
-            self.logger.info(f"✓ Saved {len(self.product_data)} products to {filename}")
-        except Exception as e:
-            self.logger.error(f"Error saving to CSV: {e}")
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+import argparse
+import base64
+import csv
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from http import HTTPStatus
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent
+DEFAULT_WARC_DIR = PROJECT_ROOT / "warc"
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+# Raw responses as WARC 1.1 (the web-archive format), one compressed file series per
+# spider: warc/<spider>/<spider>-<time>-<pid>-<n>.warc.gz, rotated at max_bytes.
+# Every record is its own gzip member, so any record can be read by seeking to its
+# offset; warc/index.sqlite maps each URL to its file, offset and length, with the
+# callback, cb_kwargs and meta it was fetched for. A `metadata` record next to each
+# response carries the same fields, so the files stand on their own.
+#
+# Bodies are stored as they came off the wire (still gzip/br encoded when the site
+# compressed them); reading them back decodes them as HttpCompressionMiddleware would.
+#
+#   warc_archive.py ls
+#   warc_archive.py show <url>
+#   warc_archive.py reextract steelite wasserstrom --callback parse_listing -o items.jsonl
+
+SOFTWARE = "Web-Scraping-Test warc_archive.py"
+
+
+def payload_digest(body):
+    return "sha1:" + base64.b32encode(hashlib.sha1(body).digest()).decode("ascii")
+
+
+def _record(warc_type, headers, block, record_id=None):
+    lines = [
+        "WARC/1.1",
+        f"WARC-Type: {warc_type}",
+        f"WARC-Record-ID: {record_id or f'<urn:uuid:{uuid.uuid4()}>'}",
+        f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}",
+    ]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    lines.append(f"Content-Length: {len(block)}")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+    return gzip.compress(head + block + b"\r\n\r\n", compresslevel=6)
+
+
+def http_block(status, headers, body):
+    # headers: (name, value) pairs, repeated names kept
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ""
+    lines = [f"HTTP/1.1 {status} {reason}".rstrip()]
+    lines += [f"{k}: {v}" for k, v in headers if k.lower() != "transfer-encoding"]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "replace") + body
+
+
+def decode_body(headers, body):
+    encodings = [v.strip().lower() for k, v in headers if k.lower() == "content-encoding"]
+    for encoding in reversed(",".join(encodings).split(",") if encodings else []):
+        encoding = encoding.strip()
+        if encoding in ("gzip", "x-gzip"):
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                body = zlib.decompress(body, -zlib.MAX_WBITS)
+        elif encoding == "br":
+            import brotli
+            body = brotli.decompress(body)
+    return body
+
+
+class WarcArchive:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory or os.getenv("WARC_ARCHIVE_DIR", str(DEFAULT_WARC_DIR)))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = {}  # spider -> (path, file object)
+        self._serial = 0
+
+        self.db = sqlite3.connect(str(self.directory / "index.sqlite"), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                spider TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                content_type TEXT,
+                callback TEXT,
+                cb_kwargs TEXT NOT NULL,
+                meta TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                file TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_url ON records (spider, url, digest);
+            CREATE INDEX IF NOT EXISTS records_callback ON records (spider, callback);
+            """
+        )
+        self.db.commit()
+
+    def _file_for(self, spider):
+        # The spider's current file, rotated once it reaches max_bytes
+        path, f = self._files.get(spider, (None, None))
+        if f is not None and f.tell() < self.max_bytes:
+            return path, f
+        if f is not None:
+            f.close()
+        self._serial += 1
+        stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        path = self.directory / spider / f"{spider}-{stamp}-{os.getpid()}-{self._serial:05d}.warc.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(path, "ab")
+        info = f"software: {SOFTWARE}\r\nformat: WARC File Format 1.1\r\n".encode("utf-8")
+        f.write(_record("warcinfo", {"WARC-Filename": path.name, "Content-Type": "application/warc-fields"}, info))
+        self._files[spider] = (path, f)
+        return path, f
+
+    def write(self, spider, url, status, headers, body, callback=None, cb_kwargs=None, meta=None):
+        # Returns the bytes written, or 0 when this URL already has the same body
+        digest = payload_digest(body)
+        content_type = next((v for k, v in headers if k.lower() == "content-type"), None)
+        fields = {"spider": spider, "callback": callback, "cb_kwargs": cb_kwargs or {}, "meta": meta or {}}
+        with self._lock:
+            seen = self.db.execute(
+                "SELECT 1 FROM records WHERE spider = ? AND url = ? AND digest = ? LIMIT 1", (spider, url, digest)
+            ).fetchone()
+            if seen:
+                return 0
+            path, f = self._file_for(spider)
+            record_id = f"<urn:uuid:{uuid.uuid4()}>"
+            response = _record("response", {
+                "WARC-Target-URI": url,
+                "WARC-Payload-Digest": digest,
+                "Content-Type": "application/http;msgtype=response",
+            }, http_block(status, headers, body), record_id)
+            metadata = _record("metadata", {
+                "WARC-Target-URI": url,
+                "WARC-Concurrent-To": record_id,
+                "Content-Type": "application/json",
+            }, json.dumps(fields, ensure_ascii=False, default=str).encode("utf-8"))
+            offset = f.tell()
+            f.write(response + metadata)
+            f.flush()
+            self.db.execute(
+                "INSERT INTO records (spider, url, status, content_type, callback, cb_kwargs, meta, digest, file, offset, length, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    spider, url, status, content_type, callback,
+                    json.dumps(fields["cb_kwargs"], default=str), json.dumps(fields["meta"], default=str),
+                    digest, path.relative_to(self.directory).as_posix(), offset, len(response), time.time(),
+                ),
+            )
+            self.db.commit()
+        return len(response) + len(metadata)
+
+    def records(self, spider=None, callbacks=None, url=None, latest=True):
+        # Index rows as dicts, in file order so reads stay sequential; `latest` keeps
+        # only the newest capture of each URL and callback
+        where, args = [], []
+        if spider:
+            where.append("spider = ?")
+            args.append(spider)
+        if callbacks:
+            where.append(f"callback IN ({', '.join('?' * len(callbacks))})")
+            args += list(callbacks)
+        if url:
+            where.append("url = ?")
+            args.append(url)
+        if latest:
+            where.append("id IN (SELECT MAX(id) FROM records GROUP BY spider, url, callback)")
+        query = "SELECT * FROM records" + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY file, offset"
+        with self._lock:
+            cursor = self.db.execute(query, args)
+            names = [c[0] for c in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def summary(self):
+        with self._lock:
+            return self.db.execute(
+                "SELECT spider, callback, COUNT(*), COUNT(DISTINCT url), SUM(length) FROM records GROUP BY spider, callback ORDER BY spider, callback"
+            ).fetchall()
+
+    def read(self, record):
+        # (status, headers, body) of a record, body still as transferred
+        with open(self.directory / record["file"], "rb") as f:
+            f.seek(record["offset"])
+            data = gzip.decompress(f.read(record["length"]))
+        head, _, rest = data.partition(b"\r\n\r\n")
+        length = next(int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:"))
+        http_head, _, body = rest[:length].partition(b"\r\n\r\n")
+        lines = http_head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = [tuple(part.strip() for part in line.split(":", 1)) for line in lines[1:] if ":" in line]
+        return status, headers, body
+
+    def close(self):
+        with self._lock:
+            for _, f in self._files.values():
+                f.close()
+            self._files.clear()
+            self.db.close()
+
+
+def build_response(archive, record):
+    # The response the callback saw: body decoded, Request carrying the recorded
+    # cb_kwargs and meta
+    from scrapy import Request
+    from scrapy.http import Headers
+    from scrapy.responsetypes import responsetypes
+
+    status, headers, body = archive.read(record)
+    body = decode_body(headers, body)
+    headers = Headers([(k, v) for k, v in headers if k.lower() not in ("content-encoding", "content-length")])
+    request = Request(record["url"], meta=json.loads(record["meta"]), cb_kwargs=json.loads(record["cb_kwargs"]))
+    respcls = responsetypes.from_args(headers=headers, url=record["url"], body=body)
+    return respcls(url=record["url"], status=status, headers=headers, body=body, request=request)
+
+
+def delivered(spider, record):
+    # Whether a live crawl hands a response with this status to the callback: the archive
+    # sits before Redirect, Retry and HttpError, so it also holds 3xx, 429 and 5xx pages
+    status = record["status"]
+    if 200 <= status < 300:
+        return True
+    meta = json.loads(record["meta"] or "{}")
+    if meta.get("handle_httpstatus_all"):
+        return True
+    if "handle_httpstatus_list" in meta:
+        return status in meta["handle_httpstatus_list"]
+    settings = spider.settings
+    if settings.getbool("HTTPERROR_ALLOW_ALL"):
+        return True
+    return status in getattr(spider, "handle_httpstatus_list", ()) or status in settings.getlist("HTTPERROR_ALLOWED_CODES")
+
+
+def reextract(project, spider, callbacks=None, output=None, limit=None, directory=None):
+    # Reruns the spider's callbacks over its archived responses; one spider instance
+    # for the whole run, as in a crawl. Returns {callback: [pages, items, requests, seconds]}.
+    from itemadapter import ItemAdapter
+    from scrapy import Request
+
+    from fixture_corpus import run_callback, spider_factory
+
+    archive = WarcArchive(directory)
+    instance = spider_factory(project, spider)()
+    # Newest capture the spider would actually have received, per URL and callback
+    latest = {}
+    for record in archive.records(spider, callbacks, latest=False):
+        if record["callback"] and delivered(instance, record):
+            key = (record["url"], record["callback"])
+            if key not in latest or record["id"] > latest[key]["id"]:
+                latest[key] = record
+    records = sorted(latest.values(), key=lambda r: (r["file"], r["offset"]))
+    if limit:
+        records = records[:limit]
+    totals = {}
+    rows = []
+    out = open(output, "w", encoding="utf-8", newline="") if output and not str(output).endswith(".csv") else None
+    try:
+        for record in records:
+            if not hasattr(instance, record["callback"]):
+                continue
+            response = build_response(archive, record)
+            started = time.perf_counter()
+            outputs = run_callback(instance, record, response)
+            elapsed = time.perf_counter() - started
+            stats = totals.setdefault(record["callback"], [0, 0, 0, 0.0])
+            stats[0] += 1
+            stats[3] += elapsed
+            for entry in outputs:
+                if isinstance(entry, Request):
+                    stats[2] += 1
+                    continue
+                stats[1] += 1
+                item = ItemAdapter(entry).asdict()
+                if out is not None:
+                    out.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                elif output:
+                    rows.append(item)
+    finally:
+        if out is not None:
+            out.close()
+        archive.close()
+    if rows:
+        fields = list(dict.fromkeys(k for row in rows for k in row))
+        with open(output, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    return totals
+
+
+def main():
+    from crawl_orchestrator import PROJECTS
+
+    parser = argparse.ArgumentParser(description="WARC archive of raw responses")
+    parser.add_argument("--dir", type=Path, help="Archive directory (default warc/, or WARC_ARCHIVE_DIR)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ls", help="Responses archived per spider and callback")
+    show = sub.add_parser("show", help="Print the newest archived response for a URL")
+    show.add_argument("url")
+    show.add_argument("--spider")
+    show.add_argument("--headers-only", action="store_true")
+    rex = sub.add_parser("reextract", help="Rerun a spider's callbacks over its archived responses")
+    rex.add_argument("project", choices=sorted(PROJECTS))
+    rex.add_argument("spider")
+    rex.add_argument("--callback", action="append", help="Only these callbacks (default: all)")
+    rex.add_argument("-o", "--output", type=Path, help="Write the items as JSON lines, or CSV for a .csv name")
+    rex.add_argument("--limit", type=int, help="Stop after this many responses")
+    args = parser.parse_args()
+
+    if args.command == "reextract":
+        # The spiders log every product at INFO
+        import logging
+        logging.basicConfig(level=logging.WARNING)
+        started = time.perf_counter()
+        totals = reextract(args.project, args.spider, args.callback, args.output, args.limit, args.dir)
+        if not totals:
+            print(f"No archived responses for {args.spider}; crawl it with -s WARC_ARCHIVE_ENABLED=1 first")
+            sys.exit(1)
+        print(f"{'callback':<28} {'pages':>7} {'items':>8} {'requests':>9} {'pages/s':>9}")
+        for callback, (pages, items, requests, seconds) in sorted(totals.items()):
+            print(f"{callback:<28} {pages:>7} {items:>8} {requests:>9} {pages / seconds if seconds else 0:>9.0f}")
+        pages = sum(t[0] for t in totals.values())
+        print(f"\n{pages} pages in {time.perf_counter() - started:.1f}s" + (f", items written to {args.output}" if args.output else ""))
+        return
+
+    archive = WarcArchive(args.dir)
+    try:
+        if args.command == "ls":
+            print(f"{'spider':<26} {'callback':<26} {'records':>8} {'urls':>8} {'MB':>8}")
+            for spider, callback, count, urls, size in archive.summary():
+                print(f"{spider:<26} {str(callback):<26} {count:>8} {urls:>8} {(size or 0) / 1024 ** 2:>8.1f}")
+            return
+        found = archive.records(args.spider, url=args.url)
+        if not found:
+            print(f"{args.url} is not in the archive")
+            sys.exit(1)
+        record = max(found, key=lambda r: r["id"])
+        status, headers, body = archive.read(record)
+        print(f"{record['spider']} {record['callback']} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['fetched_at']))} "
+              f"{record['file']}@{record['offset']}")
+        print(f"HTTP {status}")
+        for k, v in headers:
+            print(f"{k}: {v}")
+        if not args.headers_only:
+            print()
+            sys.stdout.write(decode_body(headers, body).decode("utf-8", "replace"))
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import zipfile
+from collections import Counter, namedtuple
+from pathlib import Path
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+# Cell-level changesets for the master workbooks. An arranger run diffs every chunk
+# it merges against the rows it read, so the changeset is a by-product of the merge
+# pass. Publishing a changeset patches the base workbook's sheet XML in place: only
+# the rows that change are parsed and rewritten (found by binary search over the
+# sheet XML), every other byte and zip member is copied as is, so styles, widths and
+# other sheets survive. A changeset with no changes, or the same changes already
+# published from the same base, writes nothing. Each saved changeset also records a
+# digest of the inputs it was merged from (base workbook, scraped rows, alias table),
+# so a run whose inputs have not changed since the last publish can stop before
+# reading the sheet at all.
+#
+# On disk a changeset is gzipped JSON lines: a header with the base workbook's
+# SHA-256 and sheet name, then one [cell, key, column, old, new] line per change. It
+# doubles as the audit of what a publish changed.
+
+Change = namedtuple("Change", ["cell", "key", "column", "old", "new"])
+
+
+class PatchError(Exception):
+    pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _blank(value):
+    # None, NaN and empty strings are all an empty cell
+    if value is None or value is pd.NA or value is pd.NaT:
+        return True
+    if isinstance(value, float) and value != value:
+        return True
+    return isinstance(value, str) and value == ""
+
+
+def _json_value(value):
+    if _blank(value):
+        return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        # numpy scalars
+        return value.item()
+    return value
+
+
+class Changeset:
+    def __init__(self, base_path, sheet=None, base_sha256=None, inputs=None):
+        self.base_path = str(base_path)
+        self.sheet = sheet
+        self.base_sha256 = base_sha256 or file_sha256(base_path)
+        self.inputs = inputs
+        self.changes = []
+
+    def __len__(self):
+        return len(self.changes)
+
+    def add_header(self, header, columns):
+        # Header cells for columns the merge appended to the sheet
+        for position, name in enumerate(columns, start=1):
+            if position > len(header):
+                self.changes.append(Change(f"{get_column_letter(position)}1", None, name, None, name))
+
+    def add_frame(self, before, after, columns, key_column=None):
+        # before: the rows as read; after: the same rows merged, with every output
+        # column. The index is the 0-based data row (sheet row = index + 2).
+        keys = after[key_column] if key_column in after.columns else None
+        for position, column in enumerate(columns, start=1):
+            letter = get_column_letter(position)
+            new = after[column] if column in after.columns else pd.Series(None, index=after.index, dtype=object)
+            old = before[column] if column in before.columns else pd.Series(None, index=after.index, dtype=object)
+            new_blank = new.map(_blank)
+            old_blank = old.map(_blank)
+            differ = (new_blank != old_blank) | (~new_blank & (new.astype(object) != old.astype(object)))
+            for index in differ[differ].index:
+                self.changes.append(Change(
+                    f"{letter}{index + 2}",
+                    None if keys is None else _json_value(keys[index]),
+                    column,
+                    _json_value(old[index]),
+                    _json_value(new[index]),
+                ))
+
+    def summary(self):
+        return Counter(change.column for change in self.changes)
+
+    def digest(self):
+        payload = json.dumps([self.base_sha256, self.sheet, self.changes], ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            header = {
+                "base": os.path.basename(self.base_path),
+                "base_sha256": self.base_sha256,
+                "sheet": self.sheet,
+                "changes": len(self.changes),
+                "digest": self.digest(),
+                "inputs": self.inputs,
+                "written": datetime.datetime.now().isoformat(timespec="seconds"),
+            }
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for change in self.changes:
+                f.write(json.dumps(list(change), ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, base_path=None):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            changeset = cls(base_path or header["base"], header["sheet"], header["base_sha256"], header.get("inputs"))
+            changeset.changes = [Change(*json.loads(line)) for line in f]
+        return changeset
+
+
+def read_header(path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.loads(f.readline())
+    except (OSError, ValueError):
+        return {}
+
+
+def inputs_digest(base_path, *parts):
+    # Fingerprint of everything a merge reads: the base workbook plus DataFrames,
+    # file paths (hashed if they exist) and plain values
+    digest = hashlib.sha256(file_sha256(base_path).encode())
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            data = part.to_csv(index=False).encode("utf-8")
+        elif isinstance(part, (str, Path)) and os.path.isfile(part):
+            data = file_sha256(part).encode()
+        elif isinstance(part, (set, frozenset)):
+            data = repr(sorted(part)).encode("utf-8")
+        else:
+            data = repr(part).encode("utf-8")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def published_for(output_path, inputs, changes_path=None):
+    # True when output_path was last published from exactly these inputs
+    changes_path = changes_path or changes_path_for(output_path)
+    return os.path.exists(output_path) and read_header(changes_path).get("inputs") == inputs
+
+
+# --- Sheet XML patching -------------------------------------------------------------
+
+_ROW_OPEN = re.compile(r"<row\b([^>]*?)(/?)>")
+_CELL = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_ATTR = re.compile(r'([\w:]+)="([^"]*)"')
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)$")
+_DIMENSION = re.compile(r'<dimension ref="([^"]*)"\s*/>')
+
+
+def _attrs(text):
+    return dict(_ATTR.findall(text))
+
+
+def _sheet_member(archive, sheet):
+    # Zip member holding the named sheet (the first one when sheet is None)
+    ns = {
+        "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+        "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+        "p": "http://schemas.openxmlformats.org/package/2006/relationships",
+    }
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    sheets = workbook.findall("m:sheets/m:sheet", ns)
+    if not sheets:
+        raise PatchError("workbook has no sheets")
+    chosen = sheets[0] if sheet is None else next((s for s in sheets if s.get("name") == sheet), None)
+    if chosen is None:
+        raise PatchError(f"no sheet named {sheet!r}")
+    rel_id = chosen.get(f"{{{ns['r']}}}id")
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.findall("p:Relationship", ns):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    raise PatchError(f"sheet {chosen.get('name')!r} has no relationship target")
+
+
+def _cell_xml(ref, value, style):
+    attrs = f' r="{ref}"' + (f' s="{style}"' if style is not None else "")
+    if _blank(value):
+        return f"<c{attrs}/>"
+    if isinstance(value, bool):
+        return f'<c{attrs} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c{attrs}><v>{value!r}</v></c>"
+    text = ILLEGAL_CHARACTERS_RE.sub("", str(value))
+    return f'<c{attrs} t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _patch_row(row_attrs, body, number, changes):
+    # changes: {column index: value}. Unchanged cells are kept byte for byte.
+    attrs = _attrs(row_attrs)
+    row_style = attrs.get("s") if attrs.get("customFormat") in ("1", "true") else None
+    cells = {}
+    for match in _CELL.finditer(body or ""):
+        cell_attrs = _attrs(match.group(1))
+        ref = _CELL_REF.match(cell_attrs.get("r", ""))
+        if ref is None:
+            raise PatchError(f"row {number} has a cell without a reference")
+        cells[column_index_from_string(ref.group(1))] = (match.group(0), cell_attrs.get("s"))
+    for column, value in changes.items():
+        style = cells[column][1] if column in cells else row_style
+        cells[column] = (_cell_xml(f"{get_column_letter(column)}{number}", value, style), style)
+    # spans is only an optimisation hint and may now be wrong
+    kept = "".join(f' {k}="{v}"' for k, v in attrs.items() if k != "spans")
+    return f"<row{kept}>" + "".join(cells[c][0] for c in sorted(cells)) + "</row>"
+
+
+def _find_row(xml, number, lo, hi):
+    # First row between lo and hi whose number is >= number, by binary search over
+    # character offsets (rows are stored in order); None when there is none
+    end = hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        match = _ROW_OPEN.search(xml, mid, end)
+        if match is None or _row_number(match) >= number:
+            hi = mid
+        else:
+            lo = match.end()
+    return _ROW_OPEN.search(xml, lo, end)
+
+
+def _row_number(match):
+    number = _attrs(match.group(1)).get("r")
+    if number is None:
+        raise PatchError("sheet has rows without a row number")
+    return int(number)
+
+
+def patch_sheet_xml(xml, cell_changes):
+    # cell_changes: {(row, column): value}
+    start = xml.find("<sheetData>")
+    end = xml.find("</sheetData>")
+    if start < 0 or end < 0:
+        raise PatchError("sheet has no <sheetData> element")
+    by_row = {}
+    for (row, column), value in cell_changes.items():
+        by_row.setdefault(row, {})[column] = value
+
+    out = [xml[:start + len("<sheetData>")]]
+    position = start + len("<sheetData>")
+    for number in sorted(by_row):
+        match = _find_row(xml, number, position, end)
+        if match is not None and _row_number(match) == number:
+            if match.group(2):
+                row_end = match.end()
+                body = ""
+            else:
+                row_end = xml.index("</row>", match.end()) + len("</row>")
+                body = xml[match.end():row_end - len("</row>")]
+            out.append(xml[position:match.start()])
+            out.append(_patch_row(match.group(1), body, number, by_row[number]))
+            position = row_end
+        else:
+            # A row the sheet does not have yet goes before the next existing one
+            insert_at = match.start() if match is not None else end
+            out.append(xml[position:insert_at])
+            out.append(_patch_row(f' r="{number}"', "", number, by_row[number]))
+            position = insert_at
+    out.append(xml[position:])
+    patched = "".join(out)
+
+    dimension = _DIMENSION.search(patched)
+    if dimension and cell_changes:
+        ref = dimension.group(1).split(":")
+        last = _CELL_REF.match(ref[-1])
+        if last:
+            max_row = max(int(last.group(2)), max(r for r, _ in cell_changes))
+            max_col = max(column_index_from_string(last.group(1)), max(c for _, c in cell_changes))
+            new_ref = f'<dimension ref="{ref[0]}:{get_column_letter(max_col)}{max_row}"/>'
+            patched = patched[:dimension.start()] + new_ref + patched[dimension.end():]
+    return patched
+
+
+def _cell_changes(changeset):
+    changes = {}
+    for change in changeset.changes:
+        ref = _CELL_REF.match(change.cell)
+        changes[(int(ref.group(2)), column_index_from_string(ref.group(1)))] = change.new
+    return changes
+
+
+def apply_changeset(changeset, output_path, base_path=None):
+    # Writes base + changes to output_path. The base must be the workbook the
+    # changeset was computed from.
+    base_path = base_path or changeset.base_path
+    if file_sha256(base_path) != changeset.base_sha256:
+        raise PatchError(f"{base_path} is not the workbook this changeset was made from")
+    patch_workbook(base_path, output_path, {changeset.sheet: _cell_changes(changeset)})
+
+
+def patch_workbook(base_path, output_path, sheet_changes):
+    # sheet_changes: {sheet name (None for the first sheet): {(row, column): value}}.
+    # Every other part of the workbook, styles included, is copied byte for byte.
+    tmp_path = Path(output_path).with_name(f".{Path(output_path).name}.tmp")
+    try:
+        with zipfile.ZipFile(base_path) as source:
+            patched = {}
+            for sheet, cell_changes in sheet_changes.items():
+                member = _sheet_member(source, sheet)
+                patched[member] = patch_sheet_xml(source.read(member).decode("utf-8"), cell_changes).encode("utf-8")
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as target:
+                for info in source.infolist():
+                    data = patched[info.filename] if info.filename in patched else source.read(info)
+                    target.writestr(info, data, compress_type=info.compress_type)
+    except PatchError:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        # Sheet XML this patcher does not handle: load, edit and save it instead
+        _apply_with_openpyxl(base_path, sheet_changes, tmp_path)
+    os.replace(tmp_path, output_path)
+
+
+def _apply_with_openpyxl(base_path, sheet_changes, output_path):
+    workbook = openpyxl.load_workbook(base_path)
+    for sheet, cell_changes in sheet_changes.items():
+        ws = workbook.worksheets[0] if sheet is None else workbook[sheet]
+        for (row, column), value in cell_changes.items():
+            ws.cell(row=row, column=column).value = None if _blank(value) else value
+    workbook.save(output_path)
+
+
+def changes_path_for(output_path):
+    return str(output_path).replace(".xlsx", "_changes.jsonl.gz")
+
+
+def publish(changeset, output_path, changes_path=None):
+    # Returns "unchanged" (no cell differs from the base, which the output already is),
+    # "copied" (no cell differs, so the base was copied over a missing or stale output),
+    # "up-to-date" (these exact changes were already published from this base) or "patched"
+    changes_path = changes_path or changes_path_for(output_path)
+    if not changeset.changes:
+        if os.path.exists(output_path) and file_sha256(output_path) == changeset.base_sha256:
+            return "unchanged"
+        tmp_path = Path(output_path).with_name(f".{Path(output_path).name}.tmp")
+        shutil.copyfile(changeset.base_path, tmp_path)
+        os.replace(tmp_path, output_path)
+        changeset.save(changes_path)
+        return "copied"
+    if os.path.exists(output_path) and read_header(changes_path).get("digest") == changeset.digest():
+        if changeset.inputs:
+            # Same result from new inputs: remember them so the next run can stop early
+            changeset.save(changes_path)
+        return "up-to-date"
+    apply_changeset(changeset, output_path)
+    changeset.save(changes_path)
+    return "patched"
+
+
+def print_publish(status, changeset, output_path, changes_path=None):
+    changes_path = changes_path or changes_path_for(output_path)
+    if status == "unchanged":
+        print(f"\nNo cells changed; {output_path} not written")
+        return
+    if status == "copied":
+        print(f"\nNo cells changed; copied {changeset.base_path} to {output_path}")
+        return
+    if status == "up-to-date":
+        print(f"\n{output_path} already has these {len(changeset)} changes; not written")
+        return
+    print(f"\nPatched {len(changeset)} cells into {output_path} (audit: {changes_path})")
+    for column, count in changeset.summary().most_common():
+        print(f"  {column}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cell-level changesets for the master workbooks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="print a saved changeset")
+    show.add_argument("changes")
+    apply = commands.add_parser("apply", help="apply a saved changeset to its base workbook")
+    apply.add_argument("changes")
+    apply.add_argument("base")
+    apply.add_argument("output")
+    args = parser.parse_args()
+
+    changeset = Changeset.load(args.changes, getattr(args, "base", None))
+    if args.command == "show":
+        print(f"{len(changeset)} changes against {changeset.base_path} ({changeset.base_sha256[:12]})")
+        for change in changeset.changes:
+            print(f"{change.cell:>8}  {str(change.key or ''):<20} {change.column:<16} {change.old!r} -> {change.new!r}")
+    else:
+        apply_changeset(changeset, args.output, args.base)
+        print(f"Applied {len(changeset)} changes to {args.base} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import math
+import os
+import shutil
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+import xlsx_patch
+
+# Row-streaming access to large workbooks. Sheets are read with openpyxl's read-only
+# reader and written with its write-only writer, so memory holds one chunk of rows
+# at a time instead of the whole workbook (a 200k-row sheet is a few hundred MB as
+# openpyxl cells, and pandas keeps a second copy). SheetWriter writes plain cells, as
+# the pandas to_excel path it replaces did; fill_blank_cells edits a workbook in
+# place through xlsx_patch.py, so its styles, merged cells and column widths survive.
+
+DEFAULT_CHUNK_ROWS = 5000
+
+
+def _column_names(values):
+    # Header cells as pd.read_excel names them: "Unnamed: <n>" for blanks, ".1" suffixes on repeats
+    names = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def as_text(value):
+    # What pd.read_excel(dtype=str) makes of a cell
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class SheetReader:
+    # One sheet opened read-only, once: workbooks without a stored dimension (the ones
+    # write-only mode produces) are scanned end to end just to be opened
+
+    def __init__(self, path, sheet=None):
+        self.workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        self.sheet = self.workbook.active if sheet is None else self.workbook[sheet]
+        first = next(self.sheet.iter_rows(max_row=1, values_only=True), ())
+        self.header = _column_names(first)
+
+    def column(self, name):
+        # One column's values below the header, without materialising the other columns
+        position = self.header.index(name) + 1
+        rows = self.sheet.iter_rows(min_row=2, min_col=position, max_col=position, values_only=True)
+        return [row[0] if row else None for row in rows]
+
+    def frames(self, chunk_rows=DEFAULT_CHUNK_ROWS, converter=None):
+        # The sheet below its header as object-dtype DataFrames of chunk_rows rows, with
+        # a RangeIndex that continues across chunks. converter(value) is applied per cell.
+        width = len(self.header)
+        start = 0
+        chunk = []
+        for row in self.sheet.iter_rows(min_row=2, values_only=True):
+            row = list(row[:width]) + [None] * (width - len(row))
+            chunk.append([converter(v) for v in row] if converter else row)
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=self.header, index=range(start, start + len(chunk)), dtype=object)
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=self.header, index=range(start, start + len(chunk)), dtype=object)
+
+    def close(self):
+        self.workbook.close()
+
+
+def _cell(value):
+    # NaN and pandas' missing markers become empty cells, as to_excel writes them
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class SheetWriter:
+    # Write-only workbook with one sheet, saved under a temporary name and renamed on
+    # close so a crash never leaves a truncated workbook at the output path
+
+    def __init__(self, path, columns, title="Sheet1"):
+        self.path = Path(path)
+        self._tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title)
+        self.columns = list(columns)
+        self.sheet.append(self.columns)
+        self.rows_written = 0
+
+    def write_frame(self, df):
+        for row in df.reindex(columns=self.columns).itertuples(index=False, name=None):
+            self.sheet.append([_cell(v) for v in row])
+        self.rows_written += len(df)
+
+    def close(self):
+        self.workbook.save(str(self._tmp_path))
+        os.replace(self._tmp_path, self.path)
+
+
+def blank_cells(path):
+    # {sheet title: [(row, column), ...]} of the empty or whitespace-only cells inside
+    # each sheet's used range, read row by row
+    source = openpyxl.load_workbook(path, read_only=True)
+    blanks = {}
+    try:
+        for ws in source.worksheets:
+            cells = blanks[ws.title] = []
+            lengths = []
+            for number, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                lengths.append(len(row))
+                cells.extend(
+                    (number, column)
+                    for column, value in enumerate(row, start=1)
+                    if value is None or str(value).strip() == ""
+                )
+            # Sheets without a stored dimension come back ragged; pad them to the widest row
+            width = max(lengths, default=0)
+            for number, length in enumerate(lengths, start=1):
+                cells.extend((number, column) for column in range(length + 1, width + 1))
+    finally:
+        source.close()
+    return blanks
+
+
+def fill_blank_cells(input_path, output_path, placeholder="n/a"):
+    # Every sheet: empty or whitespace-only cells become placeholder, patched into the
+    # sheet XML so everything else (styles, formulas, widths) is kept as it was.
+    # Returns the number of cells filled.
+    blanks = blank_cells(input_path)
+    sheet_changes = {title: dict.fromkeys(cells, placeholder) for title, cells in blanks.items() if cells}
+    if sheet_changes:
+        xlsx_patch.patch_workbook(input_path, output_path, sheet_changes)
+    elif os.path.abspath(input_path) != os.path.abspath(output_path):
+        shutil.copyfile(input_path, output_path)
+    return sum(len(cells) for cells in sheet_changes.values())